@@ -0,0 +1,81 @@
+import bisect
+import re
+
+from sort_index import parse_timestamp
+
+_DATE_ONLY = re.compile(r'\s*\d{4}-\d{1,2}-\d{1,2}\s*$')
+
+
+def parse_as_of(text):
+    """解析查询时间，只有日期时表示当天结束时（23:59:59），无法解析时返回 None"""
+    timestamp = parse_timestamp(text)
+    if timestamp is not None and _DATE_ONLY.match(text):
+        timestamp += 235959
+    return timestamp
+
+
+class AsOfIndex:
+    """按操作时间排列的操作记录索引，用于查询某一时刻的库存
+
+    操作按“时间”排序（时间相同时按记录顺序），每隔 interval 条保存一份库存状态，
+    查询时二分找到该时刻之前的最后一条操作，从它之前最近的状态开始重放，
+    耗时约为 O(log n + 距上一个状态的操作数)。
+    保存的状态之间共用没有变化的库存条目，因此重放时只能整体替换条目，不能原地修改。
+
+    Args:
+        operations: 操作记录序列（按下标访问）
+        apply: 函数 apply(库存, 操作记录)，把一条操作应用到库存上
+        interval: 保存库存状态的间隔（按时间排序后的操作条数），默认约为总数的 1/16
+    """
+
+    def __init__(self, operations, apply, interval=None):
+        self.operations = operations
+        self.apply = apply
+        self.skipped = 0  # 时间无法解析、不参与查询的记录数
+
+        entries = []
+        for row in range(len(operations)):
+            timestamp = parse_timestamp(operations[row].get('时间', ''))
+            if timestamp is None:
+                self.skipped += 1
+            else:
+                entries.append((timestamp, row))
+        entries.sort()
+        self.times = [timestamp for timestamp, _ in entries]  # 按时间排序的操作时间
+        self.rows = [row for _, row in entries]  # 与 times 对应的记录下标
+
+        self.interval = interval or max(2000, len(self.rows) // 16)
+        self.states = [{}]  # states[k] 为按时间前 k * interval 条操作之后的库存
+
+    def add(self, start, stop):
+        """加入新增的 [start, stop) 条记录，时间早于已有记录时其后保存的状态失效"""
+        for row in range(start, stop):
+            timestamp = parse_timestamp(self.operations[row].get('时间', ''))
+            if timestamp is None:
+                self.skipped += 1
+                continue
+            position = bisect.bisect_right(self.times, timestamp)
+            self.times.insert(position, timestamp)
+            self.rows.insert(position, row)
+            # 插入位置之后保存的状态都不再正确
+            del self.states[position // self.interval + 1:]
+
+    def inventory_at(self, timestamp):
+        """返回 timestamp（含）之前全部操作执行后的库存"""
+        position = bisect.bisect_right(self.times, timestamp)
+        state_idx = position // self.interval
+
+        # 补齐缺少的状态（第一次查询或新记录插入到中间之后）
+        while len(self.states) <= state_idx:
+            k = len(self.states) - 1
+            inventory = dict(self.states[k])
+            self._replay(inventory, k * self.interval, (k + 1) * self.interval)
+            self.states.append(inventory)
+
+        inventory = dict(self.states[state_idx])
+        self._replay(inventory, state_idx * self.interval, position)
+        return inventory
+
+    def _replay(self, inventory, start, stop):
+        for idx in range(start, stop):
+            self.apply(inventory, self.operations[self.rows[idx]])
@@ -0,0 +1,98 @@
+import csv
+import json
+import sys
+
+import excel_io
+from warehouse_core import WarehouseService, WarehouseError
+
+
+def read_batch_file(file_path):
+    """读取批量操作文件
+
+    .csv 文件第一行为表头（与导入Excel相同，括号中的说明会被忽略）；
+    其他文件按 JSON Lines 读取，每行一个 JSON 对象，空行被跳过。
+
+    Returns:
+        ([(行号, 字段字典)], [(行号, 错误信息)])
+    """
+    rows, errors = [], []
+    if file_path.lower().endswith('.csv'):
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            headers = [excel_io.clean_header(header) for header in next(reader, [])]
+            for values in reader:
+                if any(values):
+                    rows.append((reader.line_num, dict(zip(headers, values))))
+    else:
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    errors.append((line_no, f'无法解析JSON: {str(e)}'))
+                    continue
+                if not isinstance(row, dict):
+                    errors.append((line_no, '每行应为一个JSON对象'))
+                    continue
+                rows.append((line_no, row))
+    return rows, errors
+
+
+def build_report(file_path, accepted, rejected, dry_run, warnings=()):
+    """生成批量执行的报告（可直接序列化为 JSON）"""
+    rejected = sorted(rejected)
+    return {
+        'file': file_path,
+        'dry_run': dry_run,
+        'saved': bool(accepted) and not dry_run,
+        'accepted_count': len(accepted),
+        'rejected_count': len(rejected),
+        'accepted': [{'line': line,
+                      '物资编号': operation['物资编号'],
+                      '物资操作': operation['物资操作'],
+                      '物品数量': operation['物品数量']} for line, operation in accepted],
+        'rejected': [{'line': line, 'error': error} for line, error in rejected],
+        'warnings': [f'{title}: {message}' for title, message in warnings],
+    }
+
+
+def run_batch(file_path, report_path=None, dry_run=False, base_dir=None):
+    """执行批量操作文件并输出报告
+
+    Args:
+        file_path: 批量操作文件（.csv 或 JSON Lines）
+        report_path: 报告输出文件，为 None 时输出到标准输出
+        dry_run: 只校验，不保存
+        base_dir: 程序目录，默认为 warehouse_core 所在目录
+
+    Returns:
+        退出码：0 全部接受，2 有被拒绝的行，1 无法读取文件或保存失败
+    """
+    try:
+        rows, parse_errors = read_batch_file(file_path)
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        print(f'无法读取批量文件: {str(e)}', file=sys.stderr)
+        return 1
+
+    warehouse = WarehouseService(base_dir)
+    try:
+        accepted, rejected = warehouse.apply_batch(rows, dry_run)
+    except WarehouseError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        # 等待库存文件和配置写入完成
+        for key, error in warehouse.close().items():
+            warehouse.warn('后台保存错误', f'{key}: {error}')
+
+    report = build_report(file_path, accepted, rejected + parse_errors, dry_run, warehouse.warnings)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f'接受 {report["accepted_count"]} 行，拒绝 {report["rejected_count"]} 行，报告已写入 {report_path}')
+    else:
+        print(text)
+    return 2 if report['rejected_count'] else 0
@@ -0,0 +1,156 @@
+"""比较各种数据文件格式的读写耗时和文件大小
+
+格式：
+  json-indent  旧版缩进的 JSON（库存文件和整个 warehouse_data.json）
+  json         不缩进的 JSON（历史记录为按月分段的 .jsonl）
+  binary       二进制格式（历史记录为按月分段的 .whb）
+
+每个规模测量：库存文件的保存和读取、全部操作记录的写入、只解析文件和读入内存
+（解析后按列保存，与程序加载全部分段时相同），以及库存文件和操作记录占用的磁盘空间。
+结果输出为表格，-o 时另存为 JSON：
+  python benchmarks/formats.py --sizes 10000 100000 -o formats.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import file_format  # noqa: E402
+from generate import generate_operations, load_names  # noqa: E402
+from history import OperationHistory  # noqa: E402
+from journal import OperationJournal  # noqa: E402
+from records import OperationTable  # noqa: E402
+from warehouse_core import apply_operation  # noqa: E402
+
+FORMATS = ['json-indent'] + file_format.FORMATS
+DEFAULT_SIZES = [10000, 100000]
+
+
+def timed(func):
+    """执行 func，返回 (耗时秒数, 返回值)"""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def save_inventory(path, inventory, data_format):
+    content = {'tag': {'position': 0, 'anchor': ''}, 'inventory': inventory}
+    if data_format == 'json-indent':
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False, indent=2)
+    else:
+        with open(path, 'wb') as f:
+            f.write(file_format.dumps(content, data_format))
+
+
+def write_history(directory, operations, data_format):
+    if data_format == 'json-indent':
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'warehouse_data.json'), 'w', encoding='utf-8') as f:
+            json.dump(operations, f, ensure_ascii=False, indent=2)
+    else:
+        OperationHistory(directory, data_format).rewrite(operations)
+
+
+def parse_history(directory, data_format):
+    """只解析文件，返回记录条数"""
+    if data_format == 'json-indent':
+        with open(os.path.join(directory, 'warehouse_data.json'), 'r', encoding='utf-8') as f:
+            return len(json.load(f))
+    return sum(len(OperationJournal(os.path.join(directory, name)).load())
+               for name in os.listdir(directory) if name.startswith('operations_'))
+
+
+def load_history(directory, data_format):
+    """读入全部记录并按列保存，返回记录条数"""
+    if data_format == 'json-indent':
+        with open(os.path.join(directory, 'warehouse_data.json'), 'r', encoding='utf-8') as f:
+            return len(OperationTable(json.load(f)))
+    history = OperationHistory(directory).load()
+    for seg in range(len(history.segments)):
+        history._segment(seg)
+    return len(history)
+
+
+def bench_format(work_dir, operations, inventory, data_format):
+    """测量一种格式，返回 {项目: 数值}"""
+    result = {}
+    inventory_file = os.path.join(work_dir, f'inventory_{data_format}')
+    result['inventory_save'], _ = timed(lambda: save_inventory(inventory_file, inventory, data_format))
+    result['inventory_load'], _ = timed(lambda: file_format.read_file(inventory_file))
+    result['inventory_bytes'] = os.path.getsize(inventory_file)
+
+    history_dir = os.path.join(work_dir, f'history_{data_format}')
+    result['history_write'], _ = timed(lambda: write_history(history_dir, operations, data_format))
+    result['history_parse'], _ = timed(lambda: parse_history(history_dir, data_format))
+    result['history_load'], count = timed(lambda: load_history(history_dir, data_format))
+    if count != len(operations):
+        raise RuntimeError(f'{data_format} 格式读回 {count} 条记录，应为 {len(operations)} 条')
+    result['history_bytes'] = directory_size(history_dir)
+    return result
+
+
+def run(sizes, seed):
+    organizations, operators = load_names(os.path.join(BASE_DIR, 'config.json'))
+    results = []
+    for size in sizes:
+        print(f'生成 {size} 条操作记录...', file=sys.stderr)
+        operations = list(generate_operations(size, organizations, operators, seed))
+        inventory = {}
+        for op in operations:
+            apply_operation(inventory, op)
+        work_dir = tempfile.mkdtemp(prefix='warehouse_formats_')
+        try:
+            for data_format in FORMATS:
+                print(f'  {data_format}', file=sys.stderr)
+                results.append({'size': size, 'format': data_format,
+                                **bench_format(work_dir, operations, inventory, data_format)})
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def format_table(results):
+    lines = [f'{"记录数":>8}  {"格式":<12}{"库存保存(ms)":>14}{"库存读取(ms)":>14}{"库存(KB)":>10}'
+             f'{"记录写入(ms)":>14}{"记录解析(ms)":>14}{"记录读入(ms)":>14}{"记录(KB)":>10}']
+    for row in results:
+        lines.append(f'{row["size"]:>8}  {row["format"]:<12}'
+                     f'{row["inventory_save"] * 1000:>14.1f}{row["inventory_load"] * 1000:>14.1f}'
+                     f'{row["inventory_bytes"] / 1024:>10.0f}'
+                     f'{row["history_write"] * 1000:>14.1f}{row["history_parse"] * 1000:>14.1f}'
+                     f'{row["history_load"] * 1000:>14.1f}'
+                     f'{row["history_bytes"] / 1024:>10.0f}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较数据文件格式的读写耗时和文件大小')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='操作记录条数')
+    parser.add_argument('--seed', type=int, default=0, help='生成数据的随机数种子')
+    parser.add_argument('-o', '--output', help='结果输出文件（JSON）')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.seed)
+    print(format_table(results))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                       'python': platform.python_version(), 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""生成模拟的仓库操作记录，用于性能测试
+
+物资编号按货架位置编排（如 A1-3-05：A 区 1 号货架第 3 层 05 号位），
+所属组织和操作人取自 config.json。操作按时间先后生成，并保证每条操作都合法：
+入库只用于当前空着的编号，物资增添、部分出库和出库只用于库存中已有的物品。
+
+用法：python benchmarks/generate.py 100000 -o data/warehouse_data.jsonl
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from journal import OperationJournal  # noqa: E402
+
+# 四种操作的比例（库存为空时只能入库，物品都在库时不能入库）
+OPERATION_WEIGHTS = [('入库', 25), ('物资增添', 30), ('部分出库', 35), ('出库', 10)]
+ITEM_NAMES = ['桌子', '椅子', '帐篷', '音响', '麦克风', '延长线', '横幅', '折叠桌', '遮阳伞', '矿泉水',
+              '足球', '篮球', '球衣', '号码布', '急救箱', '手电筒', '对讲机', '扩音器', '海报架', '纸箱']
+DEFAULT_ORGANIZATIONS = ['学生会', '团委', '学生发展中心']
+DEFAULT_OPERATORS = ['管理员', '仓库管理员', '志愿者']
+
+
+def load_names(config_file):
+    """从配置文件读取组织和操作人，配置为空或不存在时使用默认名单"""
+    organizations, operators = [], []
+    if os.path.exists(config_file):
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        organizations = config.get('organization', {}).get('val', [])
+        operators = config.get('operators', {}).get('val', [])
+    return organizations or DEFAULT_ORGANIZATIONS, operators or DEFAULT_OPERATORS
+
+
+def location_ids(count):
+    """按货架位置生成 count 个物资编号：区 A-Z、货架 1-9、层 1-5、位 01-20"""
+    ids = []
+    for zone in range(26):
+        for shelf in range(1, 10):
+            for layer in range(1, 6):
+                for slot in range(1, 21):
+                    ids.append(f'{chr(ord("A") + zone)}{shelf}-{layer}-{slot:02d}')
+                    if len(ids) == count:
+                        return ids
+    return ids
+
+
+def generate_operations(count, organizations, operators, seed=0, locations=None):
+    """生成 count 条操作记录（生成器）
+
+    Args:
+        locations: 使用的货架位置数，默认随记录数增长（约每 20 条记录一个位置，至少 500 个）
+    """
+    rng = random.Random(seed)
+    free = location_ids(locations or max(500, count // 20))
+    rng.shuffle(free)
+    stock = {}  # 物资编号 -> [物品名称, 所属组织, 数量]
+    in_stock = []  # 库存中的物资编号，用于随机选取
+    position = {}  # 物资编号 -> 在 in_stock 中的下标
+
+    now = datetime.datetime(2020, 1, 1, 8, 0)
+    operations, weights = zip(*OPERATION_WEIGHTS)
+    for _ in range(count):
+        operation = rng.choices(operations, weights)[0]
+        if not in_stock:
+            operation = '入库'
+        elif operation == '入库' and not free:
+            operation = '物资增添'
+
+        if operation == '入库':
+            item_id = free.pop()
+            name, organization, qty = rng.choice(ITEM_NAMES), rng.choice(organizations), rng.randint(1, 200)
+            stock[item_id] = [name, organization, qty]
+            position[item_id] = len(in_stock)
+            in_stock.append(item_id)
+        else:
+            item_id = in_stock[rng.randrange(len(in_stock))]
+            name, organization, current = stock[item_id]
+            if operation == '物资增添':
+                qty = rng.randint(1, 50)
+                stock[item_id][2] += qty
+            elif operation == '部分出库' and current > 1:
+                qty = rng.randint(1, current - 1)
+                stock[item_id][2] -= qty
+            else:
+                operation, qty = '出库', current
+                # 从库存中移除：与最后一个交换后删除
+                last = in_stock.pop()
+                if last != item_id:
+                    in_stock[position[item_id]] = last
+                    position[last] = position[item_id]
+                del position[item_id], stock[item_id]
+                free.insert(rng.randrange(len(free) + 1), item_id)
+
+        now += datetime.timedelta(minutes=rng.choice([1, 2, 5, 10, 30, 60, 240]))
+        submitted = now + datetime.timedelta(seconds=rng.randint(5, 3600))
+        operator = rng.choice(operators)
+        yield {
+            "提交时间": submitted.strftime('%Y-%m-%d %H:%M:%S'),
+            "物资编号": item_id,
+            "物品名称": name,
+            "物资操作": operation,
+            "所属组织": organization,
+            "物品数量": qty,
+            "时间": now.strftime('%Y-%m-%d %H:%M'),
+            "操作人": operator,
+            "提交者": rng.choice(operators) if rng.random() < 0.2 else operator
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成模拟的仓库操作记录日志')
+    parser.add_argument('count', type=int, help='操作记录条数')
+    parser.add_argument('-o', '--output', required=True, help='输出的日志文件（.jsonl）')
+    parser.add_argument('--seed', type=int, default=0, help='随机数种子（默认 0，相同种子生成相同数据）')
+    parser.add_argument('--config', default=os.path.join(BASE_DIR, 'config.json'),
+                        help='读取组织和操作人的配置文件')
+    args = parser.parse_args()
+
+    organizations, operators = load_names(args.config)
+    OperationJournal(args.output).rewrite(generate_operations(args.count, organizations, operators, args.seed))
+    print(f'已生成 {args.count} 条操作记录: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
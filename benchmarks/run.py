@@ -0,0 +1,280 @@
+"""性能测试：在模拟数据上不打开界面地计时各个耗时环节，并记录内存峰值
+
+每个规模先用 generate.py 生成操作记录，再依次执行下列测试，每项先计时一次，
+再在 tracemalloc 下重复一次记录内存峰值（--no-memory 跳过）：
+  load             启动加载（读取操作记录和库存文件）
+  load_history     启动加载后读入全部历史记录（内存峰值即全部操作记录占用的内存）
+  rebuild          按操作记录重建库存并保存（不使用检查点）
+  search_first     第一次搜索操作记录（含建立索引）
+  search_again     索引建好后的再次搜索
+  search_inventory 搜索库存
+  sort_first       第一次按“时间”排序操作记录
+  sort_cached      同一列倒序（使用缓存）
+  table_page       界面刷新表格：全部行排序后取第一屏 50 行
+  as_of            查询某一时刻的库存（第一次，含建立时间索引）
+  reports          统计报表（第一次，含统计全部操作记录）
+  export_csv       导出全部操作记录到 CSV
+  export_xlsx      导出全部操作记录到 Excel（需要 openpyxl）
+  import_xlsx      读取并导入上面导出的 Excel 文件到空仓库（需要 openpyxl）
+
+默认规模为 1 万、10 万和 100 万条，只想快速检查时用 --sizes 10000 100000。
+结果写入 JSON 文件，可以用 --compare 与之前的结果对比：
+  python benchmarks/run.py -o bench.json
+  python benchmarks/run.py -o bench_new.json --compare bench.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from generate import generate_operations, load_names  # noqa: E402
+from journal import OperationJournal  # noqa: E402
+from storage import open_storage, convert_storage  # noqa: E402
+from warehouse_core import WarehouseService  # noqa: E402
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+REGRESSION_RATIO = 1.2  # 对比时耗时或内存超过原来的该倍数视为变慢
+
+
+def quiet_warning(title, message):
+    print(f'  警告 {title}: {message}', file=sys.stderr)
+
+
+def prepare_base(base_dir, size, backend, seed):
+    """在 base_dir 下生成 size 条操作记录，按 backend 保存，并建好库存"""
+    data_dir = os.path.join(base_dir, 'data')
+    os.makedirs(data_dir)
+    organizations, operators = load_names(os.path.join(BASE_DIR, 'config.json'))
+    with open(os.path.join(base_dir, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump({'organization': {'val': organizations}, 'operators': {'val': operators},
+                   'storage': {'val': backend}}, f, ensure_ascii=False)
+
+    journal = OperationJournal(os.path.join(data_dir, 'warehouse_data.jsonl'))
+    journal.rewrite(generate_operations(size, organizations, operators, seed))
+    if backend != 'json':
+        source, target = open_storage('json', data_dir), open_storage(backend, data_dir)
+        convert_storage(source, target)
+        target.close()
+
+    # 第一次加载时重建并保存库存
+    WarehouseService(base_dir, on_warning=quiet_warning).close()
+
+
+class Bench:
+    """一个规模、一种存储方式下的全部测试"""
+
+    def __init__(self, base_dir, work_dir, excel):
+        self.base_dir = base_dir
+        self.work_dir = work_dir
+        self.excel = excel
+        self.warehouse = WarehouseService(base_dir, on_warning=quiet_warning)
+        self.search_term = '帐篷'
+        self.xlsx_file = os.path.join(work_dir, 'export.xlsx')
+
+    def cases(self):
+        """返回 [(名称, 准备函数或 None, 测试函数)]"""
+        w = self.warehouse
+        cases = [
+            ('load', None, self.load),
+            ('load_history', None, self.load_history),
+            ('rebuild', w.snapshots.clear, self.rebuild),
+            ('search_first', w.invalidate_operations_index, lambda: w.search('operations', self.search_term)),
+            ('search_again', None, lambda: w.search('operations', '志愿')),
+            ('search_inventory', self.reset_inventory_index, lambda: w.search('inventory', self.search_term)),
+            ('sort_first', w.operation_sorts.clear, lambda: w.sorted_rows('operations', '时间', False)),
+            ('sort_cached', None, lambda: w.sorted_rows('operations', '时间', True)),
+            ('table_page', None, self.table_page),
+            ('as_of', self.reset_as_of, lambda: w.inventory_as_of('2021-06-30')),
+            ('reports', self.reset_reports, w.reports),
+            ('export_csv', None, lambda: w.export_file(os.path.join(self.work_dir, 'export.csv'), 'operations')),
+        ]
+        if self.excel:
+            cases += [
+                ('export_xlsx', None, lambda: w.export_file(self.xlsx_file, 'operations')),
+                ('import_xlsx', None, self.import_xlsx),
+            ]
+        return cases
+
+    def load(self):
+        WarehouseService(self.base_dir, on_warning=quiet_warning).close()
+
+    def load_history(self):
+        warehouse = WarehouseService(self.base_dir, on_warning=quiet_warning)
+        for _ in warehouse.data:
+            pass
+        warehouse.close()
+
+    def rebuild(self):
+        self.warehouse.rebuild_inventory_from_operations()
+        self.warehouse.flush()
+
+    def reset_inventory_index(self):
+        self.warehouse.inventory_index = None
+
+    def reset_as_of(self):
+        self.warehouse.as_of_index = None
+
+    def reset_reports(self):
+        self.warehouse.operation_report = None
+        self.warehouse.operation_report_builder = None
+        self.warehouse.stock_report = None
+
+    def table_page(self):
+        """与界面刷新表格相同：搜索（空）、按当前排序排列，再取第一屏的行"""
+        w = self.warehouse
+        rows = w.sorted_rows('operations', '时间', True, w.search('operations', ''))
+        return [w.export_values('operations', key) for key in rows[:50]]
+
+    def import_xlsx(self):
+        """把导出的 Excel 导入到一个空仓库"""
+        target = tempfile.mkdtemp(dir=self.work_dir)
+        os.makedirs(os.path.join(target, 'data'))
+        shutil.copy(os.path.join(self.base_dir, 'config.json'), target)
+        warehouse = WarehouseService(target, on_warning=quiet_warning)
+        try:
+            items, _ = warehouse.read_excel(self.xlsx_file)
+            warehouse.import_operations(items)
+        finally:
+            warehouse.close()
+            shutil.rmtree(target)
+
+    def close(self):
+        self.warehouse.close()
+
+
+def measure(setup, run, memory):
+    """执行一项测试，返回 (秒数, 内存峰值字节数或 None)"""
+    if setup:
+        setup()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+
+def run_benchmarks(sizes, backends, memory=True, excel_limit=100000, only=None, seed=0):
+    """执行全部测试，返回结果列表"""
+    try:
+        import openpyxl  # noqa: F401
+        has_openpyxl = True
+    except ImportError:
+        has_openpyxl = False
+
+    results = []
+    for size in sizes:
+        for backend in backends:
+            work_dir = tempfile.mkdtemp(prefix='warehouse_bench_')
+            try:
+                base_dir = os.path.join(work_dir, 'base')
+                print(f'生成 {size} 条操作记录（{backend}）...', file=sys.stderr)
+                prepare_base(base_dir, size, backend, seed)
+                bench = Bench(base_dir, work_dir, has_openpyxl and size <= excel_limit)
+                try:
+                    for name, setup, run in bench.cases():
+                        if only and name not in only:
+                            continue
+                        seconds, peak = measure(setup, run, memory)
+                        results.append({'size': size, 'backend': backend, 'case': name,
+                                        'seconds': round(seconds, 6), 'peak_bytes': peak})
+                        peak_text = f'  峰值 {peak / 1048576:.1f} MB' if peak is not None else ''
+                        print(f'  {name:<18}{seconds:>10.3f} s{peak_text}', file=sys.stderr)
+                finally:
+                    bench.close()
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def git_commit():
+    """当前提交的哈希，不在 git 仓库中时返回 None"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """与之前的结果对比，打印变化并返回变慢的项数"""
+    old = {(r['size'], r['backend'], r['case']): r for r in baseline['results']}
+    regressions = 0
+    print(f'{"规模":>9} {"存储":<7}{"测试":<18}{"原耗时":>10}{"现耗时":>10}{"倍数":>8}{"内存倍数":>10}')
+    for r in results:
+        before = old.get((r['size'], r['backend'], r['case']))
+        if before is None:
+            continue
+        ratio = r['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        memory_ratio = None
+        if r['peak_bytes'] and before.get('peak_bytes'):
+            memory_ratio = r['peak_bytes'] / before['peak_bytes']
+        slower = ratio > REGRESSION_RATIO or (memory_ratio or 0) > REGRESSION_RATIO
+        regressions += slower
+        memory_text = f'{memory_ratio:.2f}' if memory_ratio is not None else '-'
+        print(f'{r["size"]:>9} {r["backend"]:<7}{r["case"]:<18}{before["seconds"]:>10.3f}{r["seconds"]:>10.3f}'
+              f'{ratio:>8.2f}{memory_text:>10}{"  变慢" if slower else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='仓库物资管理系统性能测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='操作记录条数（默认 10000 100000 1000000）')
+    parser.add_argument('--backends', nargs='+', choices=['json', 'sqlite'], default=['json'],
+                        help='存储方式（默认 json）')
+    parser.add_argument('--cases', nargs='+', help='只执行指定的测试')
+    parser.add_argument('--no-memory', action='store_true', help='不记录内存峰值（测试时间减半）')
+    parser.add_argument('--excel-limit', type=int, default=100000,
+                        help='记录数超过该值时跳过 Excel 导入导出测试（默认 100000）')
+    parser.add_argument('--seed', type=int, default=0, help='生成数据的随机数种子')
+    parser.add_argument('-o', '--output', help='结果输出文件（JSON），默认输出到标准输出')
+    parser.add_argument('--compare', help='与之前的结果文件对比，有变慢的项时退出码为 1')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.backends, not args.no_memory, args.excel_limit,
+                             set(args.cases) if args.cases else None, args.seed)
+    report = {
+        'commit': git_commit(),
+        'time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        return 1 if compare(results, baseline) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
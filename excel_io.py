@@ -0,0 +1,310 @@
+import csv
+import datetime
+import os
+import re
+
+# 导入时必须包含的列
+REQUIRED_HEADERS = ['物资编号', '物品名称', '物资操作', '所属组织', '物品数量', '时间', '操作人', '提交者']
+
+
+class ExcelFormatError(ValueError):
+    """Excel 文件格式不符合导入要求（如缺少必要的列）"""
+
+
+def clean_header(header):
+    """清理表头，去除括号及其内容"""
+    if not header:
+        return ""
+    # 去除（...）内容
+    return re.sub(r'（.*?）', '', header).strip()
+
+
+def match_headers(actual_headers, required_headers):
+    """匹配表头，返回匹配的列索引映射
+
+    Args:
+        actual_headers: 实际的Excel表头列表
+        required_headers: 需要的表头列表
+
+    Returns:
+        字典 {需要的表头: 对应的列索引}
+    """
+    header_mapping = {}
+
+    # 清理表头（去除括号和其中的内容）
+    cleaned_headers = [clean_header(header) for header in actual_headers]
+
+    # 对每个需要的表头，找到最匹配的实际表头
+    for req_header in required_headers:
+        best_match = None
+        best_score = -1
+
+        for idx, (raw_header, cleaned) in enumerate(zip(actual_headers, cleaned_headers)):
+            # 如果完全匹配（清理后）
+            if cleaned == req_header:
+                best_match = idx
+                break
+
+            # 简单相似度评分：包含关系
+            if req_header in cleaned:
+                score = len(req_header) / len(cleaned) if cleaned else 0
+                if score > best_score:
+                    best_score = score
+                    best_match = idx
+
+        # 如果找到匹配
+        if best_match is not None:
+            header_mapping[req_header] = best_match
+
+    return header_mapping
+
+
+def parse_row(row, header_mapping, row_idx):
+    """校验并转换一行数据
+
+    Args:
+        row: 该行各单元格的值
+        header_mapping: match_headers 返回的列索引映射
+        row_idx: 行号（用于错误信息）
+
+    Returns:
+        (操作记录, None) 或 (None, 错误信息)
+    """
+    try:
+        # 获取单元格值
+        item_id = str(row[header_mapping['物资编号']] or '').strip()
+
+        # 读取基本信息
+        item_name = str(row[header_mapping['物品名称']] or '')
+        operation = str(row[header_mapping['物资操作']] or '入库')
+        organization = str(row[header_mapping['所属组织']] or '')
+
+        # 读取数量并验证
+        qty_cell = row[header_mapping['物品数量']]
+        try:
+            quantity = int(qty_cell)
+            if quantity <= 0:
+                raise ValueError('数量必须大于0')
+        except (ValueError, TypeError):
+            return None, f'第{row_idx}行: 无效的数量'
+
+        # 读取时间
+        time_cell = row[header_mapping['时间']]
+        if isinstance(time_cell, datetime.datetime):
+            item_time = time_cell.strftime('%Y-%m-%d %H:%M')
+        elif isinstance(time_cell, str):
+            try:
+                datetime.datetime.strptime(time_cell, '%Y-%m-%d %H:%M')
+                item_time = time_cell
+            except ValueError:
+                return None, f'第{row_idx}行: 时间格式不正确'
+        else:
+            item_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+
+        # 操作人和提交者
+        operator = str(row[header_mapping['操作人']] or '')
+        submitter = str(row[header_mapping['提交者']] or '')
+
+        # 验证必填字段
+        if not (item_id and item_name and organization):
+            return None, f'第{row_idx}行: 缺少必填字段'
+
+        # 创建物资记录
+        return {
+            "提交时间": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "物资编号": item_id,
+            "物品名称": item_name,
+            "物资操作": operation,
+            "所属组织": organization,
+            "物品数量": quantity,
+            "时间": item_time,
+            "操作人": operator,
+            "提交者": submitter
+        }, None
+
+    except Exception as e:
+        return None, f'第{row_idx}行: {str(e)}'
+
+
+def iter_workbook_batches(file_path, batch_size=1000):
+    """以只读方式逐行读取 Excel 文件，分批返回校验后的记录
+
+    只读模式不会把整个工作簿载入内存。
+
+    Yields:
+        (有效记录列表, 错误信息列表, 已读取的行数, 总行数或 None)
+
+    Raises:
+        ExcelFormatError: 缺少必要的列
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+
+        # 获取表头行
+        rows = ws.iter_rows(values_only=True)
+        header_row = next(rows, ())
+        headers = [str(value) if value else "" for value in header_row]
+
+        # 通过相似度匹配表头
+        header_mapping = match_headers(headers, REQUIRED_HEADERS)
+        missing_headers = [h for h in REQUIRED_HEADERS if h not in header_mapping]
+        if missing_headers:
+            raise ExcelFormatError(f'Excel文件缺少必要的列: {", ".join(missing_headers)}')
+
+        total_rows = ws.max_row - 1 if ws.max_row else None
+        width = len(headers)
+
+        items = []
+        invalid_rows = []
+        done = 0
+        for row_idx, row in enumerate(rows, start=2):
+            # 只读模式下行末的空单元格可能被省略
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            item, error = parse_row(row, header_mapping, row_idx)
+            if error:
+                invalid_rows.append(error)
+            else:
+                items.append(item)
+            done += 1
+
+            if done % batch_size == 0:
+                yield items, invalid_rows, done, total_rows
+                items, invalid_rows = [], []
+
+        yield items, invalid_rows, done, total_rows
+    finally:
+        wb.close()
+
+
+# 子进程返回的紧凑记录中各值的顺序（不含提交时间，由主进程统一填写）
+COMPACT_FIELDS = ['物资编号', '物品名称', '物资操作', '所属组织', '物品数量', '时间', '操作人', '提交者']
+
+
+def read_workbook_rows(file_path):
+    """读取并校验整个 Excel 文件，返回 (紧凑记录列表, 错误信息列表)
+
+    在导入文件夹的子进程中执行。每条记录是按 COMPACT_FIELDS 排列的元组，
+    传回主进程时比字典小得多；文件无法读取或缺少必要的列也作为错误信息返回。
+    """
+    rows, errors = [], []
+    try:
+        for items, batch_errors, _, _ in iter_workbook_batches(file_path):
+            rows.extend(tuple(item[field] for field in COMPACT_FIELDS) for item in items)
+            errors.extend(batch_errors)
+    except ExcelFormatError as e:
+        errors.append(str(e))
+    except Exception as e:
+        errors.append(f'无法读取文件: {str(e)}')
+    return rows, errors
+
+
+def list_workbooks(folder):
+    """文件夹中的 Excel 文件（按文件名排列，不含 Excel 打开文件时产生的 ~$ 临时文件）"""
+    return sorted(name for name in os.listdir(folder)
+                  if name.lower().endswith('.xlsx') and not name.startswith('~$'))
+
+
+def iter_folder_batches(folder, max_workers=None):
+    """在多个子进程中并行读取文件夹中的全部 Excel 文件，按文件名顺序逐个返回结果
+
+    每个文件由一个子进程完整读取和校验，主进程只把紧凑记录还原为操作记录，
+    全部记录使用同一个提交时间。返回顺序只取决于文件名，与各进程完成的先后无关。
+    子进程总是以 spawn 方式启动：界面进程中有 Tk 和后台保存线程，fork 出的子进程
+    可能继承被其他线程持有的锁而卡住。
+
+    Args:
+        max_workers: 子进程数，默认为 CPU 核数（不超过文件数）
+
+    Yields:
+        (有效记录列表, 错误信息列表, 已读取的文件数, 文件总数)
+
+    Raises:
+        ExcelFormatError: 文件夹中没有 Excel 文件
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    names = list_workbooks(folder)
+    if not names:
+        raise ExcelFormatError('文件夹中没有Excel文件（.xlsx）')
+    submit_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    workers = min(max_workers or os.cpu_count() or 1, len(names))
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        results = executor.map(read_workbook_rows, [os.path.join(folder, name) for name in names])
+        for done, (name, (rows, errors)) in enumerate(zip(names, results), start=1):
+            items = [{"提交时间": submit_time, **dict(zip(COMPACT_FIELDS, row))} for row in rows]
+            yield items, [f'{name} {error}' for error in errors], done, len(names)
+    finally:
+        # 取消时不再启动尚未开始的文件
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# 导出时各视图的表头
+OPERATION_EXPORT_HEADERS = ['提交时间', '物资编号', '物品名称', '物资操作', '所属组织', '物品数量', '时间', '操作人', '提交者']
+INVENTORY_EXPORT_HEADERS = ['物资编号', '物品名称', '所属组织', '物品数量', '最后操作', '最后操作人', '最后操作时间', '备注']
+
+
+def open_table_writer(file_path, title, headers):
+    """按扩展名返回表格写入器：.csv 写 CSV，其余写 Excel
+
+    写入器先写到临时文件，close() 时才替换目标文件，abort() 丢弃已写的内容。
+    """
+    if file_path.lower().endswith('.csv'):
+        return CsvTableWriter(file_path, headers)
+    return XlsxTableWriter(file_path, title, headers)
+
+
+class XlsxTableWriter:
+    """以只写模式写 Excel，每行追加后即写出，内存占用不随行数增长"""
+
+    def __init__(self, file_path, title, headers):
+        import openpyxl
+
+        self.file_path = file_path
+        self.temp_path = file_path + '.tmp'
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(title)
+        self.ws.append(headers)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.ws.append(row)
+
+    def close(self):
+        self.wb.save(self.temp_path)
+        os.replace(self.temp_path, self.file_path)
+
+    def abort(self):
+        # 结束工作表的写出流，其临时文件由 openpyxl 在程序退出时清理
+        if not self.ws.closed:
+            self.ws.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class CsvTableWriter:
+    """写 CSV（带 BOM 的 UTF-8，Excel 可以直接打开）"""
+
+    def __init__(self, file_path, headers):
+        self.file_path = file_path
+        self.temp_path = file_path + '.tmp'
+        self.file = open(self.temp_path, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+        os.replace(self.temp_path, self.file_path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
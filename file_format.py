@@ -0,0 +1,165 @@
+import json
+import struct
+import zlib
+
+# 数据文件格式：json 为不缩进的 JSON（日志每行一条），binary 为带文件头的二进制格式
+FORMATS = ['json', 'binary']
+
+# 二进制文件以 WHB1 开头，所有整数均为小端序，内容的编码与 Python 版本无关：
+# - 整个文件保存一个对象时，文件头后为 8 字节长度、4 字节 CRC32 和不缩进的 JSON（UTF-8）；
+# - 日志文件头后为逐条记录，每条为 4 字节长度和内容。字段及顺序与 RECORD_FIELDS 相同、
+#   数量为 64 位整数、其余字段为字符串的记录，内容为 R、8 字节数量、其余 8 个字段各自的
+#   字符数（各 4 字节）和这些字段依次连接后的 UTF-8 文本，不重复保存字段名；
+#   其他记录的内容为 J 和该记录不缩进的 JSON。
+BINARY_MAGIC = b'WHB1'
+_DOCUMENT_HEADER = struct.Struct('<QI')
+_FRAME_HEADER = struct.Struct('<I')
+RECORD_FIELDS = ('提交时间', '物资编号', '物品名称', '物资操作', '所属组织', '物品数量', '时间', '操作人', '提交者')
+_QUANTITY_POS = RECORD_FIELDS.index('物品数量')
+_TEXT_FIELDS = RECORD_FIELDS[:_QUANTITY_POS] + RECORD_FIELDS[_QUANTITY_POS + 1:]
+_RECORD_HEADER = struct.Struct(f'<q{len(_TEXT_FIELDS)}I')
+_COMPACT_RECORD = b'R'
+_JSON_RECORD = b'J'
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def check_format(data_format):
+    """检查格式名称，不支持时抛出 ValueError"""
+    if data_format not in FORMATS:
+        raise ValueError(f'未知的数据文件格式: {data_format}（可选: {", ".join(FORMATS)}）')
+
+
+def detect(head):
+    """按文件开头的字节判断格式"""
+    return 'binary' if head[:len(BINARY_MAGIC)] == BINARY_MAGIC else 'json'
+
+
+def dumps(content, data_format):
+    """把一个对象编码为整个文件的内容"""
+    if data_format == 'binary':
+        body = json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return BINARY_MAGIC + _DOCUMENT_HEADER.pack(len(body), zlib.crc32(body)) + body
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """解码整个文件的内容，格式按文件头自动识别（也能读取旧版缩进的 JSON）"""
+    if detect(data) == 'binary':
+        start = len(BINARY_MAGIC) + _DOCUMENT_HEADER.size
+        if len(data) < start:
+            raise ValueError('数据文件不完整')
+        length, checksum = _DOCUMENT_HEADER.unpack_from(data, len(BINARY_MAGIC))
+        body = data[start:]
+        if len(body) != length or zlib.crc32(body) != checksum:
+            raise ValueError('数据文件已损坏（长度或校验和不符）')
+        data = body
+    return json.loads(data.decode('utf-8'))
+
+
+def read_file(path):
+    """读取整个文件保存的对象"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def encode_record(record, data_format):
+    """把一条日志记录编码为追加到日志文件的字节"""
+    if data_format == 'binary':
+        body = _encode_frame(record)
+        return _FRAME_HEADER.pack(len(body)) + body
+    return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def journal_header(data_format):
+    """新建日志文件时写在开头的内容"""
+    return BINARY_MAGIC if data_format == 'binary' else b''
+
+
+def parse_records(content, data_format, records):
+    """从日志内容中解析完整的记录并加入 records
+
+    Returns:
+        最后一条完整记录之后在 content 中的位置；之后的内容是被截断的写入，
+        或中间的记录已损坏时抛出 ValueError
+    """
+    if data_format == 'binary':
+        return _parse_frames(content, records)
+    return _parse_lines(content, records)
+
+
+def _parse_lines(content, records):
+    good_end = 0
+    pos = 0
+    size = len(content)
+    while pos < size:
+        newline = content.find(b'\n', pos)
+        if newline == -1:
+            # 没有换行结尾的最后一行一定是被截断的写入
+            break
+        line = content[pos:newline].strip()
+        if line:
+            try:
+                records.append(json.loads(line.decode('utf-8')))
+            except ValueError:
+                if content[newline + 1:].strip():
+                    raise ValueError(f'第{len(records) + 1}条记录已损坏')
+                break
+        pos = newline + 1
+        good_end = pos
+    return good_end
+
+
+def _encode_frame(record):
+    """编码一条日志记录的内容（不含长度）"""
+    if type(record) is dict and tuple(record) == RECORD_FIELDS:
+        quantity = record[RECORD_FIELDS[_QUANTITY_POS]]
+        texts = [record[field] for field in _TEXT_FIELDS]
+        if (type(quantity) is int and _INT64_MIN <= quantity <= _INT64_MAX
+                and all(type(text) is str for text in texts)):
+            return (_COMPACT_RECORD + _RECORD_HEADER.pack(quantity, *map(len, texts))
+                    + ''.join(texts).encode('utf-8'))
+    return _JSON_RECORD + json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _decode_frame(content, start, end):
+    """解码 content[start:end] 中的一条日志记录，内容不完整或无法识别时抛出 ValueError"""
+    kind = content[start:start + 1]
+    if kind == _COMPACT_RECORD:
+        body = start + 1 + _RECORD_HEADER.size
+        if body > end:
+            raise ValueError('记录不完整')
+        quantity, *lengths = _RECORD_HEADER.unpack_from(content, start + 1)
+        text = content[body:end].decode('utf-8')
+        values = []
+        pos = 0
+        for length in lengths:
+            values.append(text[pos:pos + length])
+            pos += length
+        if pos != len(text):
+            raise ValueError('字段长度与内容不符')
+        values.insert(_QUANTITY_POS, quantity)
+        return dict(zip(RECORD_FIELDS, values))
+    if kind == _JSON_RECORD:
+        return json.loads(content[start + 1:end].decode('utf-8'))
+    raise ValueError('未知的记录类型')
+
+
+def _parse_frames(content, records):
+    pos = 0
+    size = len(content)
+    while pos + _FRAME_HEADER.size <= size:
+        (length,) = _FRAME_HEADER.unpack_from(content, pos)
+        end = pos + _FRAME_HEADER.size + length
+        if end > size:
+            # 长度之后的内容没有写完
+            break
+        try:
+            record = _decode_frame(content, pos + _FRAME_HEADER.size, end)
+        except ValueError:
+            # 断电后文件末尾可能被填充为 0，其余情况视为中间的记录损坏
+            if content[end:].strip(b'\x00'):
+                raise ValueError(f'第{len(records) + 1}条记录已损坏')
+            break
+        records.append(record)
+        pos = end
+    return pos
@@ -0,0 +1,81 @@
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class LockTimeout(OSError):
+    """等待文件锁超时"""
+
+
+class FileLock:
+    """跨进程的排他文件锁
+
+    同一进程内可以嵌套获取（只在最外层真正加锁和解锁）。
+    同一数据目录被多个程序实例使用时，用它把各实例的修改串行化。
+
+    Args:
+        path: 锁文件路径（文件内容无意义，不存在时自动创建）
+        timeout: 等待其他进程释放锁的最长秒数
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.depth = 0
+        self.file = None
+
+    def acquire(self):
+        if self.depth == 0:
+            f = open(self.path, 'a+b')
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    self._lock(f)
+                    break
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        f.close()
+                        raise LockTimeout(f'等待数据锁超时: {self.path}')
+                    time.sleep(self.POLL_INTERVAL)
+            self.file = f
+        self.depth += 1
+
+    def release(self):
+        if self.depth <= 0:
+            raise RuntimeError('文件锁未被持有')
+        self.depth -= 1
+        if self.depth == 0:
+            try:
+                self._unlock(self.file)
+            finally:
+                self.file.close()
+                self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    @staticmethod
+    def _lock(f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+    @staticmethod
+    def _unlock(f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,263 @@
+import bisect
+import collections.abc
+import datetime
+import json
+import os
+import re
+
+from journal import OperationJournal
+from migrations import MANIFEST_SCHEMA, SCHEMA_VERSION
+from records import OperationTable
+
+MANIFEST_NAME = 'manifest.json'
+SEGMENT_PATTERN = re.compile(r'^operations_\d{6}\.(\d+)\.(jsonl|whb)$')
+# 各种数据文件格式的分段文件扩展名
+EXTENSIONS = {'json': 'jsonl', 'binary': 'whb'}
+
+
+def current_month():
+    return datetime.datetime.now().strftime('%Y%m')
+
+
+def record_month(record):
+    """操作记录提交时间所在的月份（YYYYMM），无法识别时返回 None"""
+    text = str(record.get('提交时间', ''))
+    month = text[:4] + text[5:7]
+    return month if len(month) == 6 and month.isdigit() else None
+
+
+def split_by_month(records):
+    """把按顺序排列的记录切分为 (月份, 记录列表)（生成器）
+
+    提交时间进入更晚的月份时开始新的一段，时间较早或无法识别的记录留在当前段，
+    因此每段都是连续的一段记录，顺序不变。
+    """
+    month, group = None, []
+    for record in records:
+        month_of_record = record_month(record)
+        if month is None:
+            month = month_of_record
+        elif month_of_record is not None and month_of_record > month:
+            yield month, group
+            month, group = month_of_record, []
+        group.append(record)
+    if group:
+        yield month or current_month(), group
+
+
+class OperationHistory(collections.abc.Sequence):
+    """按月分段保存的操作记录
+
+    每个月追加的记录写入一个分段日志（operations_年月.代数.jsonl 或 .whb），月份变化后
+    上个月的分段被封存，manifest.json 记录已封存分段的文件和记录条数。
+    加载时只读取清单和当月分段，更早的分段在第一次被访问（滚动表格、搜索、排序、
+    查询历史库存等）时才读取并保留在内存中，因此启动时间与历史记录的多少无关。
+
+    下标在全部分段中按追加顺序连续编号，与单个日志文件时相同。
+    读入的分段按列保存（records.OperationTable），按下标读取时得到记录字典。
+    """
+
+    def __init__(self, directory, data_format='json'):
+        self.directory = directory
+        self.data_format = data_format  # 新建分段使用的文件格式，已有分段按文件头识别
+        self.manifest_file = os.path.join(directory, MANIFEST_NAME)
+        self.schema = SCHEMA_VERSION  # 数据结构版本（见 migrations.py），保存在清单中
+        self.generation = 0  # 整体重写的次数，区分新旧分段文件
+        self.segments = []  # 已封存的分段 [{'month', 'file', 'count'}]
+        self.starts = []  # 各封存分段第一条记录的下标
+        self.sealed_count = 0  # 已封存分段的记录总数
+        self.active = None  # 当月分段 {'month', 'file'}
+        self.active_journal = None
+        self.active_records = OperationTable()
+        self.active_offset = 0  # 已读入的当月分段长度，之后的内容是其他实例追加的
+        self._loaded = {}  # 已读取的分段 序号 -> 记录列表
+        self._recent = None  # 最近访问的分段 (起始下标, 结束下标, 记录列表)，顺序访问时不用二分查找
+
+    def exists(self):
+        """是否已经保存过分段"""
+        return os.path.exists(self.manifest_file)
+
+    def read_schema(self):
+        """只读取清单中保存的数据结构版本"""
+        return self._read_manifest().get('schema', MANIFEST_SCHEMA)
+
+    def load(self):
+        """读取清单和当月分段，返回自身"""
+        self._loaded.clear()
+        self._apply_manifest(self._read_manifest())
+        self.active_records, self.active_offset = self.active_journal.load_from(0, OperationTable())
+        return self
+
+    def load_new(self):
+        """读入其他实例追加的记录，返回新记录条数
+
+        其他实例封存了当月分段时重新读取清单，已有记录的下标不变。
+        """
+        before = len(self)
+        manifest = self._read_manifest()
+        if manifest['active'] != self.active or manifest['generation'] != self.generation:
+            self._apply_manifest(manifest)
+            self.active_records, self.active_offset = self.active_journal.load_from(0, OperationTable())
+        else:
+            _, self.active_offset = self.active_journal.load_from(self.active_offset, self.active_records)
+        return len(self) - before
+
+    def extend(self, records):
+        """把记录追加到当月分段并立即落盘，进入新的月份时先封存上个月的分段"""
+        records = list(records)
+        if not records:
+            return
+        month = current_month()
+        if not self.exists():
+            self._write_manifest()
+        elif month > self.active['month']:
+            self._start_month(month)
+        self.active_offset = self.active_journal.append_many(records)
+        self.active_records.extend(records)
+
+    def rewrite(self, records):
+        """整体重写全部记录（仅在删除记录等无法追加的场景使用）
+
+        按提交时间所在月份重新分段，写入新一代的分段文件后替换清单，
+        任何时刻磁盘上都有一份完整的记录。上一代的文件保留到下一次重写，
+        尚未同步的其他实例仍能读取。records 可以是本对象自身。
+        """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        generation = self.generation + 1
+        segments = []
+        last = None
+        for month, group in split_by_month(records):
+            if last is not None:
+                segments.append(self._write_segment(last[0], last[1], generation))
+            last = (month, group)
+
+        if last is None:
+            last = (current_month(), [])
+        month, active_records = last
+        active = {'month': month, 'file': self._file_name(month, generation)}
+        active_offset = self._journal(active['file']).rewrite(active_records)
+
+        manifest = {'schema': self.schema, 'generation': generation, 'segments': segments, 'active': active}
+        self._write_manifest(manifest)
+        self._apply_manifest(manifest)
+        self.active_records, self.active_offset = OperationTable(active_records), active_offset
+        self._remove_old_files()
+        return self
+
+    def migrate_from(self, journal):
+        """把单个日志文件中的记录按月分段，原日志改名为 .bak 保留
+
+        日志读入为按列保存的记录，分段时逐条还原，不同时保存两份完整的记录字典。
+        """
+        records, _ = journal.load_from(0, OperationTable())
+        self.rewrite(records)
+        os.replace(journal.path, journal.path + '.bak')
+
+    def __len__(self):
+        return self.sealed_count + len(self.active_records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('操作记录索引超出范围')
+        if index >= self.sealed_count:
+            return self.active_records[index - self.sealed_count]
+
+        recent = self._recent
+        if recent is None or not recent[0] <= index < recent[1]:
+            seg = bisect.bisect_right(self.starts, index) - 1
+            start = self.starts[seg]
+            recent = self._recent = (start, start + self.segments[seg]['count'], self._segment(seg))
+        return recent[2][index - recent[0]]
+
+    def __iter__(self):
+        for seg in range(len(self.segments)):
+            yield from self._segment(seg)
+        yield from self.active_records
+
+    def _segment(self, seg):
+        records = self._loaded.get(seg)
+        if records is None:
+            records = self._loaded[seg] = self._read_segment(seg)
+        return records
+
+    def _read_segment(self, seg):
+        segment = self.segments[seg]
+        path = os.path.join(self.directory, segment['file'])
+        records, _ = self._journal(segment['file']).load_from(0, OperationTable())
+        if len(records) != segment['count']:
+            raise ValueError(f'操作记录分段已损坏（应有{segment["count"]}条，实有{len(records)}条）: {path}')
+        return records
+
+    def _start_month(self, month):
+        """封存当月分段（没有记录时直接弃用），开始新月份的分段"""
+        if self.active_records:
+            self.segments.append({'month': self.active['month'], 'file': self.active['file'],
+                                  'count': len(self.active_records)})
+        self.active = {'month': month, 'file': self._file_name(month, self.generation)}
+        self._write_manifest()
+        self._apply_manifest(self._manifest())
+        if self.segments and self.active_records:
+            self._loaded[len(self.segments) - 1] = self.active_records
+        self.active_records, self.active_offset = OperationTable(), 0
+
+    def _write_segment(self, month, records, generation):
+        file_name = self._file_name(month, generation)
+        self._journal(file_name).rewrite(records)
+        return {'month': month, 'file': file_name, 'count': len(records)}
+
+    def _apply_manifest(self, manifest):
+        # 同一代中封存的分段不会再变化，已读取的可以继续使用
+        if manifest['generation'] != self.generation:
+            self._loaded.clear()
+        self.schema = manifest.get('schema', MANIFEST_SCHEMA)
+        self.generation = manifest['generation']
+        self.segments = manifest['segments']
+        self.starts = []
+        self.sealed_count = 0
+        for segment in self.segments:
+            self.starts.append(self.sealed_count)
+            self.sealed_count += segment['count']
+        self.active = manifest['active']
+        self.active_journal = self._journal(self.active['file'])
+        self._recent = None
+
+    def _manifest(self):
+        return {'schema': self.schema, 'generation': self.generation, 'segments': self.segments, 'active': self.active}
+
+    def _read_manifest(self):
+        """读取清单，从未保存过时返回只有当月空分段的清单"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            month = current_month()
+            return {'schema': self.schema, 'generation': 0, 'segments': [], 'active': {'month': month, 'file': self._file_name(month, 0)}}
+
+    def _write_manifest(self, manifest=None):
+        """保存清单（先写临时文件再替换）"""
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        tmp_path = f'{self.manifest_file}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest or self._manifest(), f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_file)
+
+    def _remove_old_files(self):
+        """删除早于上一代的分段文件"""
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match and int(match.group(1)) < self.generation - 1:
+                os.remove(os.path.join(self.directory, name))
+
+    def _journal(self, file_name):
+        return OperationJournal(os.path.join(self.directory, file_name), self.data_format)
+
+    def _file_name(self, month, generation):
+        return f'operations_{month}.{generation}.{EXTENSIONS[self.data_format]}'
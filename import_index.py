@@ -0,0 +1,108 @@
+import collections
+import hashlib
+import os
+import struct
+import threading
+from array import array
+
+# 内容指纹包含的字段（不含导入时才生成的提交时间）
+CONTENT_FIELDS = ['物资编号', '物品名称', '物资操作', '所属组织', '物品数量', '时间', '操作人', '提交者']
+# 同一物资编号、时间和操作的记录视为同一次操作，内容不同即为冲突
+KEY_FIELDS = ['物资编号', '时间', '物资操作']
+
+_MAGIC = b'WIX1'
+_HEADER = struct.Struct('<qQ')  # 数据代数, 记录条数
+
+
+def fingerprint(item, fields):
+    """按字段计算记录的 64 位指纹（与 Python 的 hash 不同，每次运行结果相同）"""
+    text = '\x1f'.join(str(item.get(field, '')) for field in fields)
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class ImportIndex:
+    """导入去重用的操作记录指纹索引
+
+    按记录顺序保存每条操作记录的内容指纹和 (物资编号, 时间, 物资操作) 指纹，
+    文件中同时记录数据代数和条数。加载后只需为文件之后追加的记录计算指纹；
+    操作记录被整体重写过（代数不同）或对不上时重新计算全部指纹。
+    导入时每一行只需查一次字典，与已有记录的多少无关。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.generation = None  # 指纹对应的数据代数，None 表示还没有指纹
+        self.rows = array('Q')  # 每条记录的内容指纹
+        self.keys = array('Q')  # 每条记录的 (物资编号, 时间, 物资操作) 指纹
+
+    def load(self):
+        """读取保存的指纹，文件不存在或损坏时为空，返回自身"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return self
+        start = len(_MAGIC) + _HEADER.size
+        if data[:len(_MAGIC)] != _MAGIC or len(data) < start:
+            return self
+        generation, count = _HEADER.unpack_from(data, len(_MAGIC))
+        size = count * self.rows.itemsize
+        if len(data) != start + 2 * size:
+            return self
+        self.rows.frombytes(data[start:start + size])
+        self.keys.frombytes(data[start + size:])
+        self.generation = generation
+        return self
+
+    def sync(self, operations, generation):
+        """让指纹与操作记录一致：计算新增记录的指纹，记录被重写过时全部重新计算"""
+        count = len(self.rows)
+        if (self.generation != generation or count > len(operations)
+                or (count and self.rows[-1] != fingerprint(operations[count - 1], CONTENT_FIELDS))):
+            self.rows, self.keys, count = array('Q'), array('Q'), 0
+        self.generation = generation
+        for idx in range(count, len(operations)):
+            item = operations[idx]
+            self.rows.append(fingerprint(item, CONTENT_FIELDS))
+            self.keys.append(fingerprint(item, KEY_FIELDS))
+
+    def save(self):
+        """保存指纹（先写临时文件再替换）"""
+        if self.generation is None:
+            return
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_MAGIC + _HEADER.pack(self.generation, len(self.rows)))
+            f.write(self.rows.tobytes())
+            f.write(self.keys.tobytes())
+        os.replace(tmp_path, self.path)
+
+    def classify(self, new_items):
+        """把待导入的记录分为 (新记录, 已有的记录, 冲突的记录, 已有记录中被跳过的行对应的下标)
+
+        内容与已有记录完全相同的行视为已导入过而跳过；已有记录中同一内容出现几次，
+        就跳过几行，多出的行作为新的重复操作导入。每跳过一行就占用一条内容相同的
+        已有记录，这些记录的下标一起返回，覆盖冲突时不能删除。与所有已有记录内容都不同、
+        但物资编号、时间和操作与已有记录相同的行为冲突。
+        """
+        rows = collections.defaultdict(collections.deque)  # 内容指纹 -> 尚未被占用的已有记录下标
+        for row, value in enumerate(self.rows):
+            rows[value].append(row)
+        keys = set(self.keys)
+
+        inserted, skipped, conflicts, matched = [], [], [], set()
+        for item in new_items:
+            value = fingerprint(item, CONTENT_FIELDS)
+            if rows.get(value):
+                matched.add(rows[value].popleft())
+                skipped.append(item)
+            elif value not in rows and fingerprint(item, KEY_FIELDS) in keys:
+                conflicts.append(item)
+            else:
+                inserted.append(item)
+        return inserted, skipped, conflicts, matched
+
+    def rows_with_keys(self, items, exclude=()):
+        """返回与 items 的 (物资编号, 时间, 物资操作) 相同、且不在 exclude 中的已有记录下标"""
+        wanted = {fingerprint(item, KEY_FIELDS) for item in items}
+        return [row for row, value in enumerate(self.keys) if value in wanted and row not in exclude]
@@ -0,0 +1,185 @@
+import json
+import os
+import re
+
+import file_format
+
+_WHITESPACE = re.compile(r'\s*')
+_ITEM_END = ' \t\r\n,]'
+
+
+def iter_json_array(path, chunk_size=1024 * 1024):
+    """逐个读出 JSON 数组文件中的元素（生成器）
+
+    文件按块读取，内存中只保留尚未解析的部分，不读入整个文件，也不建立包含全部元素的列表。
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        text, pos, offset, eof = '', 0, 0, False
+
+        def more():
+            """丢弃已解析的部分并读入下一块"""
+            nonlocal text, pos, offset, eof
+            chunk = f.read(chunk_size)
+            offset += pos
+            text, pos = text[pos:] + chunk, 0
+            eof = not chunk
+
+        def next_char():
+            """跳过空白，返回下一个字符（文件结束时为空字符串）"""
+            nonlocal pos
+            while True:
+                pos = _WHITESPACE.match(text, pos).end()
+                if pos < len(text) or eof:
+                    return text[pos:pos + 1]
+                more()
+
+        if next_char() != '[':
+            raise ValueError(f'数据文件不是 JSON 数组: {path}')
+        pos += 1
+        if next_char() == ']':
+            return
+        while True:
+            try:
+                item, end = decoder.raw_decode(text, pos)
+            except ValueError:
+                if eof:
+                    raise
+                # 元素还没有读完
+                more()
+                continue
+            if not eof and (end == len(text) or isinstance(item, (int, float)) and text[end] not in _ITEM_END):
+                # 数字在块末尾被截断时前半部分也能解析（如 1.5 只读到 1.），读入更多内容后重新解析
+                more()
+                continue
+            yield item
+            pos = end
+            char = next_char()
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f'数据文件格式错误（第 {offset + pos} 个字符）: {path}')
+            pos += 1
+            next_char()
+
+
+class OperationJournal:
+    """操作记录日志：每条记录一行 JSON（或二进制格式的一帧），只追加不重写
+
+    已有的日志文件按文件头识别格式，新建或整体重写时使用 data_format。
+    """
+
+    def __init__(self, path, data_format='json'):
+        self.path = path
+        self.data_format = data_format
+        self._file_format = None  # 已识别的日志文件格式
+
+    def exists(self):
+        """日志文件是否存在"""
+        return os.path.exists(self.path)
+
+    def file_format(self):
+        """日志文件的格式（文件不存在或为空时为 data_format）"""
+        if self._file_format is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    head = f.read(len(file_format.BINARY_MAGIC))
+            except FileNotFoundError:
+                head = b''
+            if not head:
+                return self.data_format
+            self._file_format = file_format.detect(head)
+        return self._file_format
+
+    def load(self):
+        """读取全部操作记录
+
+        最后一条记录如果不完整（写入过程中断电或崩溃导致），将其丢弃并把文件截断到
+        最后一条完整记录之后，避免后续追加的记录与残缺内容拼接在一起。
+        中间的记录损坏则视为数据错误，直接抛出异常。
+        """
+        records, _ = self.load_from(0)
+        return records
+
+    def load_from(self, offset, records=None):
+        """从字节位置 offset 开始读取之后追加的操作记录（规则同 load）
+
+        Args:
+            records: 存放读入记录的容器（有 append 方法），默认为新的列表
+
+        Returns:
+            (存放读入记录的容器, 最后一条完整记录之后的字节位置)
+        """
+        if records is None:
+            records = []
+        if not self.exists():
+            return records, 0
+
+        data_format = self.file_format()
+        start = max(offset, len(file_format.journal_header(data_format)))
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            content = f.read()
+
+        try:
+            good_end = file_format.parse_records(content, data_format, records)
+        except ValueError as e:
+            raise ValueError(f'操作日志{e}: {self.path}')
+
+        if good_end < len(content):
+            self._truncate(start + good_end)
+
+        return records, start + good_end
+
+    def append(self, record):
+        """追加一条操作记录，写入后立即落盘"""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """追加多条操作记录，只做一次落盘，返回写入后的文件长度"""
+        data_format = self.file_format()
+        content = b''.join(file_format.encode_record(record, data_format) for record in records)
+        with open(self.path, 'ab') as f:
+            if content:
+                if f.tell() == 0:
+                    content = file_format.journal_header(data_format) + content
+                    self._file_format = data_format
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            return os.fstat(f.fileno()).st_size
+
+    def rewrite(self, records):
+        """按 data_format 整体重写日志（仅在删除记录等无法追加的场景使用），返回新文件的长度
+
+        先写入临时文件再替换，保证任何时刻磁盘上都有一份完整的日志。
+        """
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(file_format.journal_header(self.data_format))
+            for record in records:
+                f.write(file_format.encode_record(record, self.data_format))
+            f.flush()
+            os.fsync(f.fileno())
+            size = os.fstat(f.fileno()).st_size
+        os.replace(tmp_path, self.path)
+        self._file_format = self.data_format
+        return size
+
+    def migrate_from(self, legacy_file, convert=None):
+        """将旧版 warehouse_data.json 转换为日志格式
+
+        记录逐条读出、转换并写入日志。转换完成后旧文件改名为 .bak 保留，之后不再读取。
+        """
+        old_data = iter_json_array(legacy_file)
+        if convert is not None:
+            old_data = (convert(item) for item in old_data)
+        self.rewrite(old_data)
+        os.replace(legacy_file, legacy_file + '.bak')
+
+    def _truncate(self, length):
+        """把日志截断到指定长度"""
+        with open(self.path, 'r+b') as f:
+            f.truncate(length)
+            f.flush()
+            os.fsync(f.fileno())
@@ -1,175 +1,123 @@
+import argparse
+import sys
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
 import datetime
-import openpyxl
 import os
-import json
+import time
+import queue
+import threading
+from virtual_table import VirtualTreeview
+from progress_dialog import ProgressDialog
+import profiling
+from profiling import profiler
+from warehouse_core import (WarehouseService, WarehouseError, StorageError, ValidationError,
+                            operation_search_fields, inventory_search_fields, sort_by_time)
+import excel_io
+
 
 class WarehouseManager:
+    SEARCH_DEBOUNCE_MS = 30  # 停止输入多久后开始搜索
+    SEARCH_SLICE_MS = 15  # 每次在主线程中连续搜索的最长时间，超过后让出给界面
+    SEARCH_NARROW_LIMIT = 5000  # 上次结果不超过该行数（或索引尚未建好）时，直接在上次结果中筛选
+    IMPORT_BATCH_SIZE = 1000  # 导入时每批读取、保存的记录数
+    IMPORT_POLL_MS = 50  # 导入、导出期间检查后台进度的间隔
+    EXPORT_CHUNK_SIZE = 2000  # 导出时每次交给写文件线程的行数
+    SYNC_POLL_MS = 2000  # 检查其他程序实例是否修改了数据的间隔
+    WRITE_STATUS_POLL_MS = 300  # 刷新后台保存状态的间隔
+    WRITE_NAMES = {'inventory': '库存', 'config': '配置', 'report': '统计报表'}  # 后台保存的文件在状态栏中的名称
+    
     def __init__(self, root):
         self.root = root
         self.root.title('仓库物资管理系统')
-        self.data = []  # 存储物资操作信息的列表
-        self.inventory = {}  # 存储当前库存信息，格式: {物资编号: {物品信息}}
         self.current_view = 'operations'  # 当前视图模式：'operations'或'inventory'
+        self.last_search = None  # 上次完成的搜索 (视图, 搜索词, 结果行键)
+        self.search_generation = 0  # 每开始一次新搜索加一，旧的分批搜索随之作废
+        self.search_after_id = None
+        self.sort_states = {'operations': None, 'inventory': None}  # 各视图当前的排序 (列名, 是否倒序)
+        self.as_of = None  # 库存视图显示历史库存时为 (查询时间, 库存)
         
-        # 初始化路径
-        self.init_paths()
-        
-        # 加载配置
-        self.load_config()
-        
-        # 加载数据
-        self.load_data()
-        self.load_inventory()
+        # 加载配置、存储和数据，遇到的问题以对话框提示
+        self.core = WarehouseService(os.path.dirname(os.path.abspath(__file__)),
+                                     on_warning=messagebox.showerror)
         
         # 创建界面
         self.create_widgets()
-        
-    def init_paths(self):
-        """初始化路径设置"""
-        self.data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
-        self.output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
-        self.data_file = os.path.join(self.data_dir, 'warehouse_data.json')
-        self.inventory_file = os.path.join(self.data_dir, 'inventory_data.json')
-        self.config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
-        
-        # 确保目录存在
-        for directory in [self.data_dir, self.output_dir]:
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-                
-    def load_config(self):
-        """加载配置文件"""
-        self.organizations = []
-        self.operators = []
-        
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    self.organizations = config.get('organization', {}).get('val', [])
-                    self.operators = config.get('operators', {}).get('val', [])
-            except Exception as e:
-                messagebox.showerror('配置加载错误', f'无法加载配置: {str(e)}')
-                
-    def load_data(self):
-        """从文件加载操作数据"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    old_data = json.load(f)
-                
-                # 转换旧数据到新格式
-                self.data = []
-                for item in old_data:
-                    new_item = {
-                        "提交时间": item.get("提交时间", datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
-                        "物资编号": item.get('物资编号', ''),
-                        "物品名称": item.get('物品名称', ''),
-                        "物资操作": item.get('物资操作', '入库'),  # 默认为入库
-                        "所属组织": item.get('所属组织', ''),
-                        "物品数量": item.get('物品数量', 0),
-                        "时间": item.get('时间', ''),
-                        "操作人": item.get('操作人', ''),
-                        "提交者": item.get('提交者', '')
-                    }
-                    self.data.append(new_item)
-                
-                self.save_data()  # 保存转换后的数据
-            except Exception as e:
-                messagebox.showerror('数据加载错误', f'无法加载数据: {str(e)}')
+        self.root.after(self.SYNC_POLL_MS, self.poll_other_instances)
+        self.root.after(self.WRITE_STATUS_POLL_MS, self.poll_write_status)
+        # 关闭窗口前等待后台保存完成
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
+    
+    @property
+    def data(self):
+        """操作记录（由 WarehouseService 管理）"""
+        return self.core.data
+    
+    @property
+    def inventory(self):
+        """当前库存（由 WarehouseService 管理）"""
+        return self.core.inventory
+    
+    @property
+    def operators(self):
+        return self.core.operators
+    
+    @property
+    def organizations(self):
+        return self.core.organizations
     
-    def load_inventory(self):
-        """从文件加载库存数据"""
-        if os.path.exists(self.inventory_file):
+    def poll_other_instances(self):
+        """定期读入其他程序实例写入的数据并刷新表格
+
+        导入、导出进行中（进度对话框打开）时不刷新，以免正在处理的行发生变化。
+        """
+        if self.root.grab_current() is None and self.core.is_stale():
             try:
-                with open(self.inventory_file, 'r', encoding='utf-8') as f:
-                    self.inventory = json.load(f)
-            except Exception as e:
-                messagebox.showerror('库存数据加载错误', f'无法加载库存数据: {str(e)}')
-                self.inventory = {}
+                if self.core.sync():
+                    self.update_table()
+            except StorageError:
+                # 数据正被其他实例修改，下次再试
+                pass
+        self.root.after(self.SYNC_POLL_MS, self.poll_other_instances)
+    
+    def poll_write_status(self):
+        """在状态栏显示后台保存的进度和错误"""
+        pending, errors = self.core.write_status()
+        if errors:
+            text = '保存失败: ' + '；'.join(f'{self.WRITE_NAMES.get(key, key)}（{error}）' for key, error in errors.items())
+            self.status_label.config(text=text, fg='red')
+        elif pending:
+            self.status_label.config(text='正在保存...', fg='gray')
         else:
-            # 如果库存文件不存在，根据操作记录重新生成库存
-            self.rebuild_inventory_from_operations()
+            self.status_label.config(text='', fg='gray')
+        self.root.after(self.WRITE_STATUS_POLL_MS, self.poll_write_status)
     
-    def rebuild_inventory_from_operations(self):
-        """根据操作记录重建库存数据"""
-        self.inventory = {}
-        
-        for item in self.data:
-            item_id = item.get('物资编号', '')
-            operation = item.get('物资操作', '')
-            qty = item.get('物品数量', 0)
-            
-            if not item_id:
-                continue
-                
-            if operation == '入库' or operation == '物资增添':
-                if item_id not in self.inventory:
-                    # 新物品，添加到库存
-                    self.inventory[item_id] = {
-                        "物资编号": item_id,
-                        "物品名称": item.get('物品名称', ''),
-                        "所属组织": item.get('所属组织', ''),
-                        "物品数量": qty,
-                        "最后操作": item.get('物资操作', ''),
-                        "最后操作人": item.get('操作人', ''),
-                        "最后操作时间": item.get('时间', ''),
-                        "备注": ""
-                    }
-                else:
-                    # 现有物品，增加数量
-                    self.inventory[item_id]['物品数量'] += qty
-                    self.inventory[item_id]['最后操作'] = operation
-                    self.inventory[item_id]['最后操作人'] = item.get('操作人', '')
-                    self.inventory[item_id]['最后操作时间'] = item.get('时间', '')
-            
-            elif operation == '出库':
-                # 完全出库，从库存中移除
-                if item_id in self.inventory:
-                    del self.inventory[item_id]
-            
-            elif operation == '部分出库':
-                # 部分出库，减少数量
-                if item_id in self.inventory:
-                    self.inventory[item_id]['物品数量'] -= qty
-                    if self.inventory[item_id]['物品数量'] <= 0:
-                        # 如果数量减至0或以下，移除物品
-                        del self.inventory[item_id]
-                    else:
-                        # 更新最后操作信息
-                        self.inventory[item_id]['最后操作'] = operation
-                        self.inventory[item_id]['最后操作人'] = item.get('操作人', '')
-                        self.inventory[item_id]['最后操作时间'] = item.get('时间', '')
-        
-        # 保存重建后的库存
-        self.save_inventory()
+    def on_close(self):
+        """关闭窗口：先保存全部内容，保存失败时让用户决定是否仍然退出"""
+        errors = self.core.flush()
+        if errors:
+            details = '\n'.join(f'{self.WRITE_NAMES.get(key, key)}: {error}' for key, error in errors.items())
+            if not messagebox.askyesno('保存错误',
+                                       f'以下内容未能保存:\n{details}\n\n'
+                                       '操作记录已经保存，库存可以在下次启动时重建。仍要退出吗？'):
+                return
+        self.core.close()
+        self.root.destroy()
     
-    def save_data(self):
-        """保存数据到文件"""
-        try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            messagebox.showerror('数据保存错误', f'无法保存数据: {str(e)}')
-
-    def save_inventory(self):
-        """保存库存数据到文件"""
-        try:
-            with open(self.inventory_file, 'w', encoding='utf-8') as f:
-                json.dump(self.inventory, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            messagebox.showerror('库存数据保存错误', f'无法保存库存数据: {str(e)}')
-
     def create_widgets(self):
         """创建界面组件"""
         self.create_view_selector()
         self.create_search_panel()
         self.create_button_panel()
+        self.create_status_bar()
         self.create_table()
         self.update_table()
     
+    def create_status_bar(self):
+        """创建窗口底部显示保存状态的状态栏"""
+        self.status_label = tk.Label(self.root, text='', fg='gray', anchor=tk.W)
+        self.status_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+    
     def create_view_selector(self):
         """创建视图选择器"""
         selector_frame = tk.Frame(self.root)
@@ -181,14 +129,55 @@ class WarehouseManager:
                       value='operations', command=self.switch_view).pack(side=tk.LEFT)
         tk.Radiobutton(selector_frame, text='当前库存', variable=self.view_var, 
                       value='inventory', command=self.switch_view).pack(side=tk.LEFT, padx=10)
+        
+        # 历史库存查询，只在库存视图中显示
+        self.as_of_frame = tk.Frame(selector_frame)
+        tk.Label(self.as_of_frame, text='截至时间:').pack(side=tk.LEFT)
+        self.as_of_var = tk.StringVar(value=datetime.datetime.now().strftime('%Y-%m-%d'))
+        as_of_entry = tk.Entry(self.as_of_frame, textvariable=self.as_of_var, width=18)
+        as_of_entry.pack(side=tk.LEFT, padx=5)
+        as_of_entry.bind('<Return>', lambda event: self.show_inventory_as_of())
+        tk.Button(self.as_of_frame, text='查看历史库存', command=self.show_inventory_as_of).pack(side=tk.LEFT)
+        tk.Button(self.as_of_frame, text='当前库存', command=self.show_current_inventory).pack(side=tk.LEFT, padx=5)
+        self.as_of_label = tk.Label(self.as_of_frame, text='', fg='blue')
+        self.as_of_label.pack(side=tk.LEFT)
     
     def switch_view(self):
         """切换视图模式"""
         self.current_view = self.view_var.get()
+        if self.current_view == 'inventory':
+            self.as_of_frame.pack(side=tk.RIGHT)
+        else:
+            self.as_of_frame.pack_forget()
         # 切换视图时重新创建表格
         self.create_table()
         self.update_table()
     
+    def show_inventory_as_of(self):
+        """按操作时间重放，显示截至某一时刻的库存"""
+        time_text = self.as_of_var.get().strip()
+        try:
+            inventory, skipped = self.core.inventory_as_of(time_text)
+        except ValidationError as e:
+            messagebox.showerror('错误', str(e))
+            return
+        
+        self.as_of = (time_text, inventory)
+        self.as_of_label.config(text=f'正在显示 {time_text} 的库存（{len(inventory)}项）')
+        self.update_table(keep_position=False)
+        if skipped:
+            messagebox.showwarning('提示', f'有{skipped}条操作记录的时间无法识别，没有计入历史库存')
+    
+    def show_current_inventory(self):
+        """从历史库存回到当前库存"""
+        self.as_of = None
+        self.as_of_label.config(text='')
+        self.update_table(keep_position=False)
+    
+    def shown_inventory(self):
+        """库存视图中显示的库存（历史库存或当前库存）"""
+        return self.as_of[1] if self.as_of else self.inventory
+    
     def create_search_panel(self):
         """创建搜索面板"""
         search_frame = tk.Frame(self.root)
@@ -199,7 +188,7 @@ class WarehouseManager:
         self.search_var = tk.StringVar()
         search_entry = tk.Entry(search_frame, textvariable=self.search_var)
         search_entry.pack(side=tk.LEFT, padx=5)
-        search_entry.bind('<KeyRelease>', lambda e: self.update_table())
+        search_entry.bind('<KeyRelease>', self.on_search_changed)
 
     def create_button_panel(self):
         """创建按钮面板"""
@@ -211,22 +200,137 @@ class WarehouseManager:
         tk.Button(btn_frame, text='物资增添', command=lambda: self.add_quantity('物资增添')).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text='部分出库', command=lambda: self.remove_item('部分出库')).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text='导入Excel', command=self.import_excel).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text='导入文件夹', command=self.import_excel_folder).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text='导出Excel', command=self.export_excel).pack(side=tk.LEFT, padx=5)
         # 添加重建库存按钮
         tk.Button(btn_frame, text='重建库存', command=self.rebuild_inventory).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text='统计报表', command=self.open_reports).pack(side=tk.LEFT, padx=5)
+        if profiler.enabled:
+            tk.Button(btn_frame, text='性能诊断', command=self.open_diagnostics).pack(side=tk.LEFT, padx=5)
 
     def rebuild_inventory(self):
         """手动重建库存数据"""
         if messagebox.askyesno('确认', '确定要根据所有操作记录重新构建库存数据吗？'):
-            self.rebuild_inventory_from_operations()
+            try:
+                self.core.rebuild_inventory_from_operations()
+            except StorageError as e:
+                messagebox.showerror(e.title, str(e))
+                self.update_table()
+                return
             self.update_table()
             messagebox.showinfo('完成', '库存数据已重建')
 
+    def open_reports(self):
+        """打开统计报表窗口
+
+        第一次打开时读取保存的统计，只累加之后新增的记录；没有可用的统计时
+        才统计全部操作记录并显示进度。之后随新增记录累加，再次打开不用等待。
+        """
+        if self.core.operation_report is None:
+            dialog = ProgressDialog(self.root, '统计报表', '正在统计操作记录...')
+            self.prepare_reports(dialog)
+        else:
+            self.show_reports()
+    
+    def prepare_reports(self, dialog):
+        """分批统计全部操作记录（每批不超过 SEARCH_SLICE_MS），完成后显示报表"""
+        if dialog.cancelled.is_set():
+            # 已统计的部分保留，下次打开报表时继续
+            dialog.close()
+            return
+        steps = self.core.report_steps()
+        deadline = time.perf_counter() + self.SEARCH_SLICE_MS / 1000
+        try:
+            while time.perf_counter() < deadline:
+                done = next(steps)
+        except StopIteration:
+            dialog.close()
+            self.show_reports()
+            return
+        dialog.update(done, len(self.data), f'已统计{done}/{len(self.data)}条操作记录')
+        self.root.after(1, self.prepare_reports, dialog)
+    
+    def show_reports(self):
+        """显示统计报表窗口"""
+        reports = self.core.reports()
+        
+        win = tk.Toplevel(self.root)
+        win.title('统计报表')
+        win.geometry('700x450')
+        
+        notebook = ttk.Notebook(win)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        tabs = [
+            ('各组织库存', ('所属组织', '物品种数', '物品总数量'), reports['organizations']),
+            ('各操作人出入库', ('操作人', '入库数量', '出库数量', '操作次数'), reports['operators']),
+            ('每月出入库', ('月份', '入库数量', '出库数量', '操作次数'), reports['months']),
+            ('出入库最多的物品', ('物资编号', '物品名称', '入库数量', '出库数量', '操作次数'), reports['top_items']),
+        ]
+        for title, columns, rows in tabs:
+            frame = tk.Frame(notebook)
+            notebook.add(frame, text=title)
+            
+            tree = ttk.Treeview(frame, columns=columns, show='headings')
+            for col in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=120)
+            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            tree.pack(fill=tk.BOTH, expand=True)
+            
+            for row in rows:
+                tree.insert('', tk.END, values=row)
+    
+    def open_diagnostics(self):
+        """打开性能诊断窗口，显示各环节的调用次数和耗时"""
+        win = tk.Toplevel(self.root)
+        win.title('性能诊断')
+        win.geometry('760x420')
+        
+        text = tk.Text(win, font=('Courier', 10), wrap=tk.NONE)
+        
+        def refresh():
+            text.config(state=tk.NORMAL)
+            text.delete('1.0', tk.END)
+            text.insert(tk.END, profiler.format_summary())
+            text.config(state=tk.DISABLED)
+        
+        def reset():
+            profiler.reset()
+            refresh()
+        
+        def dump():
+            file_path = filedialog.asksaveasfilename(
+                parent=win,
+                initialdir=self.core.output_dir,
+                initialfile=f"性能诊断_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                defaultextension='.json',
+                filetypes=[('JSON文件', '*.json')]
+            )
+            if not file_path:
+                return
+            try:
+                profiler.dump(file_path)
+            except OSError as e:
+                messagebox.showerror('保存错误', f'无法保存诊断结果: {str(e)}', parent=win)
+                return
+            messagebox.showinfo('保存成功', f'诊断结果已保存到 {file_path}', parent=win)
+        
+        btn_frame = tk.Frame(win)
+        btn_frame.pack(fill=tk.X, padx=10, pady=5)
+        tk.Button(btn_frame, text='刷新', command=refresh).pack(side=tk.LEFT)
+        tk.Button(btn_frame, text='清零', command=reset).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text='保存到文件', command=dump).pack(side=tk.LEFT, padx=5)
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        refresh()
+    
     def create_table(self):
         """创建数据表格"""
         # 移除现有表格（如果存在）
-        if hasattr(self, 'tree'):
-            self.tree.destroy()
+        if hasattr(self, 'table'):
+            self.table.destroy()
         
         if self.current_view == 'operations':
             # 操作记录视图
@@ -235,7 +339,9 @@ class WarehouseManager:
             # 库存视图
             columns = ('物资编号', '物品名称', '所属组织', '物品数量', '最后操作', '最后操作人', '最后操作时间', '备注')
         
-        self.tree = ttk.Treeview(self.root, columns=columns, show='headings')
+        # 表格中只保留可见的行，滚动时再按需取数据
+        self.table = VirtualTreeview(self.root, columns, self.row_values)
+        self.tree = self.table.tree
         
         # 配置列
         for col in columns:
@@ -245,82 +351,136 @@ class WarehouseManager:
             else:
                 self.tree.column(col, width=100)
         
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+    def update_table(self, keep_position=True):
+        """更新表格数据显示
         
-    def update_table(self):
-        """更新表格数据显示"""
+        Args:
+            keep_position: 是否保持当前滚动位置（搜索条件变化时回到顶部）
+        """
         search = self.search_var.get().lower()
         
-        # 清空表格
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-            
+        # 正在分批进行的搜索已经过期
+        self.search_generation += 1
+        
+        # 操作记录视图的行键为记录下标，库存视图的行键为物资编号
+        rows = self.search_rows(search)
+        
+        self.last_search = (self.current_view, search, rows)
+        self.table.set_rows(self.apply_sort(rows), keep_position)
+    
+    def on_search_changed(self, event=None):
+        """搜索框内容变化：连续输入时只在停顿后搜索一次"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(self.SEARCH_DEBOUNCE_MS, self.start_search)
+    
+    def start_search(self):
+        """开始一次搜索，并放弃仍在进行的旧搜索"""
+        self.search_after_id = None
+        search = self.search_var.get().lower()
+        
+        # 放弃仍在进行的旧搜索
+        self.search_generation += 1
+        
+        previous = self.last_search
+        if previous and previous[0] == self.current_view and previous[1] == search:
+            return
+        
+        if (previous and previous[0] == self.current_view and previous[1] and previous[1] in search
+                and (len(previous[2]) <= self.SEARCH_NARROW_LIMIT or self.core.operations_index is None)):
+            # 新搜索词包含上次的搜索词，结果一定在上次结果之中；
+            # 上次结果较多且索引可用时，直接查索引更快
+            job = self.narrow_search(previous[2], search)
+        else:
+            job = self.full_search(search)
+        self.run_search_job(self.search_generation, self.current_view, search, job)
+    
+    def run_search_job(self, generation, view, search, job):
+        """分批执行搜索，每批不超过 SEARCH_SLICE_MS，其余的交给 after() 继续"""
+        if generation != self.search_generation:
+            return
+        
+        deadline = time.perf_counter() + self.SEARCH_SLICE_MS / 1000
+        try:
+            while time.perf_counter() < deadline:
+                next(job)
+        except StopIteration as done:
+            rows = done.value
+            self.last_search = (view, search, rows)
+            self.table.set_rows(self.apply_sort(rows), keep_position=False)
+            return
+        
+        self.root.after(1, lambda: self.run_search_job(generation, view, search, job))
+    
+    def full_search(self, search):
+        """在全部记录中搜索（生成器，完成时返回结果）"""
+        if self.current_view == 'operations' and search and self.core.operations_index is None:
+            # 不用 yield from：本次搜索被放弃时不能连带关闭共用的索引构建
+            for _ in self.core.operations_index_steps():
+                yield
+        return self.search_rows(search)
+    
+    def search_rows(self, search):
+        """返回当前视图中符合搜索条件的行键"""
+        if self.current_view == 'inventory' and self.as_of:
+            return self.core.search_snapshot(self.as_of[1], search)
+        return self.core.search(self.current_view, search)
+    
+    def narrow_search(self, rows, search, chunk_size=2000):
+        """在上次的结果中筛选（生成器，每批之后让出一次，完成时返回结果）"""
         if self.current_view == 'operations':
-            # 更新操作记录视图
-            for item in self.data:
-                # 检查是否符合搜索条件
-                searchable_fields = [
-                    str(item.get('物资编号', '')), 
-                    item.get('物品名称', ''), 
-                    item.get('物资操作', ''),
-                    item.get('所属组织', ''), 
-                    str(item.get('物品数量', '')),
-                    item.get('时间', ''),
-                    item.get('操作人', ''),
-                    item.get('提交者', ''),
-                    item.get('提交时间', '')
-                ]
-                
-                if search and not any(search in field.lower() for field in searchable_fields):
-                    continue
-                    
-                self.tree.insert('', tk.END, values=(
-                    item.get('物资编号', ''),
-                    item.get('物品名称', ''),
-                    item.get('物资操作', ''),
-                    item.get('所属组织', ''),
-                    item.get('物品数量', 0),
-                    item.get('时间', ''),
-                    item.get('操作人', ''),
-                    item.get('提交者', ''),
-                    item.get('提交时间', '')
-                ))
+            matches = lambda key: any(search in str(field).lower() for field in operation_search_fields(self.data[key]))
         else:
-            # 更新库存视图
-            for item_id, item in self.inventory.items():
-                # 检查是否符合搜索条件
-                searchable_fields = [
-                    item_id,
-                    item.get('物品名称', ''),
-                    item.get('所属组织', ''),
-                    str(item.get('物品数量', '')),
-                    item.get('最后操作', ''),
-                    item.get('最后操作人', ''),
-                    item.get('最后操作时间', ''),
-                    item.get('备注', '')
-                ]
-                
-                if search and not any(search in field.lower() for field in searchable_fields):
-                    continue
-                    
-                self.tree.insert('', tk.END, values=(
-                    item_id,
-                    item.get('物品名称', ''),
-                    item.get('所属组织', ''),
-                    item.get('物品数量', 0),
-                    item.get('最后操作', ''),
-                    item.get('最后操作人', ''),
-                    item.get('最后操作时间', ''),
-                    item.get('备注', '')
-                ))
+            matches = lambda key: any(search in str(field).lower() for field in inventory_search_fields(key, self.shown_inventory()[key]))
+        
+        result = []
+        for start in range(0, len(rows), chunk_size):
+            result.extend(key for key in rows[start:start + chunk_size] if matches(key))
+            yield
+        return result
     
-    def generate_new_id(self):
-        """检查物资编号是否重复，不再自动生成"""
-        return None  # 返回None表示不自动生成ID
+    def row_values(self, key):
+        """返回表格中一行显示的值"""
+        if self.current_view == 'operations':
+            item = self.data[key]
+            return (
+                item.get('物资编号', ''),
+                item.get('物品名称', ''),
+                item.get('物资操作', ''),
+                item.get('所属组织', ''),
+                item.get('物品数量', 0),
+                item.get('时间', ''),
+                item.get('操作人', ''),
+                item.get('提交者', ''),
+                item.get('提交时间', '')
+            )
+        else:
+            item = self.shown_inventory().get(key, {})
+            return (
+                key,
+                item.get('物品名称', ''),
+                item.get('所属组织', ''),
+                item.get('物品数量', 0),
+                item.get('最后操作', ''),
+                item.get('最后操作人', ''),
+                item.get('最后操作时间', ''),
+                item.get('备注', '')
+            )
+    
+    def get_selected_item_id(self):
+        """返回表格中选中行对应的物资编号，没有选中时提示并返回 None"""
+        key = self.table.selected_key()
+        if key is None:
+            messagebox.showwarning('提示', '请先选择物资')
+            return None
+        
+        if self.current_view == 'operations':
+            # 操作记录视图的行键是记录下标
+            return self.data[key].get('物资编号', '')
+        # 库存视图的行键就是物资编号
+        return key
     
     def add_item(self):
         """添加新物资（入库）"""
@@ -328,31 +488,12 @@ class WarehouseManager:
     
     def add_quantity(self, operation_type):
         """增加物资数量"""
-        if self.current_view == 'operations':
-            # 从操作记录视图选择物品
-            selected = self.tree.selection()
-            if not selected:
-                messagebox.showwarning('提示', '请先选择物资')
-                return
-                
-            idx = self.tree.index(selected[0])
-            item = self.data[idx]
-            item_id = item.get('物资编号', '')
-            
-            # 打开对话框
-            self.open_operation_dialog(operation_type, item_id)
-        else:
-            # 从库存视图选择物品
-            selected = self.tree.selection()
-            if not selected:
-                messagebox.showwarning('提示', '请先选择物资')
-                return
-                
-            item_values = self.tree.item(selected[0], 'values')
-            item_id = item_values[0]  # 第一列是物资编号
-            
-            # 打开对话框
-            self.open_operation_dialog(operation_type, item_id)
+        item_id = self.get_selected_item_id()
+        if item_id is None:
+            return
+        
+        # 打开对话框
+        self.open_operation_dialog(operation_type, item_id)
     
     def open_operation_dialog(self, operation_type, item_id):
         """打开操作对话框，用于物资增添或部分出库"""
@@ -420,94 +561,16 @@ class WarehouseManager:
     def save_operation(self, win, operation_type, item_id, qty_entry, time_entry, operator_var, submitter_var, current_qty):
         """保存操作结果"""
         try:
-            # 获取操作数量
-            try:
-                qty = int(qty_entry.get())
-                if qty <= 0:
-                    raise ValueError('操作数量必须大于0')
-            except ValueError:
-                raise ValueError('请输入有效的数量')
-            
-            # 获取时间
-            time_str = time_entry.get()
-            try:
-                datetime.datetime.strptime(time_str, '%Y-%m-%d %H:%M')
-            except ValueError:
-                raise ValueError('时间格式不正确，应为：年-月-日 时:分 (如 2023-05-16 14:30)')
-            
-            # 获取操作人和提交者
-            operator = operator_var.get().strip()
-            submitter = submitter_var.get().strip()
-            
-            if not operator:
-                raise ValueError('请输入操作人')
-            if not submitter:
-                raise ValueError('请输入提交者')
-            
-            # 获取物品信息
-            inventory_item = self.inventory.get(item_id, {})
-            item_name = inventory_item.get('物品名称', '')
-            organization = inventory_item.get('所属组织', '')
-            
-            # 创建操作记录
-            operation = {
-                "提交时间": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "物资编号": item_id,
-                "物品名称": item_name,
-                "物资操作": operation_type,
-                "所属组织": organization,
-                "物品数量": qty,
-                "时间": time_str,
-                "操作人": operator,
-                "提交者": submitter
-            }
-            
-            # 添加操作记录
-            self.data.append(operation)
-            self.save_data()
-            
-            # 更新库存
-            if operation_type == '物资增添':
-                if item_id in self.inventory:
-                    self.inventory[item_id]['物品数量'] += qty
-                    self.inventory[item_id]['最后操作'] = operation_type
-                    self.inventory[item_id]['最后操作人'] = operator
-                    self.inventory[item_id]['最后操作时间'] = time_str
-                    new_qty = self.inventory[item_id]['物品数量']
-                    messagebox.showinfo('成功', f'已增加 {qty} 个物品，现有 {new_qty} 个')
-                else:
-                    messagebox.showerror('错误', f'库存中不存在编号为"{item_id}"的物品')
-            
-            elif operation_type == '部分出库':
-                if item_id in self.inventory:
-                    if qty > self.inventory[item_id]['物品数量']:
-                        raise ValueError(f'出库数量不能超过当前库存 ({self.inventory[item_id]["物品数量"]})')
-                    
-                    self.inventory[item_id]['物品数量'] -= qty
-                    self.inventory[item_id]['最后操作'] = operation_type
-                    self.inventory[item_id]['最后操作人'] = operator
-                    self.inventory[item_id]['最后操作时间'] = time_str
-                    
-                    new_qty = self.inventory[item_id]['物品数量']
-                    
-                    if new_qty <= 0:
-                        # 如果数量减至0或以下，移除物品
-                        del self.inventory[item_id]
-                        messagebox.showinfo('成功', f'已出库 {qty} 个物品，物品已从库存中移除')
-                    else:
-                        messagebox.showinfo('成功', f'已出库 {qty} 个物品，剩余 {new_qty} 个')
-                else:
-                    messagebox.showerror('错误', f'库存中不存在编号为"{item_id}"的物品')
-            
-            self.save_inventory()
-            self.update_table()
-            win.destroy()
-            
-            # 更新操作者和提交者到配置
-            self.update_operators([operator, submitter])
-            
-        except Exception as e:
+            operation, message = self.core.record_stock_operation(
+                operation_type, item_id, qty_entry.get(), time_entry.get(),
+                operator_var.get(), submitter_var.get())
+        except WarehouseError as e:
             messagebox.showerror('错误', str(e))
+            return
+        
+        self.update_table()
+        messagebox.showinfo('成功', message)
+        win.destroy()
     
     def open_add_item_dialog(self, operation_type):
         """打开添加物资对话框（入库）"""
@@ -579,86 +642,15 @@ class WarehouseManager:
     def save_new_item(self, win, entry_id, entry_name, operation_var, org_var, entry_count, entry_date, operator_var, submitter_var):
         """保存新添加的物资"""
         try:
-            item_id = entry_id.get().strip()
-            item_name = entry_name.get().strip()
-            operation = operation_var.get()
-            organization = org_var.get()
-            operator = operator_var.get().strip()
-            submitter = submitter_var.get().strip()
-            
-            # 验证编号是否为空
-            if not item_id:
-                raise ValueError('请输入物资编号')
-            
-            # 检查编号是否重复
-            if operation == '入库' and item_id in self.inventory:
-                raise ValueError('编号已存在于库存中，请使用其他编号或选择"物资增添"操作')
-            
-            # 验证操作者和提交者是否填写
-            if not operator:
-                raise ValueError('请输入操作人姓名')
-                
-            if not submitter:
-                raise ValueError('请输入提交者姓名')
-                
-            try:
-                count = int(entry_count.get())
-                if count <= 0:
-                    raise ValueError('数量必须大于0')
-            except:
-                raise ValueError('请输入有效的数量')
-            
-            now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            item = {
-                "提交时间": now,
-                "物资编号": item_id,
-                "物品名称": item_name,
-                "物资操作": operation,
-                "所属组织": organization,
-                "物品数量": count,
-                "时间": entry_date.get(),
-                "操作人": operator,
-                "提交者": submitter
-            }
-            
-            # 验证所有字段
-            if not item['物资编号'] or not item['物品名称'] or not item['所属组织'] or not item['时间']:
-                raise ValueError('编号、名称、所属组织和时间为必填项')
-                
-            # 验证日期时间格式
-            time_str = item['时间']
-            try:
-                datetime.datetime.strptime(time_str, '%Y-%m-%d %H:%M')
-            except ValueError:
-                raise ValueError('时间格式不正确，应为：年-月-日 时:分 (如 2023-05-16 14:30)')
-            
-            # 添加到操作记录
-            self.data.append(item)
-            self.save_data()
-            
-            # 更新库存
-            if operation == '入库':
-                # 更新或添加库存
-                self.inventory[item_id] = {
-                    "物资编号": item_id,
-                    "物品名称": item_name,
-                    "所属组织": organization,
-                    "物品数量": count,
-                    "最后操作": operation,
-                    "最后操作人": operator,
-                    "最后操作时间": time_str,
-                    "备注": ""
-                }
-                self.save_inventory()
-                
-            self.update_table()
-            win.destroy()
-            
-            # 更新操作者和提交者到配置
-            self.update_operators([operator, submitter])
-            
-        except Exception as e:
+            self.core.add_new_item(
+                entry_id.get(), entry_name.get(), operation_var.get(), org_var.get(),
+                entry_count.get(), entry_date.get(), operator_var.get(), submitter_var.get())
+        except WarehouseError as e:
             messagebox.showerror('错误', str(e))
+            return
+        
+        self.update_table()
+        win.destroy()
     
     def open_complete_removal_dialog(self, item_id):
         """打开完全出库对话框"""
@@ -712,135 +704,42 @@ class WarehouseManager:
     def complete_item_removal(self, win, item_id, time_entry, operator_var, submitter_var):
         """完成物品完全出库"""
         try:
-            # 获取时间
-            time_str = time_entry.get()
-            try:
-                datetime.datetime.strptime(time_str, '%Y-%m-%d %H:%M')
-            except ValueError:
-                raise ValueError('时间格式不正确，应为：年-月-日 时:分 (如 2023-05-16 14:30)')
-                
-            operator = operator_var.get().strip()
-            submitter = submitter_var.get().strip()
-            
-            if not operator:
-                raise ValueError('请输入操作人')
-            if not submitter:
-                raise ValueError('请输入提交者')
-            
-            # 获取物品信息
-            if item_id not in self.inventory:
-                raise ValueError(f'库存中不存在编号为"{item_id}"的物品')
-                
-            inventory_item = self.inventory[item_id]
-            item_name = inventory_item.get('物品名称', '')
-            organization = inventory_item.get('所属组织', '')
-            qty = inventory_item.get('物品数量', 0)
-            
-            # 创建操作记录
-            operation = {
-                "提交时间": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "物资编号": item_id,
-                "物品名称": item_name,
-                "物资操作": '出库',
-                "所属组织": organization,
-                "物品数量": qty,
-                "时间": time_str,
-                "操作人": operator,
-                "提交者": submitter
-            }
-            
-            # 添加操作记录
-            self.data.append(operation)
-            self.save_data()
-            
-            # 记录日志
-            self.log_operation_to_file(operation, operator, submitter, "完全出库")
-            
-            # 从库存中删除物品
-            del self.inventory[item_id]
-            self.save_inventory()
-            
-            self.update_table()
-            
-            messagebox.showinfo('出库成功', '物资已完全出库！')
-            win.destroy()
-            
-            # 更新操作者和提交者到配置
-            self.update_operators([operator, submitter])
-            
-        except Exception as e:
+            self.core.remove_item(item_id, time_entry.get(), operator_var.get(), submitter_var.get())
+        except (WarehouseError, OSError) as e:
             messagebox.showerror('错误', str(e))
+            return
+        
+        self.update_table()
+        messagebox.showinfo('出库成功', '物资已完全出库！')
+        win.destroy()
     
-    def log_operation_to_file(self, item, operator, submitter, operation_type):
-        """记录操作到历史文件"""
-        now = datetime.datetime.now()
-        log_dir = os.path.join(self.data_dir, 'logs')
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            
-        log_file = os.path.join(log_dir, f'operation_log_{now.strftime("%Y%m")}.txt')
+    def sort_by(self, col, reverse):
+        """按列排序表格显示（不改变操作记录和库存数据本身的顺序）"""
+        if col not in self.tree['columns']:
+            return
         
-        log_entry = (f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] "
-                    f"操作: {operation_type}, 操作人: {operator}, 提交者: {submitter}, "
-                    f"物品: {item.get('物品名称', '')}(编号:{item.get('物资编号', '')}), "
-                    f"数量: {item.get('物品数量', 0)}\n")
+        self.sort_states[self.current_view] = (col, reverse)
+        self.update_table()
+        # 下次点击反向排序
+        self.tree.heading(col, command=lambda: self.sort_by(col, not reverse))
+    
+    def apply_sort(self, rows):
+        """按当前视图的排序状态排列搜索结果"""
+        state = self.sort_states[self.current_view]
+        if state is None:
+            return rows
         
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
-
-    def sort_by(self, col, reverse):
-        """按列排序表格数据"""
-        if self.current_view == 'operations':
-            # 操作记录视图排序
-            column_map = {
-                '物资编号': '物资编号', 
-                '物品名称': '物品名称',
-                '物资操作': '物资操作', 
-                '所属组织': '所属组织', 
-                '物品数量': '物品数量', 
-                '时间': '时间',
-                '操作人': '操作人',
-                '提交者': '提交者',
-                '提交时间': '提交时间'
-            }
-            
-            if col in column_map:
-                # 按照指定列排序
-                key = column_map[col]
-                self.data.sort(key=lambda x: x.get(key, ''), reverse=reverse)
-                self.update_table()
-                # 下次点击反向排序
-                self.tree.heading(col, command=lambda: self.sort_by(col, not reverse))
-        else:
-            # 库存视图排序
-            column_map = {
-                '物资编号': '物资编号', 
-                '物品名称': '物品名称',
-                '所属组织': '所属组织', 
-                '物品数量': '物品数量', 
-                '最后操作': '最后操作',
-                '最后操作人': '最后操作人',
-                '最后操作时间': '最后操作时间',
-                '备注': '备注'
-            }
-            
-            if col in column_map:
-                # 将字典转为列表便于排序
-                inventory_list = list(self.inventory.values())
-                
-                # 按照指定列排序
-                key = column_map[col]
-                inventory_list.sort(key=lambda x: x.get(key, ''), reverse=reverse)
-                
-                # 更新排序后的库存字典
-                self.inventory = {item['物资编号']: item for item in inventory_list}
-                
-                self.update_table()
-                # 下次点击反向排序
-                self.tree.heading(col, command=lambda: self.sort_by(col, not reverse))
+        col, reverse = state
+        if self.current_view == 'inventory' and self.as_of:
+            return self.core.sorted_snapshot(self.as_of[1], col, reverse, rows)
+        return self.core.sorted_rows(self.current_view, col, reverse, rows)
     
     def import_excel(self):
-        """从Excel导入数据"""
+        """从Excel导入数据
+
+        后台线程以只读方式逐批读取并校验各行，主线程显示进度；
+        确认后分批提交到存储，读取和提交过程中都可以取消。
+        """
         file_path = filedialog.askopenfilename(
             filetypes=[('Excel文件', '*.xlsx *.xls')],
             title='选择要导入的Excel文件'
@@ -848,332 +747,385 @@ class WarehouseManager:
         
         if not file_path:
             return
-            
+        
+        dialog = ProgressDialog(self.root, '导入Excel', '正在读取Excel文件...')
+        results = queue.Queue()
+        threading.Thread(target=self.read_excel_worker,
+                         args=(lambda: excel_io.iter_workbook_batches(file_path, self.IMPORT_BATCH_SIZE),
+                               dialog.cancelled, results), daemon=True).start()
+        self.poll_excel_import(dialog, results, [], [])
+    
+    def import_excel_folder(self):
+        """从文件夹导入全部Excel文件
+
+        多个子进程并行读取和校验各个文件，主线程显示进度；
+        全部读完后按时间排列，确认后一次保存。
+        """
+        folder = filedialog.askdirectory(title='选择包含Excel文件的文件夹')
+        
+        if not folder:
+            return
+        
+        dialog = ProgressDialog(self.root, '导入文件夹', '正在读取Excel文件...')
+        results = queue.Queue()
+        threading.Thread(target=self.read_excel_worker,
+                         args=(lambda: excel_io.iter_folder_batches(folder), dialog.cancelled, results),
+                         daemon=True).start()
+        self.poll_excel_import(dialog, results, [], [], '个文件', single_commit=True)
+    
+    def read_excel_worker(self, open_batches, cancelled, results):
+        """后台线程：逐批读取并校验Excel中的记录，通过队列交给主线程
+
+        Args:
+            open_batches: 返回 (有效记录, 错误信息, 已读取数, 总数) 迭代器的函数
+        """
         try:
-            # 打开Excel文件
-            wb = openpyxl.load_workbook(file_path)
-            ws = wb.active
-            
-            # 获取表头行
-            headers = [str(cell.value) if cell.value else "" for cell in ws[1]]
-            
-            # 通过相似度匹配表头
-            required_headers = ['物资编号', '物品名称', '物资操作', '所属组织', '物品数量', '时间', '操作人', '提交者']
-            header_mapping = self.match_headers(headers, required_headers)
-            
-            missing_headers = [h for h in required_headers if h not in header_mapping]
-            
-            if missing_headers:
-                messagebox.showerror('导入错误', f'Excel文件缺少必要的列: {", ".join(missing_headers)}')
-                return
+            for batch in open_batches():
+                if cancelled.is_set():
+                    break
+                results.put(('batch', batch))
+            results.put(('done', None))
+        except excel_io.ExcelFormatError as e:
+            results.put(('error', str(e)))
+        except Exception as e:
+            results.put(('error', f'导入Excel时发生错误: {str(e)}'))
+    
+    def poll_excel_import(self, dialog, results, new_items, invalid_rows, unit='行', single_commit=False):
+        """主线程：收取后台读取的结果并更新进度
+
+        Args:
+            unit: 进度的单位（逐行读取一个文件或逐个读取文件夹中的文件）
+            single_commit: 是否把全部记录一次保存（否则分批保存）
+        """
+        try:
+            while True:
+                kind, payload = results.get_nowait()
+                if kind == 'batch':
+                    items, errors, done, total = payload
+                    new_items.extend(items)
+                    invalid_rows.extend(errors)
+                    dialog.update(done, total, f'已读取{done}{unit}，有效记录{len(new_items)}条')
+                    continue
                 
-            # 读取数据
-            new_items = []
-            invalid_rows = []
-            for row_idx, row in enumerate(ws.iter_rows(min_row=2), start=2):
+                dialog.close()
+                if kind == 'error':
+                    messagebox.showerror('导入错误', payload)
+                elif dialog.cancelled.is_set():
+                    messagebox.showinfo('导入取消', '导入已取消，没有记录被导入')
+                else:
+                    self.confirm_excel_import(new_items, invalid_rows, single_commit)
+                return
+        except queue.Empty:
+            pass
+        self.root.after(self.IMPORT_POLL_MS, self.poll_excel_import, dialog, results, new_items, invalid_rows,
+                        unit, single_commit)
+    
+    def confirm_excel_import(self, new_items, invalid_rows, single_commit=False):
+        """报告格式错误的行，处理已导入过和冲突的记录后开始提交"""
+        if invalid_rows:
+            messagebox.showwarning('导入警告', 
+                                  f'有{len(invalid_rows)}行数据格式不正确，已跳过:\n' + 
+                                  '\n'.join(invalid_rows[:10]) +
+                                  (f'\n...等共{len(invalid_rows)}个错误' if len(invalid_rows) > 10 else ''))
+        
+        if not new_items:
+            messagebox.showinfo('导入结果', '没有有效的物资记录被导入')
+            return
+        
+        # 按内容指纹找出已经导入过的行和与现有记录冲突的行
+        try:
+            inserted, skipped, conflicts, matched = self.core.classify_import(new_items)
+        except StorageError as e:
+            messagebox.showerror(e.title, str(e))
+            return
+        
+        counts = {'skipped': len(skipped), 'conflicts': len(conflicts), 'replaced': False, 'problems': []}
+        if conflicts:
+            if messagebox.askyesno('记录冲突', 
+                                 f'有{len(conflicts)}条记录与现有记录的物资编号、时间和操作相同但内容不同，'
+                                 f'是否用导入的记录覆盖这些现有记录？\n选择“否”不导入这些记录。'):
+                # 删除了记录，日志需要整体重写，库存只修正涉及的物品
+                imported = sort_by_time(inserted + conflicts)
+                counts['replaced'] = True
                 try:
-                    # 获取单元格值
-                    item_id = str(row[header_mapping['物资编号']].value or '').strip()
-                    
-                    # 读取基本信息
-                    item_name = str(row[header_mapping['物品名称']].value or '')
-                    operation = str(row[header_mapping['物资操作']].value or '入库')
-                    organization = str(row[header_mapping['所属组织']].value or '')
-                    
-                    # 读取数量并验证
-                    qty_cell = row[header_mapping['物品数量']].value
-                    try:
-                        quantity = int(qty_cell)
-                        if quantity <= 0:
-                            raise ValueError('数量必须大于0')
-                    except (ValueError, TypeError):
-                        invalid_rows.append(f'第{row_idx}行: 无效的数量')
-                        continue
-                    
-                    # 读取时间
-                    time_cell = row[header_mapping['时间']].value
-                    if isinstance(time_cell, datetime.datetime):
-                        item_time = time_cell.strftime('%Y-%m-%d %H:%M')
-                    elif isinstance(time_cell, str):
-                        try:
-                            datetime.datetime.strptime(time_cell, '%Y-%m-%d %H:%M')
-                            item_time = time_cell
-                        except ValueError:
-                            invalid_rows.append(f'第{row_idx}行: 时间格式不正确')
-                            continue
-                    else:
-                        item_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
-                    
-                    # 操作人和提交者
-                    operator = str(row[header_mapping['操作人']].value or '')
-                    submitter = str(row[header_mapping['提交者']].value or '')
-                    
-                    # 验证必填字段
-                    if not (item_id and item_name and organization):
-                        invalid_rows.append(f'第{row_idx}行: 缺少必填字段')
-                        continue
-                    
-                    # 验证编号是否为空
-                    if not item_id:
-                        invalid_rows.append(f'第{row_idx}行: 物资编号不能为空')
-                        continue
-                    
-                    # 创建物资记录
-                    new_item = {
-                        "提交时间": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        "物资编号": item_id,
-                        "物品名称": item_name,
-                        "物资操作": operation,
-                        "所属组织": organization,
-                        "物品数量": quantity,
-                        "时间": item_time,
-                        "操作人": operator,
-                        "提交者": submitter
-                    }
-                    
-                    new_items.append(new_item)
-                    
-                except Exception as e:
-                    invalid_rows.append(f'第{row_idx}行: {str(e)}')
-            
-            if invalid_rows:
-                messagebox.showwarning('导入警告', 
-                                      f'有{len(invalid_rows)}行数据格式不正确，已跳过:\n' + 
-                                      '\n'.join(invalid_rows[:10]) +
-                                      (f'\n...等共{len(invalid_rows)}个错误' if len(invalid_rows) > 10 else ''))
-            
-            if new_items:
-                # 检查编号重复
-                existing_ids = {item.get('物资编号') for item in self.data}
-                duplicates = [item for item in new_items if item['物资编号'] in existing_ids]
-                
-                if duplicates:
-                    if messagebox.askyesno('编号重复', 
-                                         f'有{len(duplicates)}个物资编号与现有物资重复，是否覆盖现有数据？'):
-                        # 删除重复的物资
-                        dup_ids = {item['物资编号'] for item in duplicates}
-                        self.data = [item for item in self.data if item.get('物资编号') not in dup_ids]
-                    else:
-                        # 不覆盖，只保留不重复的
-                        new_items = [item for item in new_items if item['物资编号'] not in existing_ids]
-                
-                # 添加新物资
-                self.data.extend(new_items)
-                self.save_data()
-                self.update_table()
-                
-                # 更新操作人和提交者列表
-                operators = set()
-                for item in new_items:
-                    if item.get('操作人'):
-                        operators.add(item['操作人'])
-                    if item.get('提交者'):
-                        operators.add(item['提交者'])
-                
-                self.update_operators(operators)
-                
-                messagebox.showinfo('导入成功', f'成功导入{len(new_items)}个物资记录')
-            else:
-                messagebox.showinfo('导入结果', '没有有效的物资记录被导入')
-                
-        except Exception as e:
-            messagebox.showerror('导入错误', f'导入Excel时发生错误: {str(e)}')
+                    counts['problems'] = self.core.replace_conflicts(imported, conflicts, matched)
+                except StorageError as e:
+                    messagebox.showerror(e.title, str(e))
+                    imported = []
+                self.finish_excel_import(imported, len(inserted) + len(conflicts), counts)
+                return
+        
+        if not inserted:
+            self.finish_excel_import([], 0, counts)
+            return
+        
+        # 按时间先后追加并应用到库存，结果与重建库存相同
+        dialog = ProgressDialog(self.root, '导入Excel', '正在保存...')
+        batch_size = len(inserted) if single_commit else self.IMPORT_BATCH_SIZE
+        self.commit_import_batches(dialog, sort_by_time(inserted), 0, counts, batch_size)
+    
+    def commit_import_batches(self, dialog, new_items, done, counts, batch_size):
+        """分批追加导入的记录并更新库存，每批之间把控制权交还界面"""
+        if done < len(new_items) and not dialog.cancelled.is_set():
+            batch = new_items[done:done + batch_size]
+            try:
+                counts['problems'].extend(self.core.commit_import(batch))
+            except StorageError as e:
+                dialog.close()
+                messagebox.showerror(e.title, str(e))
+                self.finish_excel_import(new_items[:done], len(new_items), counts)
+                return
+            done += len(batch)
+            dialog.update(done, len(new_items), f'已保存{done}/{len(new_items)}条记录')
+            self.root.after(1, self.commit_import_batches, dialog, new_items, done, counts, batch_size)
+            return
+        
+        dialog.close()
+        self.finish_excel_import(new_items[:done], len(new_items), counts)
+    
+    def finish_excel_import(self, imported, total, counts):
+        """刷新界面并报告导入结果
+
+        Args:
+            imported: 已保存的记录
+            total: 本次计划导入的记录数
+            counts: {'skipped': 已导入过而跳过的行数, 'conflicts': 冲突的行数, 'replaced': 是否覆盖了冲突的记录,
+                     'problems': 出库超过库存的记录说明}
+        """
+        self.update_table()
+        
+        # 登记操作人和提交者，保存导入指纹
+        self.core.finish_import(imported)
+        
+        problems = counts['problems']
+        if problems:
+            messagebox.showwarning('库存警告', 
+                                  f'有{len(problems)}条出库记录超过当时的库存（已按重建库存的规则处理）:\n' + 
+                                  '\n'.join(problems[:10]) +
+                                  (f'\n...等共{len(problems)}条' if len(problems) > 10 else ''))
+        
+        details = []
+        if counts['skipped']:
+            details.append(f'已导入过的{counts["skipped"]}条记录被跳过')
+        if counts['conflicts']:
+            details.append(f'冲突的{counts["conflicts"]}条记录' + ('已覆盖现有记录' if counts['replaced'] else '未导入'))
+        summary = ''.join(f'\n{line}' for line in details)
+        if len(imported) < total:
+            messagebox.showinfo('导入结果', f'已导入{len(imported)}条记录，其余{total - len(imported)}条未导入{summary}')
+        elif imported:
+            messagebox.showinfo('导入成功', f'成功导入{len(imported)}条记录{summary}')
+        else:
+            messagebox.showinfo('导入结果', f'没有新记录被导入{summary}')
     
     def export_excel(self):
-        """导出数据为Excel文件"""
+        """导出数据为Excel或CSV文件"""
         if self.current_view == 'operations' and not self.data:
             messagebox.showinfo('提示', '没有操作记录可导出')
             return
-        elif self.current_view == 'inventory' and not self.inventory:
+        elif self.current_view == 'inventory' and not self.shown_inventory():
             messagebox.showinfo('提示', '没有库存数据可导出')
             return
+        
+        # 有搜索条件或排序时，可以只导出当前显示的结果
+        keys = None
+        if self.search_var.get() or self.sort_states[self.current_view]:
+            only_shown = messagebox.askyesnocancel('导出范围', 
+                                                   '是否只导出当前搜索/排序后显示的结果？\n选择“否”导出全部数据。')
+            if only_shown is None:
+                return
+            if only_shown:
+                keys = self.table.rows
+                if not keys:
+                    messagebox.showinfo('提示', '当前没有显示的结果可导出')
+                    return
             
         # 设置默认保存位置和文件名
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         if self.current_view == 'operations':
             default_filename = f"仓库操作记录_{timestamp}"
+        elif self.as_of:
+            default_filename = f"仓库库存状态_截至{self.as_of[0].replace(':', '')}_{timestamp}"
         else:
             default_filename = f"仓库库存状态_{timestamp}"
         
         file_path = filedialog.asksaveasfilename(
-            initialdir=self.output_dir,
+            initialdir=self.core.output_dir,
             initialfile=default_filename,
             defaultextension='.xlsx', 
-            filetypes=[('Excel文件', '*.xlsx')]
+            filetypes=[('Excel文件', '*.xlsx'), ('CSV文件', '*.csv')]
         )
         
         if not file_path:
             return
             
         # 创建Excel文件
-        self.create_excel_file(file_path)
+        self.create_excel_file(file_path, keys)
     
-    def create_excel_file(self, file_path):
-        """创建Excel文件"""
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        
-        if self.current_view == 'operations':
-            # 导出操作记录
-            ws.title = "仓库操作记录"
-            
-            # 添加表头
-            headers = ['提交时间', '物资编号', '物品名称', '物资操作', '所属组织', '物品数量', '时间', '操作人', '提交者']
-            ws.append(headers)
-            
-            for item in self.data:
-                row_data = [
-                    item.get('提交时间', ''),
-                    item.get('物资编号', ''),
-                    item.get('物品名称', ''),
-                    item.get('物资操作', ''),
-                    item.get('所属组织', ''),
-                    item.get('物品数量', 0),
-                    item.get('时间', ''),
-                    item.get('操作人', ''),
-                    item.get('提交者', '')
-                ]
-                ws.append(row_data)
-        else:
-            # 导出库存状态
-            ws.title = "仓库库存状态"
-            
-            # 添加表头
-            headers = ['物资编号', '物品名称', '所属组织', '物品数量', '最后操作', '最后操作人', '最后操作时间', '备注']
-            ws.append(headers)
-            
-            for item_id, item in self.inventory.items():
-                row_data = [
-                    item_id,
-                    item.get('物品名称', ''),
-                    item.get('所属组织', ''),
-                    item.get('物品数量', 0),
-                    item.get('最后操作', ''),
-                    item.get('最后操作人', ''),
-                    item.get('最后操作时间', ''),
-                    item.get('备注', '')
-                ]
-                ws.append(row_data)
-        
-        wb.save(file_path)
-        messagebox.showinfo('导出成功', f'数据已导出到 {file_path}')
-    
-    def match_headers(self, actual_headers, required_headers):
-        """匹配表头，返回匹配的列索引映射
+    def create_excel_file(self, file_path, keys=None):
+        """在后台线程中导出当前视图到Excel或CSV文件（按扩展名）
         
         Args:
-            actual_headers: 实际的Excel表头列表
-            required_headers: 需要的表头列表
-            
-        Returns:
-            字典 {需要的表头: 对应的列索引}
+            file_path: 导出文件路径
+            keys: 要导出的行键（按导出顺序），None 表示全部
         """
-        header_mapping = {}
+        view = self.current_view
+        title, headers = self.core.export_table(view)
+        inventory = self.shown_inventory() if view == 'inventory' else None
+        if keys is None:
+            keys = list(inventory) if inventory is not None else self.core.export_keys(view)
+        row_values = lambda key: self.core.export_values(view, key, inventory)
         
-        # 清理表头（去除括号和其中的内容）
-        cleaned_headers = [self.clean_header(header) for header in actual_headers]
+        try:
+            writer = excel_io.open_table_writer(file_path, title, headers)
+        except Exception as e:
+            messagebox.showerror('导出错误', f'无法创建导出文件: {str(e)}')
+            return
         
-        # 对每个需要的表头，找到最匹配的实际表头
-        for req_header in required_headers:
-            best_match = None
-            best_score = -1
-            
-            for idx, (raw_header, clean_header) in enumerate(zip(actual_headers, cleaned_headers)):
-                # 如果完全匹配（清理后）
-                if clean_header == req_header:
-                    best_match = idx
-                    break
+        dialog = ProgressDialog(self.root, '导出', '正在导出...')
+        # 行数据在主线程中分块取出（存储连接只能在主线程使用），写文件在后台线程中进行
+        chunks = queue.Queue(maxsize=4)
+        results = queue.Queue()
+        threading.Thread(target=self.write_export_worker, args=(writer, chunks, results), daemon=True).start()
+        self.pump_export(dialog, file_path, row_values, keys, 0, chunks, results)
+    
+    def write_export_worker(self, writer, chunks, results):
+        """后台线程：把主线程送来的行写入文件"""
+        written = 0
+        try:
+            while True:
+                kind, rows = chunks.get()
+                if kind == 'rows':
+                    writer.write_rows(rows)
+                    written += len(rows)
+                    results.put(('progress', written))
+                elif kind == 'end':
+                    writer.close()
+                    results.put(('done', written))
+                    return
+                else:
+                    writer.abort()
+                    results.put(('cancelled', written))
+                    return
+        except Exception as e:
+            try:
+                writer.abort()
+            except Exception:
+                pass
+            results.put(('error', str(e)))
+    
+    def pump_export(self, dialog, file_path, row_values, keys, sent, chunks, results):
+        """主线程：向写文件线程分块送出行数据，并显示进度
+        
+        Args:
+            row_values: 函数，返回一行要导出的值
+            sent: 已送出的行数，送出结束或取消标记后为 None
+        """
+        try:
+            while True:
+                kind, written = results.get_nowait()
+                if kind == 'progress':
+                    dialog.update(written, len(keys), f'已导出{written}/{len(keys)}行')
+                    continue
                 
-                # 简单相似度评分：包含关系
-                if req_header in clean_header:
-                    score = len(req_header) / len(clean_header) if clean_header else 0
-                    if score > best_score:
-                        best_score = score
-                        best_match = idx
-            
-            # 如果找到匹配
-            if best_match is not None:
-                header_mapping[req_header] = best_match
+                dialog.close()
+                if kind == 'error':
+                    messagebox.showerror('导出错误', f'导出时发生错误: {written}')
+                elif kind == 'cancelled':
+                    messagebox.showinfo('导出取消', '导出已取消')
+                else:
+                    messagebox.showinfo('导出成功', f'数据已导出到 {file_path}')
+                return
+        except queue.Empty:
+            pass
+        
+        # 队列已满时等写文件线程跟上，取出的行不会超过几个分块
+        while sent is not None and not chunks.full():
+            if dialog.cancelled.is_set():
+                chunks.put(('cancel', None))
+                sent = None
+            elif sent < len(keys):
+                chunk = keys[sent:sent + self.EXPORT_CHUNK_SIZE]
+                chunks.put(('rows', [row_values(key) for key in chunk]))
+                sent += len(chunk)
+            else:
+                chunks.put(('end', None))
+                sent = None
         
-        return header_mapping
+        self.root.after(self.IMPORT_POLL_MS, self.pump_export, dialog, file_path, row_values, keys, sent, chunks, results)
     
-    def clean_header(self, header):
-        """清理表头，去除括号及其内容"""
-        if not header:
-            return ""
-        # 去除（...）内容
-        import re
-        return re.sub(r'（.*?）', '', header).strip()
-
     def remove_item(self, operation_type):
         """移除物资（出库或部分出库）"""
-        if self.current_view == 'operations':
-            # 从操作记录视图选择物品
-            selected = self.tree.selection()
-            if not selected:
-                messagebox.showwarning('提示', '请先选择物资')
-                return
-                
-            idx = self.tree.index(selected[0])
-            item = self.data[idx]
-            item_id = item.get('物资编号', '')
-            
-            # 检查物品是否存在于库存
-            if item_id not in self.inventory:
-                messagebox.showwarning('提示', f'物品编号"{item_id}"在当前库存中不存在')
-                return
-                
-            if operation_type == '出库':
-                self.open_complete_removal_dialog(item_id)
-            else:  # 部分出库
-                self.open_operation_dialog(operation_type, item_id)
-        else:
-            # 从库存视图选择物品
-            selected = self.tree.selection()
-            if not selected:
-                messagebox.showwarning('提示', '请先选择物资')
-                return
-                
-            item_values = self.tree.item(selected[0], 'values')
-            item_id = item_values[0]  # 第一列是物资编号
-            
-            if operation_type == '出库':
-                self.open_complete_removal_dialog(item_id)
-            else:  # 部分出库
-                self.open_operation_dialog(operation_type, item_id)
+        item_id = self.get_selected_item_id()
+        if item_id is None:
+            return
+        
+        # 检查物品是否存在于库存
+        if self.current_view == 'operations' and item_id not in self.inventory:
+            messagebox.showwarning('提示', f'物品编号"{item_id}"在当前库存中不存在')
+            return
+        
+        if operation_type == '出库':
+            self.open_complete_removal_dialog(item_id)
+        else:  # 部分出库
+            self.open_operation_dialog(operation_type, item_id)
+    
+def instrument_gui():
+    """给界面的刷新表格、搜索、排序、导入、导出套上计时，并记录 Tk 的重绘时间"""
+    profiler.instrument(WarehouseManager, [
+        'update_table', 'run_search_job', 'sort_by', 'import_excel', 'commit_import_batches',
+        'create_excel_file', 'pump_export',
+    ], 'gui')
+    profiler.instrument(VirtualTreeview, ['set_rows', 'fill_window'], 'table')
+    
+    render = VirtualTreeview.render
     
-    def update_operators(self, new_operators):
-        """更新操作者列表并保存到配置"""
-        # 转换为集合以去重
-        operators_set = set(self.operators)
-        
-        # 添加新操作者
-        for operator in new_operators:
-            if operator and operator not in operators_set:
-                self.operators.append(operator)
-                operators_set.add(operator)
-        
-        # 保存到配置文件
-        self.save_config()
+    def render_and_redraw(self, *args, **kwargs):
+        # 表格内容变化后立即处理积压的重绘，计入 tk.redraw
+        with profiler.measure('table.render'):
+            render(self, *args, **kwargs)
+        with profiler.measure('tk.redraw'):
+            self.tree.update_idletasks()
+    
+    VirtualTreeview.render = render_and_redraw
 
-    def save_config(self):
-        """保存配置到文件"""
-        config = {
-            "organization": {
-                "val": self.organizations
-            },
-            "operators": {
-                "val": self.operators
-            }
-        }
-        
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='仓库物资管理系统（不带子命令时打开界面）')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'记录各环节的耗时（也可设置环境变量 {profiling.ENV_VAR}=1）')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    batch_parser = subparsers.add_parser('batch', help='批量执行CSV或JSON Lines文件中的操作')
+    batch_parser.add_argument('file', help='批量操作文件（.csv 或 .jsonl）')
+    batch_parser.add_argument('--report', help='把JSON报告写入该文件（默认输出到标准输出）')
+    batch_parser.add_argument('--dry-run', action='store_true', help='只校验，不保存')
+    
+    serve_parser = subparsers.add_parser('serve', help='启动本地HTTP/JSON服务，供多个终端同时使用')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认 127.0.0.1）')
+    serve_parser.add_argument('--port', type=int, default=8765, help='监听端口（默认 8765）')
+    
+    args = parser.parse_args(argv)
+    
+    if args.profile or profiling.requested():
+        profiling.instrument_core()
+    
+    if args.command in ('batch', 'serve'):
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            messagebox.showerror('配置保存错误', f'无法保存配置: {str(e)}')
+            if args.command == 'batch':
+                import batch
+                return batch.run_batch(args.file, args.report, args.dry_run)
+            import server
+            return server.run_server(args.host, args.port)
+        finally:
+            if profiler.enabled:
+                print(profiler.format_summary(), file=sys.stderr)
     
-if __name__ == '__main__':
+    if profiler.enabled:
+        instrument_gui()
     root = tk.Tk()
     app = WarehouseManager(root)
     root.mainloop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
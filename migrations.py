@@ -0,0 +1,78 @@
+import datetime
+import os
+
+from journal import OperationJournal
+
+# 数据结构版本：
+#   0  旧版 warehouse_data.json（整个文件是一个 JSON 数组）
+#   1  单个追加写入的操作日志 warehouse_data.jsonl
+#   2  按月分段的操作记录（history/，清单中记录版本号）
+# 增加迁移步骤时在 MIGRATIONS 末尾追加一项并把 SCHEMA_VERSION 加一
+SCHEMA_VERSION = 2
+MANIFEST_SCHEMA = 2  # 清单出现时的版本，没有记录版本号的清单即为该版本
+
+
+def normalize_operation(item):
+    """将旧数据转换到新格式"""
+    return {
+        "提交时间": item.get("提交时间", datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+        "物资编号": item.get('物资编号', ''),
+        "物品名称": item.get('物品名称', ''),
+        "物资操作": item.get('物资操作', '入库'),  # 默认为入库
+        "所属组织": item.get('所属组织', ''),
+        "物品数量": item.get('物品数量', 0),
+        "时间": item.get('时间', ''),
+        "操作人": item.get('操作人', ''),
+        "提交者": item.get('提交者', '')
+    }
+
+
+def legacy_to_journal(storage, version):
+    """版本 1：把 warehouse_data.json 逐条转换为操作日志，旧文件改名为 .bak"""
+    OperationJournal(storage.journal_file).migrate_from(storage.legacy_data_file, normalize_operation)
+
+
+def journal_to_history(storage, version):
+    """版本 2：把操作日志按月分段，原日志改名为 .bak"""
+    storage.operations.schema = version
+    storage.operations.migrate_from(OperationJournal(storage.journal_file))
+
+
+# (版本, 说明, 迁移函数)，迁移函数 (storage, 版本) 把上一版本的数据转换为该版本并保存版本标记
+# （版本 1 的标记即操作日志文件本身）
+MIGRATIONS = [
+    (1, '旧版数据文件转换为操作日志', legacy_to_journal),
+    (2, '操作日志按月分段', journal_to_history),
+]
+
+
+def stored_version(storage):
+    """已保存数据的结构版本，还没有任何数据时为最新版本"""
+    if storage.operations.exists():
+        return storage.operations.read_schema()
+    if os.path.exists(storage.journal_file):
+        return 1
+    if os.path.exists(storage.legacy_data_file):
+        return 0
+    return SCHEMA_VERSION
+
+
+def migrate(storage):
+    """把 JSON 存储中的数据依次迁移到最新版本，返回执行了的步骤说明
+
+    数据已是最新版本时只读取版本标记，不写入任何文件。
+    每个步骤完成时都保存了新的版本标记，因此每个步骤只执行一次；
+    步骤逐条读写记录，不在内存中同时保存新旧两份完整的记录。
+    """
+    version = stored_version(storage)
+    if version > SCHEMA_VERSION:
+        raise ValueError(f'数据由更新版本的程序保存（数据结构版本 {version}，'
+                         f'本程序支持到 {SCHEMA_VERSION}），请升级程序')
+
+    applied = []
+    for target, description, step in MIGRATIONS:
+        if target > version:
+            step(storage, target)
+            version = target
+            applied.append(description)
+    return applied
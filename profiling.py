@@ -0,0 +1,123 @@
+import functools
+import json
+import os
+import threading
+import time
+
+# 设置该环境变量（任意非空值）或使用 --profile 参数时开启计时
+ENV_VAR = 'WAREHOUSE_PROFILE'
+
+
+class Profiler:
+    """按名称累计调用次数和耗时
+
+    只有调用 instrument() 时才给方法套上计时，未开启时程序中的方法保持原样，没有额外开销。
+    可以在多个线程中使用（后台保存、导出写文件都在其他线程中）。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.records = {}  # 名称 -> [次数, 总耗时, 最长耗时]
+        self.lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def record(self, name, seconds):
+        """记录一次耗时"""
+        with self.lock:
+            entry = self.records.get(name)
+            if entry is None:
+                self.records[name] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def measure(self, name):
+        """计时一段代码：with profiler.measure('名称'): ..."""
+        return _Measure(self, name)
+
+    def wrap(self, name, func):
+        """返回计时版本的函数"""
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+        return timed
+
+    def instrument(self, owner, names, prefix):
+        """给类（或模块）的若干方法套上计时，记录名称为 前缀.方法名"""
+        for name in names:
+            setattr(owner, name, self.wrap(f'{prefix}.{name}', getattr(owner, name)))
+
+    def reset(self):
+        with self.lock:
+            self.records.clear()
+
+    def summary(self):
+        """返回按总耗时从多到少排列的 [(名称, 次数, 总耗时, 平均耗时, 最长耗时)]，单位为秒"""
+        with self.lock:
+            rows = [(name, count, total, total / count, longest)
+                    for name, (count, total, longest) in self.records.items()]
+        return sorted(rows, key=lambda row: -row[2])
+
+    def dump(self, file_path):
+        """把统计结果写入 JSON 文件"""
+        rows = [{'name': name, 'count': count, 'total_seconds': total, 'mean_seconds': mean, 'max_seconds': longest}
+                for name, count, total, mean, longest in self.summary()]
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'records': rows}, f, ensure_ascii=False, indent=2)
+
+    def format_summary(self):
+        """返回文本形式的统计结果（毫秒）"""
+        lines = [f'{"名称":<40}{"次数":>8}{"总耗时(ms)":>12}{"平均(ms)":>10}{"最长(ms)":>10}']
+        for name, count, total, mean, longest in self.summary():
+            lines.append(f'{name:<40}{count:>8}{total * 1000:>12.1f}{mean * 1000:>10.2f}{longest * 1000:>10.2f}')
+        return '\n'.join(lines)
+
+
+class _Measure:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+profiler = Profiler()
+
+
+def requested():
+    """环境变量是否要求开启计时"""
+    return bool(os.environ.get(ENV_VAR))
+
+
+def instrument_core():
+    """给核心功能（加载、保存、重建、搜索、排序、导入、导出）套上计时"""
+    import excel_io
+    import storage
+    from warehouse_core import WarehouseService
+
+    profiler.enable()
+    profiler.instrument(WarehouseService, [
+        'load_data', 'load_inventory', 'rebuild_inventory_from_operations',
+        'commit_operations', 'append_operations', 'save_data', 'save_inventory', 'write_config',
+        'refresh', 'search', 'sorted_rows', 'inventory_as_of', 'reports',
+        'read_excel', 'read_excel_folder', 'import_operations', 'export_file',
+    ], 'core')
+    for backend in (storage.JsonStorage, storage.SqliteStorage):
+        profiler.instrument(backend, ['load_operations', 'append_operations', 'rewrite_operations',
+                                      'load_inventory_tagged', 'save_inventory'], f'storage.{backend.name}')
+    for writer in (excel_io.XlsxTableWriter, excel_io.CsvTableWriter):
+        profiler.instrument(writer, ['write_rows', 'close'], f'excel_io.{writer.__name__}')
+    profiler.instrument(excel_io, ['parse_row'], 'excel_io')
@@ -0,0 +1,58 @@
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+
+class ProgressDialog:
+    """带进度条和取消按钮的进度窗口
+
+    窗口打开期间主窗口不接受操作；点击取消或关闭窗口只设置 cancelled 标志，
+    由执行任务的一方在合适的时机检查并停止。
+
+    Args:
+        parent: 父窗口
+        title: 窗口标题
+        text: 初始提示文字
+    """
+
+    def __init__(self, parent, title, text=''):
+        self.cancelled = threading.Event()
+
+        self.win = tk.Toplevel(parent)
+        self.win.title(title)
+        self.win.resizable(False, False)
+        self.win.transient(parent)
+
+        self.label = tk.Label(self.win, text=text, anchor='w', width=40)
+        self.label.pack(fill=tk.X, padx=10, pady=(10, 5))
+
+        self.bar = ttk.Progressbar(self.win, length=320, mode='determinate')
+        self.bar.pack(padx=10, pady=5)
+
+        self.cancel_button = tk.Button(self.win, text='取消', command=self.cancel)
+        self.cancel_button.pack(pady=(5, 10))
+
+        self.win.protocol('WM_DELETE_WINDOW', self.cancel)
+        self.win.grab_set()
+
+    def update(self, done, total, text):
+        """更新进度，total 未知时进度条只显示在工作中"""
+        if self.cancelled.is_set():
+            return
+        if total:
+            self.bar.configure(mode='determinate', maximum=total, value=min(done, total))
+        else:
+            self.bar.configure(mode='indeterminate')
+            self.bar.step()
+        self.label.configure(text=text)
+
+    def cancel(self):
+        """请求取消"""
+        if not self.cancelled.is_set():
+            self.cancelled.set()
+            self.label.configure(text='正在取消...')
+            self.cancel_button.configure(state=tk.DISABLED)
+
+    def close(self):
+        self.win.grab_release()
+        self.win.destroy()
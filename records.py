@@ -0,0 +1,122 @@
+import re
+from array import array
+
+# 重复出现、按编号保存的字段（物资编号、名称、操作类型、组织和人名）
+CODED_FIELDS = ['物资编号', '物品名称', '物资操作', '所属组织', '操作人', '提交者']
+FIELD_NAMES = frozenset(CODED_FIELDS + ['提交时间', '物品数量', '时间'])
+
+# 年份不以 0 开头，转换为整数后位数不变
+_SUBMITTED_PATTERN = re.compile(r'[1-9]\d{3}-\d\d-\d\d \d\d:\d\d:\d\d\Z')
+_TIME_PATTERN = re.compile(r'[1-9]\d{3}-\d\d-\d\d \d\d:\d\d\Z')
+_INT64_MAX = 2 ** 63 - 1
+
+# 全部表共用的取值字典：值 <-> 编号
+_codes = {}
+_values = []
+
+
+def code_of(value):
+    """返回取值的编号，新的取值登记后返回新编号"""
+    code = _codes.get(value)
+    if code is None:
+        code = _codes[value] = len(_values)
+        _values.append(value)
+    return code
+
+
+def encode(item):
+    """把一条记录转换为 (提交时间, 时间, 数量, [各字段编号])，不是标准格式时返回 None
+
+    两个时间转换为整数 YYYYMMDDHHMMSS 和 YYYYMMDDHHMM。
+    """
+    if type(item) is not dict or len(item) != len(FIELD_NAMES) or not FIELD_NAMES.issuperset(item):
+        return None
+    submitted, time, quantity = item['提交时间'], item['时间'], item['物品数量']
+    if (type(submitted) is not str or type(time) is not str or type(quantity) is not int
+            or abs(quantity) > _INT64_MAX
+            or not _SUBMITTED_PATTERN.match(submitted) or not _TIME_PATTERN.match(time)):
+        return None
+
+    codes = []
+    for key in CODED_FIELDS:
+        value = item[key]
+        if type(value) is not str:
+            return None
+        code = _codes.get(value)
+        codes.append(code_of(value) if code is None else code)
+
+    submitted = int(submitted[0:4] + submitted[5:7] + submitted[8:10]
+                    + submitted[11:13] + submitted[14:16] + submitted[17:19])
+    time = int(time[0:4] + time[5:7] + time[8:10] + time[11:13] + time[14:16])
+    return submitted, time, quantity, codes
+
+
+def decode_submitted(value):
+    text = str(value)
+    return f'{text[:4]}-{text[4:6]}-{text[6:8]} {text[8:10]}:{text[10:12]}:{text[12:]}'
+
+
+def decode_time(value):
+    text = str(value)
+    return f'{text[:4]}-{text[4:6]}-{text[6:8]} {text[8:10]}:{text[10:]}'
+
+
+class OperationTable:
+    """按列保存的一组操作记录
+
+    每条记录不再是一个字典：两个时间和数量保存为整数，物资编号、名称、操作类型、
+    组织和人名保存为共用取值字典中的编号，每条记录约占 50 字节，
+    也不产生需要垃圾回收跟踪的对象。
+    按下标读取时返回与原来相同的字典（每次新建，修改不影响保存的记录）。
+
+    字段与标准的九个字段不同（旧数据缺少字段或带有其他字段）、时间不是标准格式
+    或数量不是整数的记录原样保存在 irregular 中，保证写回文件时内容不变。
+    """
+
+    def __init__(self, records=()):
+        self.submitted = array('q')
+        self.time = array('q')
+        self.quantity = array('q')
+        self.codes = [array('I') for _ in CODED_FIELDS]
+        self.irregular = {}  # 行号 -> 原样保存的记录
+        self.extend(records)
+
+    def __len__(self):
+        return len(self.quantity)
+
+    def append(self, item):
+        encoded = encode(item)
+        if encoded is None:
+            self.irregular[len(self)] = item
+            encoded = (0, 0, 0, [0] * len(CODED_FIELDS))
+        submitted, time, quantity, codes = encoded
+        self.submitted.append(submitted)
+        self.time.append(time)
+        for column, code in zip(self.codes, codes):
+            column.append(code)
+        self.quantity.append(quantity)
+
+    def extend(self, records):
+        for item in records:
+            self.append(item)
+
+    def __getitem__(self, row):
+        if self.irregular and row in self.irregular:
+            return self.irregular[row]
+        item_id, item_name, operation, organization, operator, submitter = self.codes
+        values = _values
+        return {
+            "提交时间": decode_submitted(self.submitted[row]),
+            "物资编号": values[item_id[row]],
+            "物品名称": values[item_name[row]],
+            "物资操作": values[operation[row]],
+            "所属组织": values[organization[row]],
+            "物品数量": self.quantity[row],
+            "时间": decode_time(self.time[row]),
+            "操作人": values[operator[row]],
+            "提交者": values[submitter[row]]
+        }
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
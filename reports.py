@@ -0,0 +1,131 @@
+import heapq
+import os
+import threading
+
+import file_format
+from sort_index import parse_timestamp
+
+# 计入入库量、出库量的物资操作
+INBOUND_OPERATIONS = {'入库', '物资增添'}
+OUTBOUND_OPERATIONS = {'部分出库', '出库'}
+
+
+def month_of(time_text):
+    """返回操作时间所在的月份（YYYY-MM），无法解析时返回“未知”"""
+    timestamp = parse_timestamp(time_text)
+    if timestamp is None:
+        return '未知'
+    month = timestamp // 100000000
+    return f'{month // 100}-{month % 100:02d}'
+
+
+class OperationReport:
+    """按操作人、月份和物品累计的出入库数量
+
+    每条新记录只累加一次，打开报表时不需要扫描全部操作记录。
+    各统计值为 [入库数量, 出库数量, 操作次数]。
+    """
+
+    def __init__(self):
+        self.by_operator = {}  # 操作人 -> [入库, 出库, 次数]
+        self.by_month = {}  # 月份 -> [入库, 出库, 次数]
+        self.by_item = {}  # 物资编号 -> [入库, 出库, 次数]
+        self.item_names = {}  # 物资编号 -> 最近一次记录中的物品名称
+        self.count = 0  # 已统计的操作记录数
+
+    def add(self, item):
+        """累加一条操作记录"""
+        operation = item.get('物资操作', '')
+        try:
+            qty = int(item.get('物品数量', 0) or 0)
+        except (TypeError, ValueError):
+            qty = 0
+        inbound = qty if operation in INBOUND_OPERATIONS else 0
+        outbound = qty if operation in OUTBOUND_OPERATIONS else 0
+
+        for table, key in ((self.by_operator, item.get('操作人', '')),
+                           (self.by_month, month_of(item.get('时间', ''))),
+                           (self.by_item, item.get('物资编号', ''))):
+            totals = table.get(key)
+            if totals is None:
+                totals = table[key] = [0, 0, 0]
+            totals[0] += inbound
+            totals[1] += outbound
+            totals[2] += 1
+
+        if item.get('物品名称'):
+            self.item_names[item.get('物资编号', '')] = item['物品名称']
+        self.count += 1
+
+    def to_content(self):
+        """返回可以保存到文件的统计值（复制，之后的累加不影响返回值）"""
+        return {
+            'by_operator': {key: list(totals) for key, totals in self.by_operator.items()},
+            'by_month': {key: list(totals) for key, totals in self.by_month.items()},
+            'by_item': {key: list(totals) for key, totals in self.by_item.items()},
+            'item_names': dict(self.item_names),
+            'count': self.count,
+        }
+
+    @classmethod
+    def from_content(cls, content):
+        """由 to_content 的结果还原"""
+        report = cls()
+        report.by_operator = content['by_operator']
+        report.by_month = content['by_month']
+        report.by_item = content['by_item']
+        report.item_names = content['item_names']
+        report.count = content['count']
+        return report
+
+    def top_items(self, n=50):
+        """出入库总量最大的 n 个物品：[(物资编号, 物品名称, 入库, 出库, 次数)]"""
+        top = heapq.nlargest(n, self.by_item.items(), key=lambda entry: entry[1][0] + entry[1][1])
+        return [(item_id, self.item_names.get(item_id, ''), *totals) for item_id, totals in top]
+
+
+def save_report(path, content, tag, data_format):
+    """保存统计值和它对应的操作记录位置标记（先写临时文件再替换）"""
+    data = file_format.dumps({'tag': tag, 'report': content}, data_format)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_report(path):
+    """读取保存的统计，返回 (OperationReport, 标记)；文件不存在或损坏时抛出 OSError 或 ValueError"""
+    content = file_format.read_file(path)
+    try:
+        return OperationReport.from_content(content['report']), content['tag']
+    except (KeyError, TypeError) as e:
+        raise ValueError(f'统计文件内容不完整: {str(e)}')
+
+
+class StockReport:
+    """按所属组织统计的当前库存，随库存条目的变化增减
+
+    各组织的统计值为 [物品种数, 物品总数量]。
+    """
+
+    def __init__(self, inventory):
+        self.by_organization = {}
+        for item in inventory.values():
+            self._add(item, 1)
+
+    def change(self, old, new):
+        """库存条目从 old 变为 new（None 表示不存在）"""
+        if old is not None:
+            self._add(old, -1)
+        if new is not None:
+            self._add(new, 1)
+
+    def _add(self, item, sign):
+        organization = item.get('所属组织', '')
+        totals = self.by_organization.get(organization)
+        if totals is None:
+            totals = self.by_organization[organization] = [0, 0]
+        totals[0] += sign
+        totals[1] += sign * (item.get('物品数量', 0) or 0)
+        if totals[0] == 0:
+            del self.by_organization[organization]
@@ -0,0 +1,100 @@
+from array import array
+
+
+class NgramIndex:
+    """字符二元组倒排索引
+
+    同一列中的字段值大量重复（组织、操作人、物品名称等），因此索引分两层：
+    二元组 -> 包含它的不同字段值，字段值 -> 出现该值的行。
+    搜索时先用搜索词中最少见的二元组找出候选字段值，逐个确认子串是否出现，
+    再合并这些字段值所在的行，结果与逐行逐字段的子串匹配完全一致。
+    """
+
+    def __init__(self):
+        self.value_ids = {}  # 原始字段值 -> 值编号
+        self.values = []  # 值编号 -> 小写字段值
+        self.value_docs = []  # 值编号 -> 出现该值的文档编号（递增）
+        self.postings = {}  # 二元组 -> 值编号数组
+        self.keys = []  # 文档编号 -> 行键，已删除的为 None
+        self.doc_of = {}  # 行键 -> 文档编号
+
+    def __len__(self):
+        return len(self.doc_of)
+
+    def add(self, key, fields):
+        """添加一行（行键已存在时替换原有内容）"""
+        if key in self.doc_of:
+            self.remove(key)
+
+        doc = len(self.keys)
+        self.keys.append(key)
+        self.doc_of[key] = doc
+
+        value_ids = self.value_ids
+        value_docs = self.value_docs
+        for field in fields:
+            field = str(field)
+            vid = value_ids.get(field)
+            if vid is None:
+                vid = self._add_value(field)
+            docs = value_docs[vid]
+            # 同一行中多个字段取值相同时只记录一次
+            if not docs or docs[-1] != doc:
+                docs.append(doc)
+
+    def remove(self, key):
+        """删除一行（只做标记，查询时跳过）"""
+        doc = self.doc_of.pop(key, None)
+        if doc is not None:
+            self.keys[doc] = None
+
+    def search(self, query):
+        """返回任一字段包含 query 的行键（按添加顺序）
+
+        Args:
+            query: 已转换为小写的搜索词
+        """
+        keys = self.keys
+        if not query:
+            return [key for key in keys if key is not None]
+
+        values = self.values
+        if len(query) == 1:
+            candidates = range(len(values))
+        else:
+            candidates = None
+            for gram in {query[i:i + 2] for i in range(len(query) - 1)}:
+                posting = self.postings.get(gram)
+                if posting is None:
+                    return []
+                if candidates is None or len(posting) < len(candidates):
+                    candidates = posting
+
+        matched = [vid for vid in candidates if query in values[vid]]
+        if not matched:
+            return []
+
+        if len(matched) == 1:
+            docs = self.value_docs[matched[0]]
+        else:
+            merged = set()
+            for vid in matched:
+                merged.update(self.value_docs[vid])
+            docs = sorted(merged)
+        return [keys[doc] for doc in docs if keys[doc] is not None]
+
+    def _add_value(self, field):
+        """登记一个新的字段值"""
+        lowered = field.lower()
+        vid = len(self.values)
+        self.value_ids[field] = vid
+        self.values.append(lowered)
+        self.value_docs.append(array('I'))
+
+        postings = self.postings
+        for gram in {lowered[i:i + 2] for i in range(len(lowered) - 1)}:
+            try:
+                postings[gram].append(vid)
+            except KeyError:
+                postings[gram] = array('I', (vid,))
+        return vid
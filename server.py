@@ -0,0 +1,332 @@
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from records import OperationTable
+from sort_index import SortOrders
+from warehouse_core import WarehouseService, WarehouseError, inventory_search_fields
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 422: 'Unprocessable Entity', 500: 'Internal Server Error'}
+MAX_BODY = 1024 * 1024  # 请求体的最大字节数
+MAX_PAGE = 1000  # 每页最多返回的行数
+SYNC_POLL_SECONDS = 2  # 检查其他程序是否修改了数据的间隔
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Snapshot:
+    """某次提交或同步之后的只读数据，发布后不再改变
+
+    操作记录表和搜索索引只在末尾追加，快照只使用发布时的前 count 条；
+    库存在发布时复制。快照只在事件循环中读取。
+    """
+
+    def __init__(self, records, count, operations_index, inventory):
+        self.records = records
+        self.count = count
+        self.operations_index = operations_index
+        self.inventory = inventory
+        # 库存按列排序的缓存，第一次排序时才建立
+        self.inventory_sorts = SortOrders(
+            lambda: list(inventory),
+            lambda item_id, col: item_id if col == '物资编号' else inventory[item_id].get(col, ''))
+
+    def search(self, view, search):
+        """返回符合搜索条件的行键（操作记录为下标，库存为物资编号），search 为小写搜索词"""
+        if view == 'operations':
+            if not search:
+                return range(self.count)
+            return [idx for idx in self.operations_index.search(search) if idx < self.count]
+        return [item_id for item_id, item in self.inventory.items()
+                if not search or any(search in str(field).lower() for field in inventory_search_fields(item_id, item))]
+
+    def row(self, view, key):
+        if view == 'operations':
+            return dict(self.records[key], 序号=key)
+        return dict(self.inventory[key])
+
+
+class WarehouseServer:
+    """本地 HTTP/JSON 服务
+
+    WarehouseService 只在唯一的写入线程中使用：写入任务把同时到达的操作合成一批，
+    交给写入线程用 WarehouseService.apply_batch 校验并一次保存（组提交）；
+    同一数据目录也被界面或其他程序使用时，写入线程定时读入它们写入的数据。
+    每次提交或读入之后，写入线程发布一份只读快照，读取请求只使用最新的快照，
+    因此等待数据锁或写文件时事件循环不会停顿，读取看到的总是某次提交后的一致状态。
+
+    Args:
+        warehouse: WarehouseService
+        max_batch: 每次组提交最多包含的操作数
+    """
+
+    def __init__(self, warehouse, max_batch=500):
+        self.warehouse = warehouse
+        self.max_batch = max_batch
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='warehouse-writer')
+        self.snapshot = None
+        # 写入线程中维护的快照数据：操作记录（列存储，只追加）和它对应的搜索索引
+        self.records = None
+        self.operations_index = None
+        # 事件循环中使用的操作记录排序缓存，随快照中新增的记录增量更新
+        self.sorts = None
+        self.sorts_records = None
+        self.sorts_count = 0
+        self.routes = {
+            ('GET', '/inventory'): self.get_inventory,
+            ('GET', '/operations'): self.get_operations,
+            ('GET', '/search'): self.search,
+            ('POST', '/operations'): self.post_operation,
+        }
+
+    async def serve(self, host, port):
+        self.queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        try:
+            # 开始接受请求前发布第一份快照（建立搜索索引）
+            await loop.run_in_executor(self.executor, self.publish)
+            tasks = [asyncio.create_task(self.writer()), asyncio.create_task(self.poll_other_instances())]
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            addresses = ', '.join(str(sock.getsockname()[:2]) for sock in server.sockets)
+            print(f'仓库服务已启动: {addresses}', file=sys.stderr)
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                for task in tasks:
+                    task.cancel()
+        finally:
+            # 等待正在进行的提交完成
+            self.executor.shutdown(wait=True)
+
+    # ---------- 写入线程 ----------
+
+    def publish(self):
+        """在写入线程中发布当前数据的快照
+
+        记录被重写过（搜索索引被重新建立）时重新复制全部记录，否则只复制新增的记录。
+        """
+        warehouse = self.warehouse
+        if warehouse.operations_index is None:
+            for _ in warehouse.operations_index_steps():
+                pass
+        if warehouse.operations_index is not self.operations_index:
+            self.operations_index = warehouse.operations_index
+            self.records = OperationTable()
+        records = self.records
+        for idx in range(len(records), len(warehouse.data)):
+            records.append(warehouse.data[idx])
+        inventory = {item_id: dict(item) for item_id, item in warehouse.inventory.items()}
+        # 替换引用是原子的，事件循环读到的要么是旧快照，要么是完整的新快照
+        self.snapshot = Snapshot(records, len(records), self.operations_index, inventory)
+
+    def try_publish(self):
+        """发布快照，失败时保留上一份快照（数据已经保存，只是读取暂时看不到）"""
+        try:
+            self.publish()
+        except Exception as e:
+            self.warehouse.warn('快照更新错误', f'无法更新读取用的数据: {str(e)}')
+
+    def commit(self, rows):
+        """在写入线程中校验并保存一批操作，保存后发布快照"""
+        try:
+            return self.warehouse.apply_batch(rows)
+        finally:
+            self.try_publish()
+
+    def refresh(self):
+        """在写入线程中读入其他程序写入的数据，有变化时发布快照"""
+        if self.warehouse.is_stale() and self.warehouse.sync():
+            self.try_publish()
+
+    # ---------- 写入 ----------
+
+    async def poll_other_instances(self):
+        """定时让写入线程检查其他程序是否修改了数据"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(SYNC_POLL_SECONDS)
+            try:
+                await loop.run_in_executor(self.executor, self.refresh)
+            except Exception as e:
+                # 读入失败时继续使用原来的快照，下次再试
+                print(f'无法读入其他程序写入的数据: {str(e)}', file=sys.stderr)
+
+    async def writer(self):
+        """唯一的写入任务：每次取出全部排队的操作，交给写入线程一次校验并保存"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            # 让出一次，使同时到达的请求也能排进这一批
+            await asyncio.sleep(0)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            rows = [(idx, row) for idx, (row, _) in enumerate(batch)]
+            try:
+                accepted, rejected = await loop.run_in_executor(self.executor, self.commit, rows)
+            except Exception as e:
+                # 写入任务不能退出，否则之后的请求都得不到结果
+                results = {idx: (500, {'error': str(e)}) for idx in range(len(batch))}
+            else:
+                results = {idx: (201, {'operation': operation}) for idx, operation in accepted}
+                results.update((idx, (422, {'error': error})) for idx, error in rejected)
+
+            for idx, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(results[idx])
+
+    async def post_operation(self, query, body):
+        """提交一条操作（入库、物资增添、部分出库、出库）"""
+        try:
+            row = json.loads(body or b'null')
+        except ValueError:
+            raise HttpError(400, '请求体不是有效的JSON')
+        if not isinstance(row, dict):
+            raise HttpError(400, '请求体应为一个JSON对象')
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        return await future
+
+    # ---------- 读取 ----------
+
+    async def get_inventory(self, query, body):
+        """当前库存，支持 q（搜索）、sort、reverse、offset、limit"""
+        return 200, self.page('inventory', query)
+
+    async def get_operations(self, query, body):
+        """操作记录（分页），参数同 /inventory"""
+        return 200, self.page('operations', query)
+
+    async def search(self, query, body):
+        """搜索，view 为 operations（默认）或 inventory"""
+        view = query.get('view', 'operations')
+        if view not in ('operations', 'inventory'):
+            raise HttpError(400, 'view 应为 operations 或 inventory')
+        return 200, self.page(view, query)
+
+    def page(self, view, query):
+        """从最新的快照中取出一页（在事件循环中执行，不读文件）"""
+        snapshot = self.snapshot
+        offset = self.int_param(query, 'offset', 0)
+        limit = min(self.int_param(query, 'limit', 100), MAX_PAGE)
+
+        rows = snapshot.search(view, query.get('q', '').lower())
+        if query.get('sort'):
+            sorts = self.operation_sorts(snapshot) if view == 'operations' else snapshot.inventory_sorts
+            rows = sorts.sorted_rows(query['sort'], query.get('reverse') in ('1', 'true'), rows)
+
+        items = [snapshot.row(view, key) for key in rows[offset:offset + limit]]
+        return {'total': len(rows), 'offset': offset, 'items': items}
+
+    def operation_sorts(self, snapshot):
+        """返回与快照一致的操作记录排序缓存：记录被重写过时重新开始，否则插入新增的记录"""
+        if self.sorts_records is not snapshot.records:
+            records = snapshot.records
+            self.sorts = SortOrders(lambda: range(self.sorts_count), lambda idx, col: records[idx].get(col, ''))
+            self.sorts_records, self.sorts_count = records, snapshot.count
+        elif self.sorts_count < snapshot.count:
+            start, self.sorts_count = self.sorts_count, snapshot.count
+            self.sorts.append(start, snapshot.count)
+        return self.sorts
+
+    @staticmethod
+    def int_param(query, name, default):
+        try:
+            value = int(query.get(name, default))
+        except ValueError:
+            raise HttpError(400, f'{name} 应为整数')
+        if value < 0:
+            raise HttpError(400, f'{name} 不能为负数')
+        return value
+
+    # ---------- HTTP ----------
+
+    async def handle_connection(self, reader, writer):
+        """处理一个连接上的请求（HTTP/1.1 长连接）"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                keep_alive = await self.handle_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, request_line, reader, writer):
+        """处理一个请求，返回连接是否保持"""
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if not line.strip():
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            self.send(writer, 400, {'error': '无效的请求'}, False)
+            return False
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        try:
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY:
+                raise HttpError(413, '请求体过大')
+            body = await reader.readexactly(length) if length else b''
+
+            url = urlsplit(target)
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            handler = self.routes.get((method, url.path))
+            if handler is None:
+                if any(path == url.path for _, path in self.routes):
+                    raise HttpError(405, '不支持该请求方法')
+                raise HttpError(404, '没有该路径')
+            status, payload = await handler(query, body)
+        except HttpError as e:
+            status, payload = e.status, {'error': str(e)}
+            keep_alive = keep_alive and e.status != 413
+        except ValueError:
+            status, payload = 400, {'error': '无效的请求'}
+        except WarehouseError as e:
+            status, payload = 500, {'error': str(e)}
+
+        self.send(writer, status, payload, keep_alive)
+        return keep_alive
+
+    @staticmethod
+    def send(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+                'Content-Type: application/json; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+        writer.write(head.encode('latin-1') + body)
+
+
+def run_server(host='127.0.0.1', port=8765, base_dir=None):
+    """启动服务，直到被中断"""
+    warehouse = WarehouseService(base_dir, on_warning=lambda title, message: print(f'{title}: {message}', file=sys.stderr))
+    try:
+        asyncio.run(WarehouseServer(warehouse).serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for key, error in warehouse.close().items():
+            print(f'后台保存错误: {key}: {error}', file=sys.stderr)
+    return 0
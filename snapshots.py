@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import re
+
+import file_format
+
+
+class InventorySnapshots:
+    """库存检查点：保存某个日志位置对应的库存状态，重建库存时只需重放之后的操作
+
+    检查点按 data_format 写入（扩展名为 .json 或 .whb），读取时按文件头识别格式。
+    """
+
+    FILE_PATTERN = re.compile(r'^inventory_(\d+)\.(json|whb)$')
+    EXTENSIONS = {'json': 'json', 'binary': 'whb'}
+
+    def __init__(self, directory, interval=1000, keep=3, data_format='json'):
+        self.directory = directory
+        self.interval = interval  # 两个检查点之间至少相隔的操作条数
+        self.keep = keep  # 最多保留的检查点个数
+        self.data_format = data_format
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.rescan()
+
+    def list_files(self):
+        """已有检查点的 {日志位置: 文件路径}（同一位置两种格式都有时取当前格式的文件）"""
+        files = {}
+        for name in os.listdir(self.directory):
+            match = self.FILE_PATTERN.match(name)
+            if match:
+                position = int(match.group(1))
+                if position not in files or match.group(2) == self.EXTENSIONS[self.data_format]:
+                    files[position] = os.path.join(self.directory, name)
+        return files
+
+    def list_positions(self):
+        """列出已有检查点的日志位置（从小到大）"""
+        return sorted(self.list_files())
+
+    def rescan(self):
+        """重新查看目录中的检查点（其他程序实例可能新增或删除了检查点）"""
+        positions = self.list_positions()
+        self.latest_position = positions[-1] if positions else 0
+
+    def is_due(self, position):
+        """距离上一个检查点是否已经积累了足够多的操作"""
+        return position - self.latest_position >= self.interval
+
+    def save(self, position, inventory, operations):
+        """保存检查点
+
+        Args:
+            position: 检查点覆盖的操作条数（即已重放 operations[:position]）
+            inventory: 该位置对应的库存状态
+            operations: 操作记录列表，用于记录锚点以便加载时校验
+        """
+        if position <= 0:
+            return
+        snapshot = {
+            "position": position,
+            "anchor": self.fingerprint(operations[position - 1]),
+            "inventory": inventory
+        }
+        self._write(position, snapshot)
+        self.latest_position = position
+        self._prune()
+
+    def load_latest(self, operations):
+        """加载与当前操作记录一致的最新检查点
+
+        Returns:
+            (position, inventory)，没有可用检查点时返回 None
+        """
+        files = self.list_files()
+        for position in sorted(files, reverse=True):
+            if position > len(operations):
+                continue
+            try:
+                snapshot = file_format.read_file(files[position])
+            except (OSError, ValueError):
+                # 损坏的检查点直接跳过，尝试更早的
+                continue
+            if snapshot.get('position') != position:
+                continue
+            if snapshot.get('anchor') != self.fingerprint(operations[position - 1]):
+                continue
+            return position, snapshot.get('inventory', {})
+        return None
+
+    def convert(self, data_format):
+        """把已有的检查点改写为 data_format 格式，之后的检查点也使用该格式"""
+        files = self.list_files()
+        self.data_format = data_format
+        for position, path in sorted(files.items()):
+            try:
+                snapshot = file_format.read_file(path)
+            except (OSError, ValueError):
+                # 损坏的检查点不再保留
+                os.remove(path)
+                continue
+            self._write(position, snapshot)
+            if path != self._path(position):
+                os.remove(path)
+        self.rescan()
+
+    def clear(self):
+        """删除全部检查点（操作记录被整体改写后，旧检查点的位置不再可信）"""
+        for path in self.list_files().values():
+            os.remove(path)
+        self.latest_position = 0
+
+    @staticmethod
+    def fingerprint(record):
+        """计算单条操作记录的指纹"""
+        encoded = json.dumps(record, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+    def _path(self, position):
+        """按当前格式写入时的文件路径"""
+        return os.path.join(self.directory, f'inventory_{position:010d}.{self.EXTENSIONS[self.data_format]}')
+
+    def _write(self, position, snapshot):
+        """写入检查点文件（先写临时文件再替换）"""
+        path = self._path(position)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(file_format.dumps(snapshot, self.data_format))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _prune(self):
+        """只保留最新的若干个检查点"""
+        files = self.list_files()
+        for position in sorted(files)[:-self.keep]:
+            os.remove(files[position])
@@ -0,0 +1,131 @@
+import bisect
+import itertools
+import re
+
+# 按数值排序的列
+NUMBER_COLUMNS = {'物品数量'}
+# 按时间排序的列
+TIME_COLUMNS = {'时间', '提交时间', '最后操作时间'}
+
+_TIME_PATTERN = re.compile(r'\s*(\d{4})-(\d{1,2})-(\d{1,2})(?:[ T]+(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?\s*$')
+_timestamp_cache = {}
+
+
+def parse_timestamp(text):
+    """把 年-月-日[ 时:分[:秒]] 解析为可比较的整数 YYYYMMDDHHMMSS，无法解析时返回 None
+
+    月、日、时不要求补零，因此比直接比较字符串可靠；相同的时间字符串只解析一次。
+    """
+    if text in _timestamp_cache:
+        return _timestamp_cache[text]
+    match = _TIME_PATTERN.match(text) if isinstance(text, str) else None
+    if match:
+        year, month, day, hour, minute, second = (int(part or 0) for part in match.groups())
+        value = ((((year * 100 + month) * 100 + day) * 100 + hour) * 100 + minute) * 100 + second
+    else:
+        value = None
+    if len(_timestamp_cache) < 1000000:
+        _timestamp_cache[text] = value
+    return value
+
+
+def sort_key(column, value):
+    """返回带类型的排序键
+
+    数量按数值、时间按解析后的时间比较；无法解析的值排在正常值之后，空值排在最后，
+    不同类型的值不会直接互相比较。
+    """
+    if value is None or value == '':
+        return (2, '')
+    if column in NUMBER_COLUMNS:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return (0, value)
+        try:
+            return (0, float(value))
+        except (TypeError, ValueError):
+            return (1, str(value))
+    if column in TIME_COLUMNS:
+        timestamp = parse_timestamp(value)
+        if timestamp is not None:
+            return (0, timestamp)
+        return (1, str(value))
+    return (0, str(value))
+
+
+class SortOrders:
+    """按列缓存的排序结果
+
+    每列保存一次排好序的行键排列和各行的排序键，数据本身的顺序不变。
+    再次点击同一列或倒序时直接复用缓存；追加的行按二分插入已缓存的排列。
+
+    Args:
+        all_rows: 函数，按数据顺序返回全部行键（操作记录为 range，库存为物资编号列表）
+        fetch: 函数，fetch(行键, 列名) 返回该行该列的值
+    """
+
+    def __init__(self, all_rows, fetch):
+        self.all_rows = all_rows
+        self.fetch = fetch
+        self.orders = {}  # 列名 -> (排列, 排序键)；行键为 range 时排序键为列表，否则为字典
+
+    def clear(self):
+        """数据被改写后丢弃全部缓存"""
+        self.orders.clear()
+
+    def append(self, start, stop):
+        """行键为记录下标时，把新增的 [start, stop) 行插入已缓存的排列
+
+        新增行数相对已有行较多时（如批量导入）直接丢弃缓存，下次排序时重新生成。
+        """
+        if (stop - start) * 32 > start:
+            self.orders.clear()
+            return
+        for column, (order, keys) in self.orders.items():
+            for row in range(start, stop):
+                keys.append(sort_key(column, self.fetch(row, column)))
+                bisect.insort_right(order, row, key=keys.__getitem__)
+
+    def sorted_rows(self, column, reverse, rows=None):
+        """返回按指定列排序后的行键
+
+        返回的总是新的列表，调用方修改它不会影响缓存的排列。
+
+        Args:
+            column: 排序的列
+            reverse: 是否倒序
+            rows: 需要排序的行键（如搜索结果），为 None 时表示全部行
+        """
+        order, keys = self._order(column)
+
+        if rows is None or len(rows) == len(order):
+            if reverse:
+                return order[::-1]
+            result = order[:]
+        elif len(rows) * 8 > len(order):
+            # 结果较多时按缓存的排列筛选，比重新排序快
+            if isinstance(keys, list):
+                mask = bytearray(len(keys))
+                for row in rows:
+                    mask[row] = 1
+                result = list(itertools.compress(order, map(mask.__getitem__, order)))
+            else:
+                wanted = set(rows)
+                result = [row for row in order if row in wanted]
+        else:
+            result = sorted(rows, key=keys.__getitem__)
+
+        return result[::-1] if reverse else result
+
+    def _order(self, column):
+        cached = self.orders.get(column)
+        if cached is not None:
+            return cached
+
+        rows = self.all_rows()
+        if isinstance(rows, range):
+            keys = [sort_key(column, self.fetch(row, column)) for row in rows]
+        else:
+            keys = {row: sort_key(column, self.fetch(row, column)) for row in rows}
+        order = sorted(rows, key=keys.__getitem__)
+        self.orders[column] = (order, keys)
+        return order, keys
@@ -0,0 +1,448 @@
+import argparse
+import collections
+import collections.abc
+import json
+import os
+import sqlite3
+import threading
+
+import file_format
+import migrations
+from file_lock import FileLock, LockTimeout
+from history import OperationHistory
+
+# 操作记录字段与数据库列的对应关系（顺序即记录中字段的顺序）
+OPERATION_COLUMNS = [
+    ('提交时间', 'submit_time'),
+    ('物资编号', 'item_id'),
+    ('物品名称', 'item_name'),
+    ('物资操作', 'operation'),
+    ('所属组织', 'organization'),
+    ('物品数量', 'quantity'),
+    ('时间', 'time'),
+    ('操作人', 'operator'),
+    ('提交者', 'submitter')
+]
+
+# 库存字段与数据库列的对应关系
+INVENTORY_COLUMNS = [
+    ('物资编号', 'item_id'),
+    ('物品名称', 'item_name'),
+    ('所属组织', 'organization'),
+    ('物品数量', 'quantity'),
+    ('最后操作', 'last_operation'),
+    ('最后操作人', 'last_operator'),
+    ('最后操作时间', 'last_time'),
+    ('备注', 'note')
+]
+
+
+class JsonStorage:
+    """文件存储：操作记录按月分段保存在追加写入的日志中（history/），库存保存在 inventory_data.json
+
+    文件按 data_format 保存为不缩进的 JSON 或二进制格式（见 file_format.py），
+    读取时按文件头识别格式，两种格式的文件可以同时存在。
+    """
+
+    name = 'json'
+    saves_inventory_with_operations = False  # 库存文件只能整体写入，由调用方另行保存
+
+    def __init__(self, data_dir, data_format='json'):
+        file_format.check_format(data_format)
+        self.data_format = data_format
+        self.journal_file = os.path.join(data_dir, 'warehouse_data.jsonl')
+        self.legacy_data_file = os.path.join(data_dir, 'warehouse_data.json')
+        self.inventory_file = os.path.join(data_dir, 'inventory_data.json')
+        self.state_file = os.path.join(data_dir, 'warehouse_state.json')
+        self.operations = OperationHistory(os.path.join(data_dir, 'history'), data_format)
+        self.migrated = []  # 最近一次加载时执行了的迁移步骤
+
+    def load_operations(self):
+        """加载操作记录（只读取当月分段，更早的分段在访问时读取）
+
+        旧版本的数据先迁移到最新的数据结构（见 migrations.py），已是最新版本时不写入文件。
+        """
+        self.migrated = migrations.migrate(self)
+        return self.operations.load()
+
+    def load_new_operations(self):
+        """读入其他实例追加的操作记录，返回新记录条数"""
+        return self.operations.load_new()
+
+    def append_operations(self, operations, inventory=None, inventory_changes=None):
+        """追加操作记录，并保存由此引起的库存变化
+
+        Args:
+            operations: 新的操作记录
+            inventory: 应用变化后的完整库存，为 None 时不保存库存
+            inventory_changes: {物资编号: 新的库存条目或 None(已删除)}
+        """
+        self.operations.extend(operations)
+        if inventory is not None:
+            self.save_inventory(inventory, inventory_changes)
+
+    def rewrite_operations(self, operations):
+        """整体替换全部操作记录，返回新的操作记录序列"""
+        return self.operations.rewrite(operations)
+
+    def load_inventory(self):
+        """加载库存，库存文件不存在时返回 None"""
+        return self.load_inventory_tagged()[0]
+
+    def load_inventory_tagged(self):
+        """加载库存及保存时附带的标记
+
+        Returns:
+            (库存, 标记)，库存文件不存在时库存为 None，旧版文件没有标记
+        """
+        if not os.path.exists(self.inventory_file):
+            return None, None
+        content = file_format.read_file(self.inventory_file)
+        if set(content) == {'tag', 'inventory'}:
+            return content['inventory'], content['tag']
+        return content, None
+
+    def save_inventory(self, inventory, inventory_changes=None, tag=None):
+        """保存库存（JSON 文件只能整体写入，忽略 inventory_changes）
+
+        先写临时文件再替换，读取方只会看到完整的库存文件。
+
+        Args:
+            tag: 随库存一起保存的标记（如库存对应的操作记录位置），为 None 时按旧格式保存
+        """
+        content = inventory if tag is None else {'tag': tag, 'inventory': inventory}
+        data = file_format.dumps(content, self.data_format)
+        # 多个程序实例（或同一程序中的多个实例）可能同时保存，临时文件名各不相同
+        tmp_path = f'{self.inventory_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.inventory_file)
+
+    def convert_format(self, data_format):
+        """把操作记录和库存文件转换为 data_format 格式，之后也按该格式保存（需已加载操作记录）"""
+        file_format.check_format(data_format)
+        self.data_format = self.operations.data_format = data_format
+        self.operations.rewrite(self.operations)
+        inventory, tag = self.load_inventory_tagged()
+        if inventory is not None:
+            self.save_inventory(inventory, tag=tag)
+
+    def read_state(self):
+        """读取数据版本信息，从未写入过时返回空字典"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def write_state(self, state):
+        """写入数据版本信息（先写临时文件再替换，读取方不会读到一半的内容）"""
+        tmp_path = self.state_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_file)
+
+    def close(self):
+        pass
+
+
+class SqliteOperationList(collections.abc.Sequence):
+    """按页从数据库读取的操作记录序列
+
+    只缓存最近访问的若干页，不把全部记录读入内存。
+    """
+
+    PAGE_SIZE = 1000
+    MAX_PAGES = 16
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._count = None
+        self._pages = collections.OrderedDict()
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.storage.count_operations()
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('操作记录索引超出范围')
+        page, offset = divmod(index, self.PAGE_SIZE)
+        return self._page(page)[offset]
+
+    def __iter__(self):
+        # 顺序遍历时逐页读取，不进入页缓存
+        for page in range((len(self) + self.PAGE_SIZE - 1) // self.PAGE_SIZE):
+            yield from self._fetch(page)
+
+    def invalidate(self):
+        """数据库内容变化后丢弃缓存"""
+        self._count = None
+        self._pages.clear()
+
+    def _page(self, page):
+        if page in self._pages:
+            self._pages.move_to_end(page)
+            return self._pages[page]
+        rows = self._fetch(page)
+        self._pages[page] = rows
+        if len(self._pages) > self.MAX_PAGES:
+            self._pages.popitem(last=False)
+        return rows
+
+    def _fetch(self, page):
+        return self.storage.fetch_operations(page * self.PAGE_SIZE, self.PAGE_SIZE)
+
+
+class SqliteStorage:
+    """SQLite 存储：操作记录和库存分别保存在带索引的表中，每次操作在一个事务中写入"""
+
+    name = 'sqlite'
+    saves_inventory_with_operations = True  # 库存变化与操作记录在同一个事务中写入
+
+    def __init__(self, data_dir, data_format='json'):
+        # 数据保存在数据库中，不使用 data_format
+        self.db_file = os.path.join(data_dir, 'warehouse.db')
+        self.conn = sqlite3.connect(self.db_file)
+        self.create_tables()
+        self.operations = SqliteOperationList(self)
+
+    def create_tables(self):
+        """创建数据表和索引"""
+        op_columns = ', '.join(
+            f'{col} INTEGER' if col == 'quantity' else f'{col} TEXT'
+            for _, col in OPERATION_COLUMNS
+        )
+        inv_columns = ', '.join(
+            'item_id TEXT PRIMARY KEY' if col == 'item_id' else
+            f'{col} INTEGER' if col == 'quantity' else f'{col} TEXT'
+            for _, col in INVENTORY_COLUMNS
+        )
+        with self.conn:
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS operations (seq INTEGER PRIMARY KEY, {op_columns})')
+            for col in ('item_id', 'time', 'organization', 'operator'):
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_operations_{col} ON operations({col})')
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS inventory ({inv_columns})')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_inventory_organization ON inventory(organization)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    def load_operations(self):
+        """返回按页读取的操作记录序列"""
+        self.operations.invalidate()
+        return self.operations
+
+    def load_new_operations(self):
+        """其他实例写入新记录后丢弃缓存，返回新记录条数"""
+        before = len(self.operations)
+        self.operations.invalidate()
+        return len(self.operations) - before
+
+    def count_operations(self):
+        return self.conn.execute('SELECT COUNT(*) FROM operations').fetchone()[0]
+
+    def fetch_operations(self, offset, limit):
+        """按写入顺序读取一页操作记录"""
+        columns = ', '.join(col for _, col in OPERATION_COLUMNS)
+        # seq 从 1 开始连续编号，直接按主键范围读取
+        cursor = self.conn.execute(
+            f'SELECT {columns} FROM operations WHERE seq > ? AND seq <= ? ORDER BY seq',
+            (offset, offset + limit)
+        )
+        keys = [key for key, _ in OPERATION_COLUMNS]
+        return [dict(zip(keys, row)) for row in cursor]
+
+    def append_operations(self, operations, inventory=None, inventory_changes=None):
+        """在一个事务中写入操作记录及其引起的库存变化"""
+        with self.conn:
+            self._insert_operations(operations)
+            if inventory is not None:
+                self._write_inventory(inventory, inventory_changes)
+        self.operations.invalidate()
+
+    def rewrite_operations(self, operations):
+        """整体替换全部操作记录"""
+        with self.conn:
+            self.conn.execute('DELETE FROM operations')
+            self._insert_operations(operations, start=1)
+        self.operations.invalidate()
+        return self.operations
+
+    def load_inventory(self):
+        """加载库存，从未保存过库存时返回 None"""
+        saved = self.conn.execute("SELECT value FROM meta WHERE key = 'inventory_saved'").fetchone()
+        if saved is None:
+            return None
+        columns = ', '.join(col for _, col in INVENTORY_COLUMNS)
+        keys = [key for key, _ in INVENTORY_COLUMNS]
+        inventory = {}
+        for row in self.conn.execute(f'SELECT {columns} FROM inventory ORDER BY rowid'):
+            item = dict(zip(keys, row))
+            inventory[item['物资编号']] = item
+        return inventory
+
+    def load_inventory_tagged(self):
+        """加载库存（数据库中的库存总是与操作记录一起写入，没有标记）"""
+        return self.load_inventory(), None
+
+    def save_inventory(self, inventory, inventory_changes=None):
+        """保存库存，给出 inventory_changes 时只写入变化的条目"""
+        with self.conn:
+            self._write_inventory(inventory, inventory_changes)
+
+    def convert_format(self, data_format):
+        """数据库存储没有需要转换的数据文件"""
+
+    def read_state(self):
+        """读取数据版本信息，从未写入过时返回空字典"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'state'").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def write_state(self, state):
+        """写入数据版本信息"""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('state', ?)",
+                              (json.dumps(state, ensure_ascii=False),))
+
+    def close(self):
+        self.conn.close()
+
+    def _insert_operations(self, operations, start=None):
+        columns = [col for _, col in OPERATION_COLUMNS]
+        keys = [key for key, _ in OPERATION_COLUMNS]
+        if start is None:
+            sql = f'INSERT INTO operations ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+            rows = ([item.get(key) for key in keys] for item in operations)
+        else:
+            sql = f'INSERT INTO operations (seq, {", ".join(columns)}) VALUES (?, {", ".join("?" * len(columns))})'
+            rows = ([seq] + [item.get(key) for key in keys] for seq, item in enumerate(operations, start=start))
+        self.conn.executemany(sql, rows)
+
+    def _write_inventory(self, inventory, inventory_changes=None):
+        columns = [col for _, col in INVENTORY_COLUMNS]
+        keys = [key for key, _ in INVENTORY_COLUMNS]
+        updates = ', '.join(f'{col} = excluded.{col}' for col in columns[1:])
+        upsert = (f'INSERT INTO inventory ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) '
+                  f'ON CONFLICT(item_id) DO UPDATE SET {updates}')
+
+        if inventory_changes is None:
+            self.conn.execute('DELETE FROM inventory')
+            changes = inventory.items()
+        else:
+            changes = inventory_changes.items()
+
+        for item_id, item in changes:
+            if item is None:
+                self.conn.execute('DELETE FROM inventory WHERE item_id = ?', (item_id,))
+            else:
+                values = [item.get(key, '') for key in keys]
+                values[0] = item_id
+                self.conn.execute(upsert, values)
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('inventory_saved', '1')")
+
+
+STORAGE_BACKENDS = {
+    JsonStorage.name: JsonStorage,
+    SqliteStorage.name: SqliteStorage
+}
+
+
+def open_storage(backend, data_dir, data_format='json'):
+    """按名称创建存储后端，data_format 为文件存储保存数据文件的格式"""
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f'未知的存储方式: {backend}（可选: {", ".join(STORAGE_BACKENDS)}）')
+    return STORAGE_BACKENDS[backend](data_dir, data_format)
+
+
+def convert_storage(source, target):
+    """把一个存储后端中的全部数据复制到另一个存储后端（需持有数据锁）
+
+    复制后更新目标存储的数据版本和代数，正在使用目标存储的程序实例会重新加载全部数据。
+
+    Returns:
+        (操作记录条数, 库存条目数)
+    """
+    source_state, target_state = source.read_state(), target.read_state()
+    operations = source.load_operations()
+    target.rewrite_operations(iter(operations))
+    inventory, tag = source.load_inventory_tagged()
+    if tag is not None and tag.get('position') != len(operations):
+        # 库存文件还没有包含最新的操作，不复制，目标存储首次加载时会重建库存
+        inventory = None
+    if inventory is not None:
+        target.save_inventory(inventory)
+    target.write_state({
+        'version': max(source_state.get('version', 0), target_state.get('version', 0)) + 1,
+        'generation': max(source_state.get('generation', 0), target_state.get('generation', 0)) + 1,
+        'inventory_in_sync': source_state.get('inventory_in_sync', True),
+    })
+    return len(operations), len(inventory or {})
+
+
+def convert_data_format(base_dir, data_format):
+    """在数据锁内把程序目录中的数据文件转换为 data_format 格式，并写入配置"""
+    from warehouse_core import WarehouseService
+
+    warehouse = WarehouseService(base_dir, on_warning=lambda title, message: print(f'{title}: {message}'))
+    try:
+        warehouse.convert_format(data_format)
+    finally:
+        errors = warehouse.close()
+    for message in errors.values():
+        print(message)
+    print(f'已把 {len(warehouse.data)} 条操作记录和库存文件转换为 {data_format} 格式')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在 JSON 和 SQLite 存储之间转换仓库数据，或转换数据文件格式')
+    parser.add_argument('--from', dest='source', choices=list(STORAGE_BACKENDS), default='json',
+                        help='原存储方式（默认 json）')
+    parser.add_argument('--to', dest='target', choices=list(STORAGE_BACKENDS),
+                        help='目标存储方式')
+    parser.add_argument('--format', dest='data_format', choices=file_format.FORMATS,
+                        help='数据文件格式：单独使用时把现有数据文件转换为该格式并写入配置；'
+                             '与 --to json 一起使用时为转换后文件的格式')
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'),
+                        help='数据目录（默认为程序目录下的 data）')
+    args = parser.parse_args()
+
+    if args.target is None:
+        if args.data_format is None:
+            parser.error('请指定目标存储方式 --to 或数据文件格式 --format')
+        data_dir = os.path.abspath(args.data_dir)
+        if os.path.basename(data_dir) != 'data':
+            parser.error('转换数据文件格式时数据目录必须是程序目录下的 data')
+        convert_data_format(os.path.dirname(data_dir), args.data_format)
+        return
+
+    if args.source == args.target:
+        parser.error('原存储方式和目标存储方式相同')
+
+    # 与程序使用同一个数据锁，转换期间其他实例不会修改数据
+    lock = FileLock(os.path.join(args.data_dir, 'warehouse.lock'), timeout=10)
+    try:
+        lock.acquire()
+    except LockTimeout as e:
+        parser.exit(1, f'其他程序实例正在修改数据，请稍后再试: {str(e)}\n')
+    try:
+        source = open_storage(args.source, args.data_dir)
+        target = open_storage(args.target, args.data_dir, args.data_format or 'json')
+        try:
+            op_count, inv_count = convert_storage(source, target)
+        finally:
+            source.close()
+            target.close()
+    finally:
+        lock.release()
+    print(f'已转换 {op_count} 条操作记录、{inv_count} 条库存记录')
+    print(f'如需使用新的存储方式，请将 config.json 中的 "storage" 设置为 "{args.target}"')
+
+
+if __name__ == '__main__':
+    main()
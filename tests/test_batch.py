@@ -0,0 +1,71 @@
+"""批量操作的回归测试
+
+在程序目录中运行：python -m unittest discover tests
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import run_batch  # noqa: E402
+from warehouse_core import WarehouseService  # noqa: E402
+
+BATCH = """物资操作,物资编号,物品名称,所属组织,物品数量,时间,操作人,提交者
+入库,A001,帐篷,一队,5,2025-03-01 09:00,张三,李四
+出库,A001,,,,2025-03-02 09:00,张三,李四
+"""
+
+
+class UnwritableLogTest(unittest.TestCase):
+    """data/logs 无法写入时，已经保存的操作照常报告，日志问题只作为警告"""
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp(prefix='warehouse_test_')
+        data_dir = os.path.join(self.base_dir, 'data')
+        os.makedirs(data_dir)
+        # logs 是普通文件，无法在其中创建日志
+        with open(os.path.join(data_dir, 'logs'), 'w') as f:
+            f.write('')
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def test_batch_removal_is_reported(self):
+        batch_file = os.path.join(self.base_dir, 'batch.csv')
+        with open(batch_file, 'w', encoding='utf-8') as f:
+            f.write(BATCH)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            code = run_batch(batch_file, base_dir=self.base_dir)
+        report = json.loads(output.getvalue())
+
+        self.assertEqual(code, 0)
+        self.assertEqual(report['accepted_count'], 2)
+        self.assertTrue(any(warning.startswith('日志写入错误') for warning in report['warnings']))
+
+        warehouse = WarehouseService(self.base_dir)
+        try:
+            self.assertEqual([item['物资操作'] for item in warehouse.data], ['入库', '出库'])
+            self.assertNotIn('A001', warehouse.inventory)
+        finally:
+            warehouse.close()
+
+    def test_remove_item_is_saved(self):
+        warehouse = WarehouseService(self.base_dir)
+        try:
+            warehouse.add_new_item('A001', '帐篷', '入库', '一队', 5, '2025-03-01 09:00', '张三', '李四')
+            warehouse.remove_item('A001', '2025-03-02 09:00', '张三', '李四')
+            self.assertNotIn('A001', warehouse.inventory)
+            self.assertEqual(warehouse.warnings[-1][0], '日志写入错误')
+        finally:
+            warehouse.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""二进制数据文件格式的回归测试
+
+在程序目录中运行：python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import file_format  # noqa: E402
+from snapshots import InventorySnapshots  # noqa: E402
+
+RECORD = {'提交时间': '2025-03-02 10:00:00', '物资编号': 'A001', '物品名称': '帐篷', '物资操作': '入库',
+          '所属组织': '一队', '物品数量': 5, '时间': '2025-03-01 09:00', '操作人': '张三', '提交者': '李四'}
+IRREGULAR = {'物资编号': 'A002', '物品数量': '3'}
+
+
+class BinaryFormatTest(unittest.TestCase):
+    def test_journal_records(self):
+        content = b''.join(file_format.encode_record(record, 'binary') for record in (RECORD, IRREGULAR))
+        records = []
+        self.assertEqual(file_format.parse_records(content, 'binary', records), len(content))
+        self.assertEqual(records, [RECORD, IRREGULAR])
+        self.assertEqual(tuple(records[0]), file_format.RECORD_FIELDS)
+
+    def test_truncated_and_corrupted_records(self):
+        first = file_format.encode_record(RECORD, 'binary')
+        content = first + file_format.encode_record(IRREGULAR, 'binary')
+        records = []
+        self.assertEqual(file_format.parse_records(content[:-2], 'binary', records), len(first))
+        self.assertEqual(records, [RECORD])
+        # 断电后填充的 0 视为没写完的记录
+        records = []
+        self.assertEqual(file_format.parse_records(first + b'\x00' * 8, 'binary', records), len(first))
+        corrupted = first[:4] + b'X' + first[5:] + content[len(first):]
+        with self.assertRaises(ValueError):
+            file_format.parse_records(corrupted, 'binary', [])
+
+    def test_document_checksum(self):
+        content = {'tag': {'position': 1, 'anchor': 'x'}, 'inventory': {'A001': {'物品数量': 5}}}
+        data = file_format.dumps(content, 'binary')
+        self.assertEqual(file_format.loads(data), content)
+        with self.assertRaises(ValueError):
+            file_format.loads(data[:-1] + b'!')
+
+
+class SnapshotNameTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='warehouse_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_extension_follows_format(self):
+        snapshots = InventorySnapshots(self.directory, data_format='binary')
+        snapshots.save(1, {'A001': {'物品数量': 5}}, [RECORD])
+        self.assertEqual(os.listdir(self.directory), ['inventory_0000000001.whb'])
+        snapshots.convert('json')
+        self.assertEqual(os.listdir(self.directory), ['inventory_0000000001.json'])
+        self.assertEqual(snapshots.load_latest([RECORD]), (1, {'A001': {'物品数量': 5}}))
+
+
+if __name__ == '__main__':
+    unittest.main()
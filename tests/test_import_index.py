@@ -0,0 +1,65 @@
+"""导入去重和覆盖冲突的回归测试
+
+在程序目录中运行：python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_index import ImportIndex  # noqa: E402
+from warehouse_core import WarehouseService  # noqa: E402
+
+
+def operation(action, quantity, time='2025-03-01 09:00'):
+    return {'提交时间': '2025-03-02 10:00:00', '物资编号': 'A001', '物品名称': '帐篷', '物资操作': action,
+            '所属组织': '一队', '物品数量': quantity, '时间': time, '操作人': '张三', '提交者': '李四'}
+
+
+EXISTING = [operation('入库', 100), operation('部分出库', 5), operation('部分出库', 3)]
+IMPORTED = [operation('入库', 100), operation('部分出库', 5), operation('部分出库', 4)]
+
+
+class ClassifyTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ImportIndex(os.devnull)
+        self.index.sync(EXISTING, 0)
+
+    def test_repeated_rows(self):
+        inserted, skipped, conflicts, matched = self.index.classify(EXISTING + [operation('部分出库', 5)])
+        self.assertEqual((len(inserted), len(skipped), len(conflicts)), (1, 3, 0))
+        self.assertEqual(matched, {0, 1, 2})
+
+    def test_conflict_keeps_matched_rows(self):
+        inserted, skipped, conflicts, matched = self.index.classify(IMPORTED)
+        self.assertEqual((inserted, skipped, conflicts), ([], IMPORTED[:2], IMPORTED[2:]))
+        self.assertEqual(matched, {0, 1})
+        # 与冲突行的物资编号、时间和操作相同的记录中，只有内容不同的那条需要删除
+        self.assertEqual(self.index.rows_with_keys(conflicts, matched), [2])
+
+
+class OverwriteTest(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp(prefix='warehouse_test_')
+        os.makedirs(os.path.join(self.base_dir, 'data'))
+        self.warehouse = WarehouseService(self.base_dir)
+
+    def tearDown(self):
+        self.warehouse.close()
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def test_overwrite_only_replaces_conflicting_record(self):
+        self.warehouse.import_operations(EXISTING)
+        imported, skipped, conflicts, problems = self.warehouse.import_operations(IMPORTED, overwrite=True)
+        self.assertEqual((len(imported), len(skipped), len(conflicts), problems), (1, 2, 1, []))
+
+        quantities = [(item['物资操作'], item['物品数量']) for item in self.warehouse.data]
+        self.assertEqual(quantities, [('入库', 100), ('部分出库', 5), ('部分出库', 4)])
+        self.assertEqual(self.warehouse.inventory['A001']['物品数量'], 91)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""旧版数据文件读取的回归测试
+
+在程序目录中运行：python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import iter_json_array  # noqa: E402
+
+ITEMS = [{'物资编号': 'A001', '物品数量': 5}, 12345, -1.25e-3, '帐篷', None, True, [], {}, [1, 2.5]]
+
+
+class JsonArrayTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='warehouse_test_')
+        self.path = os.path.join(self.directory, 'warehouse_data.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, text):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_elements_split_across_chunks(self):
+        """元素（包括数字）在块边界被截断时读入下一块后重新解析"""
+        for indent in (None, 4):
+            self.write(json.dumps(ITEMS, ensure_ascii=False, indent=indent))
+            for chunk_size in (1, 2, 3, 5, 1024):
+                self.assertEqual(list(iter_json_array(self.path, chunk_size)), ITEMS)
+
+    def test_malformed_files(self):
+        for text in ('{}', '[1, 2 3]', '[1, {"a": '):
+            self.write(text)
+            with self.assertRaises(ValueError):
+                list(iter_json_array(self.path, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
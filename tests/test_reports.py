@@ -0,0 +1,76 @@
+"""保存的统计报表的回归测试
+
+在程序目录中运行：python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reports import OperationReport  # noqa: E402
+from warehouse_core import WarehouseService  # noqa: E402
+
+
+def operation(idx):
+    return {'提交时间': '2025-03-02 10:00:00', '物资编号': f'A{idx % 3:03d}', '物品名称': '帐篷', '物资操作': '入库',
+            '所属组织': '一队', '物品数量': idx + 1, '时间': f'2025-0{idx % 3 + 1}-01 09:00', '操作人': '张三', '提交者': '李四'}
+
+
+class SavedReportTest(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp(prefix='warehouse_test_')
+        os.makedirs(os.path.join(self.base_dir, 'data'))
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def full_scan(self, warehouse):
+        report = OperationReport()
+        for item in warehouse.data:
+            report.add(item)
+        return report.to_content()
+
+    def test_replays_only_newer_operations(self):
+        warehouse = WarehouseService(self.base_dir)
+        warehouse.import_operations([operation(idx) for idx in range(10)])
+        warehouse.reports()
+        warehouse.close()
+
+        # 另一个实例追加记录，但没有打开过报表
+        other = WarehouseService(self.base_dir)
+        other.import_operations([operation(idx) for idx in range(10, 12)])
+        other.close()
+
+        warehouse = WarehouseService(self.base_dir)
+        try:
+            report, position = warehouse.load_operation_report()
+            self.assertEqual(position, 10)
+            warehouse.reports()
+            self.assertEqual(warehouse.operation_report.to_content(), self.full_scan(warehouse))
+        finally:
+            warehouse.close()
+
+    def test_rewritten_operations_are_recounted(self):
+        warehouse = WarehouseService(self.base_dir)
+        warehouse.import_operations([operation(idx) for idx in range(10)])
+        warehouse.reports()
+        warehouse.close()
+
+        warehouse = WarehouseService(self.base_dir)
+        warehouse.import_operations([dict(operation(0), 物品数量=100)], overwrite=True)
+        warehouse.close()
+
+        warehouse = WarehouseService(self.base_dir)
+        try:
+            self.assertEqual(warehouse.load_operation_report()[1], 0)
+            warehouse.reports()
+            self.assertEqual(warehouse.operation_report.to_content(), self.full_scan(warehouse))
+        finally:
+            warehouse.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""本地服务的回归测试
+
+在程序目录中运行：python -m unittest discover tests
+"""
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_lock import FileLock  # noqa: E402
+from server import WarehouseServer  # noqa: E402
+from warehouse_core import WarehouseService  # noqa: E402
+
+ROW = {'物资操作': '入库', '物资编号': 'A001', '物品名称': '帐篷', '所属组织': '一队', '物品数量': 5,
+       '时间': '2025-03-01 09:00', '操作人': '张三', '提交者': '李四'}
+
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp(prefix='warehouse_test_')
+        os.makedirs(os.path.join(self.base_dir, 'data'))
+        self.warehouse = WarehouseService(self.base_dir)
+        self.server = WarehouseServer(self.warehouse)
+
+    def tearDown(self):
+        self.server.executor.shutdown(wait=True)
+        self.warehouse.close()
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def test_reads_do_not_wait_for_commit(self):
+        """其他程序持有数据锁时提交在写入线程中等待，读取照常从快照返回"""
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            self.server.queue = asyncio.Queue()
+            await loop.run_in_executor(self.server.executor, self.server.publish)
+            writer = asyncio.create_task(self.server.writer())
+
+            lock = FileLock(os.path.join(self.base_dir, 'data', 'warehouse.lock'))
+            lock.acquire()
+            try:
+                post = asyncio.create_task(self.server.post_operation({}, json.dumps(ROW).encode('utf-8')))
+                await asyncio.sleep(0.2)
+                start = time.monotonic()
+                status, page = await self.server.get_inventory({}, b'')
+                elapsed = time.monotonic() - start
+                self.assertFalse(post.done())
+            finally:
+                lock.release()
+
+            self.assertEqual((status, page['total']), (200, 0))
+            self.assertLess(elapsed, 0.1)
+            status, payload = await post
+            self.assertEqual(status, 201)
+            # 提交完成时新的快照已经发布
+            _, page = await self.server.get_inventory({'q': '帐篷'}, b'')
+            self.assertEqual([item['物品数量'] for item in page['items']], [5])
+            _, page = await self.server.get_operations({'sort': '物品数量', 'reverse': '1'}, b'')
+            self.assertEqual(page['items'][0]['序号'], 0)
+            writer.cancel()
+
+        asyncio.run(scenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
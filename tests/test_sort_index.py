@@ -0,0 +1,28 @@
+"""排序缓存的回归测试
+
+在程序目录中运行：python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sort_index import SortOrders  # noqa: E402
+
+QUANTITIES = [5, 3, 8, 1]
+
+
+class SortOrdersTest(unittest.TestCase):
+    def test_result_does_not_share_cache(self):
+        sorts = SortOrders(lambda: range(len(QUANTITIES)), lambda row, column: QUANTITIES[row])
+        rows = sorts.sorted_rows('物品数量', False)
+        self.assertEqual(rows, [3, 1, 0, 2])
+        rows.reverse()
+        rows.append(99)
+        self.assertEqual(sorts.sorted_rows('物品数量', False), [3, 1, 0, 2])
+        self.assertEqual(sorts.sorted_rows('物品数量', True), [2, 0, 1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
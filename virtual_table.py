@@ -0,0 +1,194 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTreeview:
+    """虚拟表格：Treeview 中只保留可见的行（上下各多留少量预留行）
+
+    滚动时根据位置向 fetch_values 取对应行的数据并复用已有的行，
+    滚动条按完整结果的行数计算。
+
+    Args:
+        parent: 父组件
+        columns: 列名
+        fetch_values: 函数，根据行键返回该行各列的值
+        overscan: 可见区域上下各多保留的行数
+    """
+
+    DEFAULT_ROW_HEIGHT = 20
+    DEFAULT_HEADER_HEIGHT = 25
+
+    def __init__(self, parent, columns, fetch_values, overscan=20):
+        self.fetch_values = fetch_values
+        self.overscan = overscan
+        self.rows = []  # 当前显示结果的行键序列
+        self.first = 0  # 可见区域第一行在结果中的位置
+        self.visible = 20  # 可见行数，随控件高度变化
+        self.win_start = 0  # Treeview 中保留的行在结果中的范围 [win_start, win_end)
+        self.win_end = 0
+        self.selected = None  # 选中行在结果中的位置
+
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show='headings', selectmode='browse')
+        self.scrollbar = ttk.Scrollbar(self.frame, orient='vertical', command=self.yview)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.tree.bind('<Configure>', self.on_configure)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<MouseWheel>', self.on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Up>', lambda e: self.move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self.move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self.move_selection(-self.visible))
+        self.tree.bind('<Next>', lambda e: self.move_selection(self.visible))
+        self.tree.bind('<Home>', lambda e: self.move_selection(-len(self.rows)))
+        self.tree.bind('<End>', lambda e: self.move_selection(len(self.rows)))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def destroy(self):
+        self.frame.destroy()
+
+    def set_rows(self, rows, keep_position=True):
+        """设置要显示的结果
+
+        Args:
+            rows: 行键序列（支持 len 和下标访问即可，不会整体复制）
+            keep_position: 是否保持当前滚动位置，否则回到顶部
+        """
+        # 同一位置仍是原来的行时保留选中状态
+        if self.selected is not None:
+            old_key = self.rows[self.selected] if self.selected < len(self.rows) else None
+            if self.selected >= len(rows) or rows[self.selected] != old_key:
+                self.selected = None
+
+        self.rows = rows
+        if not keep_position:
+            self.first = 0
+        self.render(force=True)
+
+    def selected_key(self):
+        """返回选中行的行键，没有选中时返回 None"""
+        if self.selected is None or self.selected >= len(self.rows):
+            return None
+        return self.rows[self.selected]
+
+    def yview(self, *args):
+        """滚动条回调"""
+        total = len(self.rows)
+        if not total:
+            return
+        if args[0] == 'moveto':
+            self.first = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self.visible
+            self.first += amount
+        self.render()
+
+    def scroll(self, amount):
+        self.first += amount
+        self.render()
+        return 'break'
+
+    def on_mousewheel(self, event):
+        if event.delta:
+            # Windows 上每格为 120，macOS 上为较小的整数
+            step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+            return self.scroll(-3 * step)
+        return 'break'
+
+    def move_selection(self, amount):
+        """键盘移动选中行，并保证其可见"""
+        total = len(self.rows)
+        if not total:
+            return 'break'
+        current = self.selected if self.selected is not None else self.first - 1 if amount > 0 else self.first
+        self.selected = max(0, min(total - 1, current + amount))
+        if self.selected < self.first:
+            self.first = self.selected
+        elif self.selected >= self.first + self.visible:
+            self.first = self.selected - self.visible + 1
+        self.render(force=True)
+        return 'break'
+
+    def on_select(self, event):
+        """记录用户在可见行中选中的行"""
+        selection = self.tree.selection()
+        if selection:
+            self.selected = self.win_start + self.tree.index(selection[0])
+        elif self.selected is not None and self.win_start <= self.selected < self.win_end:
+            self.selected = None
+
+    def on_configure(self, event):
+        """控件大小变化时重新计算可见行数"""
+        row_height, header_height = self.DEFAULT_ROW_HEIGHT, self.DEFAULT_HEADER_HEIGHT
+        items = self.tree.get_children()
+        offset = self.first - self.win_start
+        if 0 <= offset < len(items):
+            bbox = self.tree.bbox(items[offset])
+            if bbox:
+                header_height, row_height = bbox[1], bbox[3]
+        visible = max(1, (event.height - header_height) // max(1, row_height))
+        if visible != self.visible:
+            self.visible = visible
+            self.render(force=True)
+
+    def on_tree_scroll(self, lo, hi):
+        """Treeview 自身在预留行范围内滚动时（如点击半露出的行）同步位置"""
+        count = self.win_end - self.win_start
+        if count:
+            self.first = self.win_start + int(float(lo) * count + 0.5)
+        self.update_scrollbar()
+
+    def render(self, force=False):
+        """把可见区域的行放进 Treeview"""
+        total = len(self.rows)
+        self.first = max(0, min(self.first, total - self.visible))
+
+        # 可见区域仍在已保留的行内时只需滚动，不重新取数据
+        if force or self.first < self.win_start or min(total, self.first + self.visible) > self.win_end:
+            self.win_start = max(0, self.first - self.overscan)
+            self.win_end = min(total, self.first + self.visible + self.overscan)
+            self.fill_window()
+
+        items = self.tree.get_children()
+        if items:
+            # 先滚到底再滚回来，使 first 所在行位于顶端
+            self.tree.see(items[-1])
+            self.tree.see(items[self.first - self.win_start])
+
+        if self.selected is not None and self.win_start <= self.selected < self.win_end:
+            selected_item = items[self.selected - self.win_start]
+            if self.tree.selection() != (selected_item,):
+                self.tree.selection_set(selected_item)
+            self.tree.focus(selected_item)
+        elif self.tree.selection():
+            self.tree.selection_set(())
+
+        self.update_scrollbar()
+
+    def fill_window(self):
+        """复用已有的行显示 [win_start, win_end) 范围内的数据"""
+        items = self.tree.get_children()
+        count = self.win_end - self.win_start
+        for offset in range(count):
+            values = self.fetch_values(self.rows[self.win_start + offset])
+            if offset < len(items):
+                self.tree.item(items[offset], values=values)
+            else:
+                self.tree.insert('', tk.END, values=values)
+        if len(items) > count:
+            self.tree.delete(*items[count:])
+
+    def update_scrollbar(self):
+        total = len(self.rows)
+        if total <= self.visible:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first / total, min(1, (self.first + self.visible) / total))
@@ -0,0 +1,1377 @@
+import contextlib
+import datetime
+import json
+import os
+import threading
+
+import excel_io
+import file_format
+from as_of_index import AsOfIndex, parse_as_of
+from file_lock import FileLock, LockTimeout
+from import_index import ImportIndex
+import reports
+from reports import OperationReport, StockReport
+from snapshots import InventorySnapshots
+from storage import open_storage
+from write_behind import WriteBehind
+from search_index import NgramIndex
+from sort_index import SortOrders, parse_timestamp, sort_key
+
+# 操作时间的格式
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+TIME_FORMAT_MESSAGE = '时间格式不正确，应为：年-月-日 时:分 (如 2023-05-16 14:30)'
+
+
+class WarehouseError(Exception):
+    """仓库操作失败，异常信息可以直接展示给用户"""
+
+
+class ValidationError(WarehouseError, ValueError):
+    """输入的操作不符合要求"""
+
+
+class ItemNotFoundError(ValidationError):
+    """库存中不存在该物品"""
+
+
+class InsufficientStockError(ValidationError):
+    """出库数量超过当前库存"""
+
+
+class StorageError(WarehouseError):
+    """读写数据或配置文件失败
+
+    Args:
+        title: 错误的简短标题（如“数据保存错误”）
+        message: 错误信息
+    """
+
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+
+
+def apply_operation(inventory, item):
+    """将一条操作记录应用到库存字典上（重建库存的重放规则）
+
+    库存条目只整体替换、不原地修改，复制过的库存字典之间可以安全地共用条目。
+    """
+    item_id = item.get('物资编号', '')
+    operation = item.get('物资操作', '')
+    qty = item.get('物品数量', 0)
+
+    if not item_id:
+        return
+
+    if operation == '入库' or operation == '物资增添':
+        if item_id not in inventory:
+            # 新物品，添加到库存
+            inventory[item_id] = {
+                "物资编号": item_id,
+                "物品名称": item.get('物品名称', ''),
+                "所属组织": item.get('所属组织', ''),
+                "物品数量": qty,
+                "最后操作": item.get('物资操作', ''),
+                "最后操作人": item.get('操作人', ''),
+                "最后操作时间": item.get('时间', ''),
+                "备注": ""
+            }
+        else:
+            # 现有物品，增加数量
+            updated = dict(inventory[item_id])
+            updated['物品数量'] += qty
+            updated['最后操作'] = operation
+            updated['最后操作人'] = item.get('操作人', '')
+            updated['最后操作时间'] = item.get('时间', '')
+            inventory[item_id] = updated
+
+    elif operation == '出库':
+        # 完全出库，从库存中移除
+        if item_id in inventory:
+            del inventory[item_id]
+
+    elif operation == '部分出库':
+        # 部分出库，减少数量
+        if item_id in inventory:
+            updated = dict(inventory[item_id])
+            updated['物品数量'] -= qty
+            if updated['物品数量'] <= 0:
+                # 如果数量减至0或以下，移除物品
+                del inventory[item_id]
+            else:
+                # 更新最后操作信息
+                updated['最后操作'] = operation
+                updated['最后操作人'] = item.get('操作人', '')
+                updated['最后操作时间'] = item.get('时间', '')
+                inventory[item_id] = updated
+
+
+def stock_problem(inventory, item):
+    """应用一条操作记录之前检查库存：出库的物品不在库存中，或部分出库超过库存时返回说明，否则返回 None
+
+    这样的记录按重放规则处理（不在库存中时忽略，超过库存时移除物品），只用于提醒。
+    """
+    operation = item.get('物资操作', '')
+    if operation != '出库' and operation != '部分出库':
+        return None
+    item_id = item.get('物资编号', '')
+    current = inventory.get(item_id)
+    if current is None:
+        return f'物资编号{item_id}（{item.get("时间", "")}）{operation}时库存中没有该物品'
+    qty = item.get('物品数量', 0)
+    if operation == '部分出库' and qty > current['物品数量']:
+        return f'物资编号{item_id}（{item.get("时间", "")}）部分出库{qty}超过库存{current["物品数量"]}'
+    return None
+
+
+def sort_by_time(items):
+    """按“时间”排列记录（时间相同时保持原顺序，无法解析的时间排在最前）"""
+    return sorted(items, key=lambda item: parse_timestamp(item.get('时间', '')) or 0)
+
+
+def check_time(time_str):
+    """校验操作时间的格式"""
+    try:
+        datetime.datetime.strptime(time_str, TIME_FORMAT)
+    except (TypeError, ValueError):
+        raise ValidationError(TIME_FORMAT_MESSAGE)
+
+
+def operation_search_fields(item):
+    """操作记录中可搜索的字段"""
+    return [
+        str(item.get('物资编号', '')),
+        item.get('物品名称', ''),
+        item.get('物资操作', ''),
+        item.get('所属组织', ''),
+        str(item.get('物品数量', '')),
+        item.get('时间', ''),
+        item.get('操作人', ''),
+        item.get('提交者', ''),
+        item.get('提交时间', '')
+    ]
+
+
+def inventory_search_fields(item_id, item):
+    """库存中可搜索的字段"""
+    return [
+        item_id,
+        item.get('物品名称', ''),
+        item.get('所属组织', ''),
+        str(item.get('物品数量', '')),
+        item.get('最后操作', ''),
+        item.get('最后操作人', ''),
+        item.get('最后操作时间', ''),
+        item.get('备注', '')
+    ]
+
+
+class WarehouseService:
+    """仓库的数据和业务规则，不依赖界面
+
+    负责配置、存储、库存、检查点、搜索索引和排序缓存；
+    输入不符合要求时抛出 ValidationError，读写失败时抛出 StorageError。
+    加载过程中不影响继续使用的问题（如配置无法读取）交给 on_warning。
+
+    同一数据目录可以被多个程序实例同时使用：每次修改都在数据锁内进行，
+    修改前先读入其他实例写入的数据，再按最新的库存校验；修改后更新数据版本，
+    其他实例通过 is_stale() 发现变化，再用 sync() 读入。
+
+    JSON 库存文件和配置文件由后台线程保存（连续的多次修改只写一次），
+    用完后调用 close() 等待保存完成。
+
+    Args:
+        base_dir: 程序目录，其下有 data/、output/ 和 config.json，默认为本文件所在目录
+        on_warning: 函数 on_warning(标题, 信息)，默认记录到 self.warnings
+    """
+
+    def __init__(self, base_dir=None, on_warning=None):
+        self.base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+        self.on_warning = on_warning
+        self.warnings = []
+        self.data = []  # 存储物资操作信息的列表
+        self.inventory = {}  # 存储当前库存信息，格式: {物资编号: {物品信息}}
+        self.inventory_in_sync = True  # 库存是否与操作记录的重放结果一致
+        self.state = None  # 最近一次读入或写入的数据版本，None 表示尚未加载
+        self.dirty = False  # 持有数据锁期间是否写入了数据
+        self.rewritten = False  # 持有数据锁期间操作记录是否被整体重写
+        self.writer = WriteBehind()  # 保存库存文件和配置文件的后台线程
+        self.operations_index = None  # 操作记录搜索索引，None 表示需要重新建立
+        self.operations_index_version = 0  # 记录顺序每变化一次加一，用于放弃过期的索引构建
+        self.operations_index_builder = None  # 正在分批建立的索引，搜索被取消后由下一次搜索接着建
+        self.inventory_index = None  # 库存搜索索引
+        self.as_of_index = None  # 按操作时间排列的索引，第一次查询历史库存时建立
+        self.import_index = None  # 导入去重用的记录指纹，第一次导入时读取
+        self.operation_report = None  # 按操作人、月份、物品累计的出入库统计，None 表示需要重新统计
+        self.operation_report_builder = None  # 正在分批进行的统计
+        self.report_saved_tag = None  # 最近一次交给后台保存的统计对应的标记
+        self.stock_report = None  # 按组织统计的当前库存，None 表示需要重新统计
+        # 按列缓存的排序结果，排序只改变显示顺序，不改变数据本身的顺序
+        self.operation_sorts = SortOrders(lambda: range(len(self.data)),
+                                          lambda idx, col: self.data[idx].get(col, ''))
+        self.inventory_sorts = SortOrders(lambda: list(self.inventory),
+                                          lambda item_id, col: item_id if col == '物资编号' else self.inventory[item_id].get(col, ''))
+
+        self.init_paths()
+        self.load_config()
+        self.open_storage()
+        try:
+            self.sync()
+        except StorageError as e:
+            self.warn(e.title, str(e))
+            if self.state is None:
+                self.load_data()
+                self.load_inventory()
+
+    def warn(self, title, message):
+        """报告不影响继续使用的问题"""
+        if self.on_warning is not None:
+            self.on_warning(title, message)
+        else:
+            self.warnings.append((title, message))
+
+    # ---------- 配置与存储 ----------
+
+    def init_paths(self):
+        """初始化路径设置"""
+        self.data_dir = os.path.join(self.base_dir, 'data')
+        self.output_dir = os.path.join(self.base_dir, 'output')
+        self.config_file = os.path.join(self.base_dir, 'config.json')
+        self.import_index_file = os.path.join(self.data_dir, 'import_index.bin')
+        self.report_file = os.path.join(self.data_dir, 'report_data.json')
+
+        # 确保目录存在
+        for directory in [self.data_dir, self.output_dir]:
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+
+        self.lock = FileLock(os.path.join(self.data_dir, 'warehouse.lock'), timeout=10)
+
+    def load_config(self):
+        """加载配置文件"""
+        self.organizations = []
+        self.operators = []
+        self.storage_backend = 'json'  # 存储方式：'json'或'sqlite'
+        self.data_format = 'json'  # 数据文件格式：'json'或'binary'
+
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                    self.organizations = config.get('organization', {}).get('val', [])
+                    self.operators = config.get('operators', {}).get('val', [])
+                    self.storage_backend = config.get('storage', {}).get('val', 'json')
+                    self.data_format = config.get('data_format', {}).get('val', 'json')
+            except Exception as e:
+                self.warn('配置加载错误', f'无法加载配置: {str(e)}')
+
+        if self.data_format not in file_format.FORMATS:
+            self.warn('配置加载错误', f'未知的数据文件格式 {self.data_format}，改用JSON格式')
+            self.data_format = 'json'
+
+    def config_content(self):
+        """返回要保存的配置（复制列表，之后的修改不影响返回值）"""
+        return {
+            "organization": {
+                "val": list(self.organizations)
+            },
+            "operators": {
+                "val": list(self.operators)
+            },
+            "storage": {
+                "val": self.storage_backend
+            },
+            "data_format": {
+                "val": self.data_format
+            }
+        }
+
+    def write_config(self, config):
+        """把配置写入文件（先写临时文件再替换）"""
+        tmp_path = f'{self.config_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.config_file)
+
+    def save_config(self):
+        """保存配置到文件"""
+        try:
+            self.write_config(self.config_content())
+        except Exception as e:
+            raise StorageError('配置保存错误', f'无法保存配置: {str(e)}')
+
+    def add_operators(self, new_operators):
+        """把新的操作者加入列表，返回列表是否有变化"""
+        # 转换为集合以去重
+        operators_set = set(self.operators)
+
+        # 添加新操作者
+        changed = False
+        for operator in new_operators:
+            if operator and operator not in operators_set:
+                self.operators.append(operator)
+                operators_set.add(operator)
+                changed = True
+        return changed
+
+    def remember_operators(self, names):
+        """登记操作人和提交者，有新名字时交给后台线程保存配置"""
+        if self.add_operators(names):
+            config = self.config_content()
+            self.writer.submit('config', lambda: self.write_config(config))
+
+    def open_storage(self):
+        """按配置打开存储后端和库存检查点"""
+        try:
+            self.storage = open_storage(self.storage_backend, self.data_dir, self.data_format)
+        except Exception as e:
+            self.warn('存储打开错误', f'无法打开{self.storage_backend}存储，改用JSON存储: {str(e)}')
+            self.storage = open_storage('json', self.data_dir, self.data_format)
+        self.snapshots = InventorySnapshots(os.path.join(self.data_dir, 'snapshots'), data_format=self.data_format)
+
+    def load_data(self):
+        """从存储加载操作数据"""
+        try:
+            self.data = self.storage.load_operations()
+        except Exception as e:
+            self.warn('数据加载错误', f'无法加载数据: {str(e)}')
+
+    def load_inventory(self):
+        """从存储加载库存数据
+
+        后台保存的库存文件可能晚于操作记录，加载时重放文件之后的操作；
+        文件与操作记录对不上时重建库存。
+        """
+        try:
+            inventory, tag = self.storage.load_inventory_tagged()
+        except Exception as e:
+            self.warn('库存数据加载错误', f'无法加载库存数据: {str(e)}')
+            self.inventory = {}
+            self.stock_report = None
+            return
+
+        if inventory is not None and tag is not None and self.inventory_in_sync:
+            inventory = self.replay_since(inventory, tag)
+
+        if inventory is not None:
+            self.inventory = inventory
+            self.inventory_index = None
+            self.stock_report = None
+            self.inventory_sorts.clear()
+        else:
+            # 如果库存数据不存在，根据操作记录重新生成库存
+            try:
+                self.rebuild_inventory_from_operations()
+            except StorageError as e:
+                self.warn(e.title, str(e))
+
+    def inventory_tag(self):
+        """库存对应的操作记录位置，随后台保存的库存文件一起保存"""
+        anchor = InventorySnapshots.fingerprint(self.data[-1]) if self.data else None
+        return {'position': len(self.data), 'anchor': anchor}
+
+    def replay_since(self, inventory, tag):
+        """把标记位置之后的操作重放到库存上，位置与操作记录对不上时返回 None"""
+        position = tag.get('position', 0)
+        if position > len(self.data):
+            return None
+        anchor = InventorySnapshots.fingerprint(self.data[position - 1]) if position else None
+        if anchor != tag.get('anchor'):
+            return None
+        for idx in range(position, len(self.data)):
+            apply_operation(inventory, self.data[idx])
+        return inventory
+
+    def rebuild_inventory_from_operations(self):
+        """根据操作记录重建库存数据
+
+        从最新的有效检查点开始，只重放检查点之后的操作；
+        没有可用检查点时才从头重放全部操作。
+        """
+        with self.writing():
+            snapshot = self.snapshots.load_latest(self.data)
+            if snapshot:
+                start, self.inventory = snapshot
+            else:
+                start, self.inventory = 0, {}
+
+            for idx in range(start, len(self.data)):
+                apply_operation(self.inventory, self.data[idx])
+
+            self.inventory_in_sync = True
+            self.inventory_index = None
+            self.stock_report = None
+            self.inventory_sorts.clear()
+            if len(self.data) > start:
+                self.save_checkpoint()
+
+            # 保存重建后的库存
+            self.save_inventory()
+
+    def save_checkpoint(self):
+        """保存当前库存状态为检查点（检查点只用于加速，失败时只报告不中断）"""
+        try:
+            self.snapshots.save(len(self.data), self.inventory, self.data)
+        except Exception as e:
+            self.warn('检查点保存错误', f'无法保存库存检查点: {str(e)}')
+
+    def check_checkpoint(self):
+        """定期为与操作记录一致的库存保存检查点"""
+        if self.inventory_in_sync and self.snapshots.is_due(len(self.data)):
+            self.save_checkpoint()
+
+    def save_data(self):
+        """整体重写操作记录（仅在删除操作记录时使用）"""
+        with self.writing():
+            self.dirty = self.rewritten = True
+            try:
+                self.data = self.storage.rewrite_operations(self.data)
+            except Exception as e:
+                raise StorageError('数据保存错误', f'无法保存数据: {str(e)}')
+            finally:
+                # 记录位置发生变化，旧检查点和搜索索引失效
+                self.snapshots.clear()
+                self.invalidate_operations_index()
+
+    def convert_format(self, data_format):
+        """把操作记录、库存文件和检查点转换为 data_format 格式，并写入配置"""
+        if data_format not in file_format.FORMATS:
+            raise ValidationError(f'未知的数据文件格式: {data_format}')
+        with self.writing():
+            # 等待后台保存完成，避免转换后又被写入旧格式的库存文件
+            self.flush()
+            self.dirty = self.rewritten = True
+            try:
+                self.storage.convert_format(data_format)
+                self.snapshots.convert(data_format)
+            except Exception as e:
+                raise StorageError('数据保存错误', f'无法转换数据文件格式: {str(e)}')
+            self.data_format = data_format
+            self.save_config()
+
+    def save_inventory(self, changes=None):
+        """保存库存数据（库存文件交给后台线程保存）
+
+        Args:
+            changes: 只有这些物品变化时提供 {物资编号: 新的库存条目或 None}，数据库存储只写入这些条目
+        """
+        with self.writing():
+            self.dirty = True
+            if self.storage.saves_inventory_with_operations:
+                try:
+                    self.storage.save_inventory(self.inventory, changes)
+                except Exception as e:
+                    raise StorageError('库存数据保存错误', f'无法保存库存数据: {str(e)}')
+            else:
+                self.schedule_inventory_save()
+            self.check_checkpoint()
+
+    def schedule_inventory_save(self):
+        """把当前库存交给后台线程保存
+
+        库存条目只会被整体替换、不会原地修改，复制字典即可得到此刻的库存。
+        """
+        inventory = dict(self.inventory)
+        tag = self.inventory_tag()
+        storage = self.storage
+        self.writer.submit('inventory', lambda: storage.save_inventory(inventory, tag=tag))
+        self.schedule_report_save()
+
+    def append_operations(self, operations):
+        """追加操作记录（不涉及库存变化）"""
+        with self.writing():
+            if operations and self.inventory_in_sync:
+                # 先让其他实例知道库存需要重建，再写入记录
+                self.inventory_in_sync = False
+                self.publish_state()
+            start = len(self.data)
+            self.dirty = True
+            try:
+                self.storage.append_operations(operations)
+            except Exception as e:
+                raise StorageError('数据保存错误', f'无法保存数据: {str(e)}')
+            finally:
+                self.index_new_operations(start)
+
+    def commit_operation(self, operation, changes):
+        """保存一条操作记录及其引起的库存变化
+
+        数据库存储时两者在同一个事务中写入；保存失败时撤销内存中的库存变化并抛出 StorageError。
+
+        Args:
+            operation: 操作记录
+            changes: 库存变化 {物资编号: 新的库存条目或 None(从库存移除)}
+        """
+        self.commit_operations([operation], changes)
+
+    def commit_operations(self, operations, changes, previous=None):
+        """一次保存多条操作记录及其引起的库存变化
+
+        Args:
+            operations: 操作记录
+            changes: 库存变化 {物资编号: 新的库存条目或 None(从库存移除)}
+            previous: changes 已经应用到内存库存时，提供变化前的条目用于保存失败时撤销
+        """
+        with self.writing():
+            start = len(self.data)
+            if previous is None:
+                previous = {item_id: self.inventory.get(item_id) for item_id in changes}
+                self.apply_inventory_changes(changes)
+            self.dirty = True
+            try:
+                if self.storage.saves_inventory_with_operations:
+                    self.storage.append_operations(operations, self.inventory, changes)
+                else:
+                    self.storage.append_operations(operations)
+            except Exception as e:
+                self.apply_inventory_changes(previous)
+                raise StorageError('数据保存错误', f'无法保存数据: {str(e)}')
+            self.index_new_operations(start)
+            if not self.storage.saves_inventory_with_operations:
+                self.schedule_inventory_save()
+            self.check_checkpoint()
+
+    def apply_inventory_changes(self, changes):
+        """把库存变化应用到内存中的库存"""
+        if changes:
+            self.inventory_sorts.clear()
+        for item_id, item in changes.items():
+            if self.stock_report is not None:
+                self.stock_report.change(self.inventory.get(item_id), item)
+            if item is None:
+                self.inventory.pop(item_id, None)
+                if self.inventory_index is not None:
+                    self.inventory_index.remove(item_id)
+            else:
+                self.inventory[item_id] = item
+                if self.inventory_index is not None:
+                    self.inventory_index.add(item_id, inventory_search_fields(item_id, item))
+
+    def write_status(self):
+        """后台保存的状态：(等待保存的文件数, {名称: 错误信息})，名称为 'inventory' 或 'config'"""
+        return self.writer.status()
+
+    def flush(self):
+        """等待后台线程保存完成（失败的会重试一次），返回仍然失败的 {名称: 错误信息}"""
+        return self.writer.flush()
+
+    def close(self):
+        """保存全部内容并关闭存储，返回保存失败的 {名称: 错误信息}"""
+        self.schedule_report_save()
+        errors = self.writer.close()
+        self.storage.close()
+        return errors
+
+    # ---------- 多实例同步 ----------
+
+    @contextlib.contextmanager
+    def writing(self):
+        """在数据锁内修改数据
+
+        最外层获取数据锁时先读入其他实例写入的数据；释放前如果写入了数据，更新数据版本。
+        可以嵌套使用。
+        """
+        outermost = self.lock.depth == 0
+        if outermost:
+            try:
+                self.lock.acquire()
+            except LockTimeout as e:
+                raise StorageError('数据锁定错误', f'其他程序实例正在修改数据，请稍后再试: {str(e)}')
+        try:
+            if outermost:
+                self.refresh()
+            yield
+        finally:
+            if outermost:
+                try:
+                    if self.dirty:
+                        self.publish_state()
+                finally:
+                    self.lock.release()
+
+    def read_state(self):
+        """读取存储中的数据版本"""
+        try:
+            return self.storage.read_state()
+        except Exception as e:
+            raise StorageError('数据加载错误', f'无法读取数据版本: {str(e)}')
+
+    def publish_state(self):
+        """更新数据版本，让其他实例知道数据已变化（需持有数据锁）"""
+        state = dict(self.state or {})
+        state['version'] = state.get('version', 0) + 1
+        if self.rewritten:
+            state['generation'] = state.get('generation', 0) + 1
+        state['inventory_in_sync'] = self.inventory_in_sync
+        try:
+            self.storage.write_state(state)
+        except Exception as e:
+            raise StorageError('数据保存错误', f'无法保存数据版本: {str(e)}')
+        self.state = state
+        self.dirty = self.rewritten = False
+
+    def refresh(self):
+        """读入其他实例写入的数据（需持有数据锁），返回数据是否有变化
+
+        操作记录只被追加时只读入新增的部分；被整体重写过时重新加载全部记录。
+        """
+        state = self.read_state()
+        if self.state is not None and state == self.state:
+            return False
+
+        if self.state is None or state.get('generation', 0) != self.state.get('generation', 0):
+            self.load_data()
+            self.invalidate_operations_index()
+        else:
+            start = len(self.data)
+            try:
+                self.storage.load_new_operations()
+            except Exception as e:
+                raise StorageError('数据加载错误', f'无法加载数据: {str(e)}')
+            self.index_new_operations(start)
+
+        self.state = state
+        self.inventory_in_sync = state.get('inventory_in_sync', True)
+        self.snapshots.rescan()
+        self.load_inventory()
+        return True
+
+    def is_stale(self):
+        """其他实例是否写入了本实例尚未读入的数据（不获取数据锁，只用于决定是否 sync）"""
+        try:
+            return self.storage.read_state() != self.state
+        except Exception:
+            return False
+
+    def sync(self):
+        """在数据锁内读入其他实例写入的数据，返回数据是否有变化"""
+        state = self.state
+        with self.writing():
+            pass  # 获取数据锁时已读入
+        return self.state != state
+
+    # ---------- 物资操作 ----------
+
+    def new_operation(self, item_id, item_name, operation_type, organization, qty, time_str, operator, submitter):
+        """生成一条操作记录"""
+        return {
+            "提交时间": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "物资编号": item_id,
+            "物品名称": item_name,
+            "物资操作": operation_type,
+            "所属组织": organization,
+            "物品数量": qty,
+            "时间": time_str,
+            "操作人": operator,
+            "提交者": submitter
+        }
+
+    def prepare_stock_operation(self, operation_type, item_id, qty, time_str, operator, submitter):
+        """校验物资增添、部分出库等针对已有物品的操作
+
+        Args:
+            qty: 操作数量（整数或可转换为整数的字符串）
+
+        Returns:
+            (操作记录, 库存变化, 提示信息)
+        """
+        try:
+            qty = int(qty)
+            if qty <= 0:
+                raise ValueError('操作数量必须大于0')
+        except (TypeError, ValueError):
+            raise ValidationError('请输入有效的数量')
+
+        check_time(time_str)
+
+        operator = (operator or '').strip()
+        submitter = (submitter or '').strip()
+        if not operator:
+            raise ValidationError('请输入操作人')
+        if not submitter:
+            raise ValidationError('请输入提交者')
+
+        # 获取物品信息
+        inventory_item = self.inventory.get(item_id, {})
+        operation = self.new_operation(item_id, inventory_item.get('物品名称', ''), operation_type,
+                                       inventory_item.get('所属组织', ''), qty, time_str, operator, submitter)
+
+        # 计算库存变化
+        changes = {}
+        if operation_type == '物资增添':
+            if item_id not in self.inventory:
+                raise ItemNotFoundError(f'库存中不存在编号为"{item_id}"的物品')
+
+            updated = dict(self.inventory[item_id])
+            updated['物品数量'] += qty
+            updated['最后操作'] = operation_type
+            updated['最后操作人'] = operator
+            updated['最后操作时间'] = time_str
+            changes[item_id] = updated
+            message = f'已增加 {qty} 个物品，现有 {updated["物品数量"]} 个'
+
+        elif operation_type == '部分出库':
+            if item_id not in self.inventory:
+                raise ItemNotFoundError(f'库存中不存在编号为"{item_id}"的物品')
+            if qty > self.inventory[item_id]['物品数量']:
+                raise InsufficientStockError(f'出库数量不能超过当前库存 ({self.inventory[item_id]["物品数量"]})')
+
+            updated = dict(self.inventory[item_id])
+            updated['物品数量'] -= qty
+            updated['最后操作'] = operation_type
+            updated['最后操作人'] = operator
+            updated['最后操作时间'] = time_str
+
+            if updated['物品数量'] <= 0:
+                # 如果数量减至0或以下，移除物品
+                changes[item_id] = None
+                message = f'已出库 {qty} 个物品，物品已从库存中移除'
+            else:
+                changes[item_id] = updated
+                message = f'已出库 {qty} 个物品，剩余 {updated["物品数量"]} 个'
+        else:
+            message = '操作已记录'
+
+        return operation, changes, message
+
+    def prepare_new_item(self, item_id, item_name, operation_type, organization, count, time_str, operator, submitter):
+        """校验入库（新物资）操作
+
+        Returns:
+            (操作记录, 库存变化)
+        """
+        item_id = (item_id or '').strip()
+        item_name = (item_name or '').strip()
+        operator = (operator or '').strip()
+        submitter = (submitter or '').strip()
+
+        # 验证编号是否为空
+        if not item_id:
+            raise ValidationError('请输入物资编号')
+
+        # 检查编号是否重复
+        if operation_type == '入库' and item_id in self.inventory:
+            raise ValidationError('编号已存在于库存中，请使用其他编号或选择"物资增添"操作')
+
+        # 验证操作者和提交者是否填写
+        if not operator:
+            raise ValidationError('请输入操作人姓名')
+        if not submitter:
+            raise ValidationError('请输入提交者姓名')
+
+        try:
+            count = int(count)
+            if count <= 0:
+                raise ValueError('数量必须大于0')
+        except (TypeError, ValueError):
+            raise ValidationError('请输入有效的数量')
+
+        # 验证所有字段
+        if not item_id or not item_name or not organization or not time_str:
+            raise ValidationError('编号、名称、所属组织和时间为必填项')
+
+        # 验证日期时间格式
+        check_time(time_str)
+
+        item = self.new_operation(item_id, item_name, operation_type, organization, count, time_str, operator, submitter)
+
+        # 更新库存
+        changes = {}
+        if operation_type == '入库':
+            # 更新或添加库存
+            changes[item_id] = {
+                "物资编号": item_id,
+                "物品名称": item_name,
+                "所属组织": organization,
+                "物品数量": count,
+                "最后操作": operation_type,
+                "最后操作人": operator,
+                "最后操作时间": time_str,
+                "备注": ""
+            }
+        return item, changes
+
+    def prepare_removal(self, item_id, time_str, operator, submitter):
+        """校验完全出库操作
+
+        Returns:
+            (操作记录, 库存变化)
+        """
+        check_time(time_str)
+
+        operator = (operator or '').strip()
+        submitter = (submitter or '').strip()
+        if not operator:
+            raise ValidationError('请输入操作人')
+        if not submitter:
+            raise ValidationError('请输入提交者')
+
+        # 获取物品信息
+        if item_id not in self.inventory:
+            raise ItemNotFoundError(f'库存中不存在编号为"{item_id}"的物品')
+
+        inventory_item = self.inventory[item_id]
+        operation = self.new_operation(item_id, inventory_item.get('物品名称', ''), '出库',
+                                       inventory_item.get('所属组织', ''), inventory_item.get('物品数量', 0),
+                                       time_str, operator, submitter)
+        return operation, {item_id: None}
+
+    def record_stock_operation(self, operation_type, item_id, qty, time_str, operator, submitter):
+        """物资增添或部分出库，返回 (操作记录, 提示信息)"""
+        with self.writing():
+            operation, changes, message = self.prepare_stock_operation(
+                operation_type, item_id, qty, time_str, operator, submitter)
+            self.commit_operation(operation, changes)
+            self.remember_operators([operation['操作人'], operation['提交者']])
+            return operation, message
+
+    def add_new_item(self, item_id, item_name, operation_type, organization, count, time_str, operator, submitter):
+        """入库新物资，返回操作记录"""
+        with self.writing():
+            item, changes = self.prepare_new_item(
+                item_id, item_name, operation_type, organization, count, time_str, operator, submitter)
+            self.commit_operation(item, changes)
+            self.remember_operators([item['操作人'], item['提交者']])
+            return item
+
+    def remove_item(self, item_id, time_str, operator, submitter):
+        """物品完全出库，返回操作记录"""
+        with self.writing():
+            operation, changes = self.prepare_removal(item_id, time_str, operator, submitter)
+
+            # 保存操作记录，并从库存中删除物品
+            self.commit_operation(operation, changes)
+
+            # 记录日志（操作已经保存，日志写入失败时只报告）
+            try:
+                self.log_operation_to_file(operation, operation['操作人'], operation['提交者'], "完全出库")
+            except OSError as e:
+                self.warn('日志写入错误', f'出库已保存，但无法写入操作日志: {str(e)}')
+
+            self.remember_operators([operation['操作人'], operation['提交者']])
+            return operation
+
+    def prepare_batch_row(self, row):
+        """按物资操作类型校验批量文件中的一行，返回 (操作记录, 库存变化)"""
+        def text(key):
+            value = row.get(key)
+            return '' if value is None else str(value)
+
+        operation_type = text('物资操作').strip()
+        item_id = text('物资编号').strip()
+        qty = row.get('物品数量')
+        if operation_type == '入库':
+            return self.prepare_new_item(item_id, text('物品名称'), operation_type, text('所属组织'), qty,
+                                         text('时间'), text('操作人'), text('提交者'))
+        if operation_type in ('物资增添', '部分出库'):
+            operation, changes, _ = self.prepare_stock_operation(operation_type, item_id, qty, text('时间'),
+                                                                 text('操作人'), text('提交者'))
+            return operation, changes
+        if operation_type == '出库':
+            return self.prepare_removal(item_id, text('时间'), text('操作人'), text('提交者'))
+        raise ValidationError(f'未知的物资操作: {operation_type or "(空)"}')
+
+    def apply_batch(self, rows, dry_run=False):
+        """按顺序校验一批操作并应用到库存，最后一次保存
+
+        每条操作按与界面相同的规则校验，库存以前面已接受的操作执行后为准；
+        不符合要求的操作被跳过并记录原因，其余操作照常执行。
+
+        Args:
+            rows: 可迭代的 (行号, 字段字典)，字段名与操作记录相同
+            dry_run: 只校验，不保存
+
+        Returns:
+            (已接受的 [(行号, 操作记录)], 被拒绝的 [(行号, 原因)])
+        """
+        with self.writing():
+            accepted, rejected = [], []
+            changes, previous = {}, {}
+            for line, row in rows:
+                try:
+                    operation, row_changes = self.prepare_batch_row(row)
+                except ValidationError as e:
+                    rejected.append((line, str(e)))
+                    continue
+
+                for item_id in row_changes:
+                    if item_id not in previous:
+                        previous[item_id] = self.inventory.get(item_id)
+                self.apply_inventory_changes(row_changes)
+                changes.update(row_changes)
+                accepted.append((line, operation))
+
+            if dry_run or not accepted:
+                self.apply_inventory_changes(previous)
+                return accepted, rejected
+
+            operations = [operation for _, operation in accepted]
+            self.commit_operations(operations, changes, previous)
+
+            # 记录日志（操作已经保存，日志写入失败时只报告）
+            try:
+                for operation in operations:
+                    if operation['物资操作'] == '出库':
+                        self.log_operation_to_file(operation, operation['操作人'], operation['提交者'], "完全出库")
+            except OSError as e:
+                self.warn('日志写入错误', f'批量操作已保存，但无法写入操作日志: {str(e)}')
+            names = set()
+            for operation in operations:
+                names.add(operation['操作人'])
+                names.add(operation['提交者'])
+            self.remember_operators(sorted(names))
+            return accepted, rejected
+
+    def log_operation_to_file(self, item, operator, submitter, operation_type):
+        """记录操作到历史文件"""
+        now = datetime.datetime.now()
+        log_dir = os.path.join(self.data_dir, 'logs')
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+
+        log_file = os.path.join(log_dir, f'operation_log_{now.strftime("%Y%m")}.txt')
+
+        log_entry = (f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] "
+                     f"操作: {operation_type}, 操作人: {operator}, 提交者: {submitter}, "
+                     f"物品: {item.get('物品名称', '')}(编号:{item.get('物资编号', '')}), "
+                     f"数量: {item.get('物品数量', 0)}\n")
+
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(log_entry)
+
+    # ---------- 查询 ----------
+
+    def search_operations(self, search):
+        """返回符合搜索条件的操作记录下标（search 为小写搜索词）"""
+        if not search:
+            return range(len(self.data))
+
+        # 第一次搜索时才建立索引，之后随新增记录增量更新
+        if self.operations_index is None:
+            for _ in self.operations_index_steps():
+                pass
+        return self.operations_index.search(search)
+
+    def operations_index_steps(self):
+        """返回正在进行的索引构建（没有则新开始一个），可以被多次搜索接力执行"""
+        if self.operations_index_builder is None:
+            self.operations_index_builder = self.build_operations_index()
+        return self.operations_index_builder
+
+    def build_operations_index(self, chunk_size=2000):
+        """建立操作记录搜索索引（生成器，每处理一批记录让出一次）"""
+        version = self.operations_index_version
+        index = NgramIndex()
+        idx = 0
+        while idx < len(self.data):
+            index.add(idx, operation_search_fields(self.data[idx]))
+            idx += 1
+            if idx % chunk_size == 0:
+                yield
+                if version != self.operations_index_version:
+                    # 构建期间记录被重排或重写，重新开始
+                    version = self.operations_index_version
+                    index = NgramIndex()
+                    idx = 0
+        self.operations_index = index
+        self.operations_index_builder = None
+
+    def invalidate_operations_index(self):
+        """记录顺序变化后丢弃操作记录搜索索引"""
+        self.operations_index = None
+        self.operations_index_builder = None
+        self.operations_index_version += 1
+        self.operation_sorts.clear()
+        self.as_of_index = None
+        self.import_index = None
+        self.operation_report = None
+        self.operation_report_builder = None
+
+    def search_inventory(self, search):
+        """返回符合搜索条件的物资编号（按库存顺序）"""
+        if not search:
+            return list(self.inventory)
+
+        if self.inventory_index is None:
+            self.inventory_index = NgramIndex()
+            for item_id, item in self.inventory.items():
+                self.inventory_index.add(item_id, inventory_search_fields(item_id, item))
+        matched = set(self.inventory_index.search(search))
+        return [item_id for item_id in self.inventory if item_id in matched]
+
+    def search(self, view, search):
+        """返回视图中符合搜索条件的行键（操作记录为下标，库存为物资编号）"""
+        if view == 'operations':
+            return self.search_operations(search.lower())
+        return self.search_inventory(search.lower())
+
+    def sorted_rows(self, view, column, reverse, rows=None):
+        """按列排列行键，rows 为 None 时表示视图中的全部行"""
+        sorts = self.operation_sorts if view == 'operations' else self.inventory_sorts
+        return sorts.sorted_rows(column, reverse, rows)
+
+    def index_new_operations(self, start):
+        """把 start 之后新增的操作记录加入搜索索引和已缓存的排序"""
+        self.operation_sorts.append(start, len(self.data))
+        if self.as_of_index is not None:
+            self.as_of_index.add(start, len(self.data))
+        if self.operation_report is not None:
+            for idx in range(start, len(self.data)):
+                self.operation_report.add(self.data[idx])
+        if self.operations_index is None:
+            return
+        for idx in range(start, len(self.data)):
+            self.operations_index.add(idx, operation_search_fields(self.data[idx]))
+
+    def inventory_as_of(self, time_text):
+        """返回按操作时间重放到某一时刻的库存
+
+        Args:
+            time_text: 年-月-日[ 时:分]，只有日期时包含当天全部操作
+
+        Returns:
+            (库存, 时间无法解析而没有计入的操作记录数)
+        """
+        timestamp = parse_as_of(time_text)
+        if timestamp is None:
+            raise ValidationError('查询时间格式不正确，应为：年-月-日 或 年-月-日 时:分 (如 2025-03-01)')
+        if self.as_of_index is None:
+            self.as_of_index = AsOfIndex(self.data, apply_operation)
+        return self.as_of_index.inventory_at(timestamp), self.as_of_index.skipped
+
+    @staticmethod
+    def search_snapshot(inventory, search):
+        """在某一时刻的库存中搜索（逐条匹配，不建立索引），返回物资编号"""
+        search = search.lower()
+        if not search:
+            return list(inventory)
+        return [item_id for item_id, item in inventory.items()
+                if any(search in str(field).lower() for field in inventory_search_fields(item_id, item))]
+
+    @staticmethod
+    def sorted_snapshot(inventory, column, reverse, rows):
+        """按列排列某一时刻库存中的物资编号"""
+        def fetch(item_id):
+            return item_id if column == '物资编号' else inventory[item_id].get(column, '')
+        return sorted(rows, key=lambda item_id: sort_key(column, fetch(item_id)), reverse=reverse)
+
+    # ---------- 统计报表 ----------
+
+    def report_steps(self):
+        """返回正在进行的出入库统计（没有则新开始一个），可以在空闲时分批执行"""
+        if self.operation_report_builder is None:
+            self.operation_report_builder = self.build_operation_report()
+        return self.operation_report_builder
+
+    def build_operation_report(self, chunk_size=5000):
+        """统计操作记录（生成器，每处理一批记录让出一次已统计的条数）
+
+        只在第一次打开报表时或操作记录被重写后执行，之后随新增记录累加。
+        保存的统计与操作记录对得上时只累加它之后的记录，否则统计全部记录；
+        完成后交给后台线程保存。
+        """
+        version = self.operations_index_version
+        report, idx = self.load_operation_report()
+        while idx < len(self.data):
+            report.add(self.data[idx])
+            idx += 1
+            if idx % chunk_size == 0:
+                yield idx
+                if version != self.operations_index_version:
+                    # 统计期间记录被重写，重新开始
+                    version = self.operations_index_version
+                    report = OperationReport()
+                    idx = 0
+        self.operation_report = report
+        self.operation_report_builder = None
+        self.schedule_report_save()
+
+    def report_tag(self):
+        """统计对应的操作记录位置（与库存文件的标记相同，另加数据代数）"""
+        return dict(self.inventory_tag(), generation=(self.state or {}).get('generation', 0))
+
+    def load_operation_report(self):
+        """读取保存的出入库统计，返回 (统计, 已统计的记录数)
+
+        文件不存在、已损坏，或标记与当前操作记录对不上（记录被重写过）时返回空的统计，从头统计。
+        """
+        try:
+            report, tag = reports.load_report(self.report_file)
+        except (OSError, ValueError):
+            return OperationReport(), 0
+        position = tag.get('position', 0)
+        if (tag.get('generation') != (self.state or {}).get('generation', 0)
+                or position > len(self.data) or report.count != position):
+            return OperationReport(), 0
+        anchor = InventorySnapshots.fingerprint(self.data[position - 1]) if position else None
+        if anchor != tag.get('anchor'):
+            return OperationReport(), 0
+        self.report_saved_tag = tag
+        return report, position
+
+    def schedule_report_save(self):
+        """把出入库统计交给后台线程保存（没有统计或自上次保存以来没有变化时不保存）"""
+        if self.operation_report is None:
+            return
+        tag = self.report_tag()
+        if tag == self.report_saved_tag:
+            return
+        content = self.operation_report.to_content()
+        path, data_format = self.report_file, self.data_format
+        self.writer.submit('report', lambda: reports.save_report(path, content, tag, data_format))
+        self.report_saved_tag = tag
+
+    def reports(self, top_n=50):
+        """返回统计报表
+
+        Returns:
+            字典，各项为按顺序排列的行：
+            organizations: [(所属组织, 物品种数, 物品总数量)]，按总数量从多到少
+            operators: [(操作人, 入库数量, 出库数量, 操作次数)]，按出入库总量从多到少
+            months: [(月份, 入库数量, 出库数量, 操作次数)]，按月份
+            top_items: [(物资编号, 物品名称, 入库数量, 出库数量, 操作次数)]，出入库总量最大的 top_n 个
+        """
+        if self.operation_report is None:
+            for _ in self.report_steps():
+                pass
+        if self.stock_report is None:
+            self.stock_report = StockReport(self.inventory)
+
+        report = self.operation_report
+        by_total = lambda row: -(row[1] + row[2])
+        return {
+            'organizations': sorted(((org, *totals) for org, totals in self.stock_report.by_organization.items()),
+                                    key=lambda row: -row[2]),
+            'operators': sorted(((name, *totals) for name, totals in report.by_operator.items()), key=by_total),
+            'months': sorted((month, *totals) for month, totals in report.by_month.items()),
+            'top_items': report.top_items(top_n),
+        }
+
+    # ---------- 导入导出 ----------
+
+    def read_excel(self, file_path):
+        """读取并校验Excel文件中的操作记录，返回 (有效记录, 错误信息)"""
+        items, errors = [], []
+        for batch_items, batch_errors, _, _ in excel_io.iter_workbook_batches(file_path):
+            items.extend(batch_items)
+            errors.extend(batch_errors)
+        return items, errors
+
+    def read_excel_folder(self, folder, max_workers=None):
+        """用多个子进程并行读取并校验文件夹中的全部Excel文件，返回 (有效记录, 错误信息)
+
+        记录按文件名顺序合并，之后由 import_operations 按时间排列并一次保存。
+        """
+        items, errors = [], []
+        for batch_items, batch_errors, _, _ in excel_io.iter_folder_batches(folder, max_workers):
+            items.extend(batch_items)
+            errors.extend(batch_errors)
+        return items, errors
+
+    def sync_import_index(self):
+        """返回与当前操作记录一致的导入指纹（第一次使用时从文件读取，只计算新增记录的指纹）"""
+        if self.import_index is None:
+            self.import_index = ImportIndex(self.import_index_file).load()
+        self.import_index.sync(self.data, (self.state or {}).get('generation', 0))
+        return self.import_index
+
+    def save_import_index(self):
+        """保存导入指纹（指纹只用于加速，失败时只报告不中断，下次导入时重新计算）"""
+        try:
+            self.sync_import_index().save()
+        except Exception as e:
+            self.warn('导入索引保存错误', f'无法保存导入索引: {str(e)}')
+
+    def classify_import(self, new_items):
+        """把待导入的记录分为 (新记录, 已导入过的记录, 冲突的记录, 被跳过的行占用的现有记录)
+
+        规则见 ImportIndex.classify。最后一项为 (数据代数, 现有记录下标)，覆盖冲突时交给 replace_conflicts。
+        """
+        with self.writing():
+            index = self.sync_import_index()
+            inserted, skipped, conflicts, matched = index.classify(new_items)
+            return inserted, skipped, conflicts, (index.generation, matched)
+
+    def import_changes(self, operations):
+        """计算按顺序应用 operations 引起的库存变化（规则与重建库存相同）
+
+        每条操作只影响自己的物品，因此只需复制涉及的库存条目。
+
+        Returns:
+            (库存变化 {物资编号: 新的库存条目或 None}, 出库超过库存的记录说明)
+        """
+        entries = {}  # 物资编号 -> 应用到当前记录为止的库存条目
+        problems = []
+        for item in operations:
+            item_id = item.get('物资编号', '')
+            if not item_id:
+                continue
+            current = entries[item_id] if item_id in entries else self.inventory.get(item_id)
+            view = {} if current is None else {item_id: current}
+            problem = stock_problem(view, item)
+            if problem:
+                problems.append(problem)
+            apply_operation(view, item)
+            entries[item_id] = view.get(item_id)
+        return entries, problems
+
+    def commit_import(self, operations):
+        """保存一批导入的记录，库存与操作记录一致时按记录顺序把它们应用到库存
+
+        Returns:
+            出库超过库存的记录说明
+        """
+        with self.writing():
+            if not self.inventory_in_sync:
+                # 库存本来就需要重建，重建时会包含这些记录
+                self.append_operations(operations)
+                return []
+            changes, problems = self.import_changes(operations)
+            self.commit_operations(operations, changes)
+            return problems
+
+    def correct_inventory(self, item_ids, check_from=None):
+        """只按指定物品自己的全部操作记录重新计算它们的库存条目，其他物品不变
+
+        Args:
+            check_from: 检查该下标之后的记录是否出库超过库存
+
+        Returns:
+            出库超过库存的记录说明
+        """
+        with self.writing():
+            entries = {}
+            problems = []
+            for idx, item in enumerate(self.data):
+                if item.get('物资编号', '') in item_ids:
+                    if check_from is not None and idx >= check_from:
+                        problem = stock_problem(entries, item)
+                        if problem:
+                            problems.append(problem)
+                    apply_operation(entries, item)
+            changes = {item_id: entries.get(item_id) for item_id in item_ids if item_id}
+            self.apply_inventory_changes(changes)
+            self.inventory_in_sync = True
+            self.save_inventory(changes)
+            return problems
+
+    def replace_conflicts(self, new_items, conflicts, matched):
+        """删除与冲突记录物资编号、时间和操作都相同的现有记录，再追加 new_items（整体重写）
+
+        同一导入中被跳过的行占用的现有记录（matched，来自 classify_import）内容没有变化，不删除。
+        库存与操作记录一致时，只重新计算被删除和新增记录涉及的物品。
+
+        Returns:
+            新记录中出库超过库存的记录说明
+
+        Raises:
+            StorageError: 分类之后操作记录被其他实例重写过，记录下标已经对不上
+        """
+        generation, matched = matched
+        with self.writing():
+            index = self.sync_import_index()
+            if index.generation != generation:
+                raise StorageError('数据已变化', '其他程序实例修改了操作记录，请重新导入')
+            removed = set(index.rows_with_keys(conflicts, matched))
+            affected = {self.data[idx].get('物资编号', '') for idx in removed}
+            affected.update(item.get('物资编号', '') for item in new_items)
+            in_sync = self.inventory_in_sync
+            # 删除记录后到修正库存之前，库存与操作记录不一致
+            self.inventory_in_sync = False
+            self.data = [item for idx, item in enumerate(self.data) if idx not in removed]
+            start = len(self.data)
+            self.data.extend(new_items)
+            self.save_data()
+            if not in_sync:
+                return []
+            return self.correct_inventory(affected, start)
+
+    def import_operations(self, new_items, overwrite=False):
+        """导入操作记录，已经导入过的行被跳过，再次导入同一文件不会产生重复记录
+
+        导入的记录按时间排列后追加，并按同样的顺序应用到库存（与重建库存的结果相同）。
+
+        Args:
+            overwrite: 是否用冲突的新记录覆盖现有记录，否则不导入冲突的记录
+
+        Returns:
+            (实际导入的记录, 跳过的记录, 冲突的记录, 出库超过库存的记录说明)
+        """
+        with self.writing():
+            inserted, skipped, conflicts, matched = self.classify_import(new_items)
+            if conflicts and overwrite:
+                imported = sort_by_time(inserted + conflicts)
+                problems = self.replace_conflicts(imported, conflicts, matched)
+            else:
+                imported = sort_by_time(inserted)
+                problems = self.commit_import(imported)
+        # 释放数据锁后数据代数已更新，保存的导入指纹与之对应
+        self.finish_import(imported)
+        return imported, skipped, conflicts, problems
+
+    def finish_import(self, imported):
+        """导入完成后登记操作人，并保存导入指纹"""
+        operators = set()
+        for item in imported:
+            if item.get('操作人'):
+                operators.add(item['操作人'])
+            if item.get('提交者'):
+                operators.add(item['提交者'])
+
+        if imported:
+            self.save_import_index()
+
+        self.remember_operators(operators)
+
+    def export_table(self, view):
+        """返回导出视图时的 (工作表标题, 表头)"""
+        if view == 'operations':
+            return "仓库操作记录", excel_io.OPERATION_EXPORT_HEADERS
+        return "仓库库存状态", excel_io.INVENTORY_EXPORT_HEADERS
+
+    def export_keys(self, view):
+        """返回视图中全部行的行键（按数据顺序）"""
+        if view == 'operations':
+            return range(len(self.data))
+        return list(self.inventory)
+
+    def export_values(self, view, key, inventory=None):
+        """返回导出文件中一行的值，inventory 为导出库存视图时使用的库存（默认为当前库存）"""
+        if view == 'operations':
+            item = self.data[key]
+            return [
+                item.get('提交时间', ''),
+                item.get('物资编号', ''),
+                item.get('物品名称', ''),
+                item.get('物资操作', ''),
+                item.get('所属组织', ''),
+                item.get('物品数量', 0),
+                item.get('时间', ''),
+                item.get('操作人', ''),
+                item.get('提交者', '')
+            ]
+        item = (self.inventory if inventory is None else inventory).get(key, {})
+        return [
+            key,
+            item.get('物品名称', ''),
+            item.get('所属组织', ''),
+            item.get('物品数量', 0),
+            item.get('最后操作', ''),
+            item.get('最后操作人', ''),
+            item.get('最后操作时间', ''),
+            item.get('备注', '')
+        ]
+
+    def export_file(self, file_path, view, keys=None):
+        """把视图导出到Excel或CSV文件（按扩展名），keys 为 None 时导出全部行"""
+        if keys is None:
+            keys = self.export_keys(view)
+        title, headers = self.export_table(view)
+        writer = excel_io.open_table_writer(file_path, title, headers)
+        try:
+            writer.write_rows(self.export_values(view, key) for key in keys)
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        return len(keys)
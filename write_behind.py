@@ -0,0 +1,94 @@
+import threading
+
+
+class WriteBehind:
+    """后台保存线程：按名称合并待保存的内容，界面线程提交后立即返回
+
+    同一名称（如 'inventory'、'config'）在保存前被多次提交时只保存最后一次的内容，
+    连续的多次操作因此只写一次文件。保存失败的任务保留下来，下一次提交同名内容
+    或调用 flush() 时重试。
+
+    Args:
+        name: 线程名称
+    """
+
+    def __init__(self, name='write-behind'):
+        self.pending = {}  # {名称: 保存函数}，等待保存的内容
+        self.failed = {}  # {名称: 保存函数}，上次保存失败、等待重试的内容
+        self.errors = {}  # {名称: 错误信息}
+        self.running = None  # 正在保存的名称
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, key, job):
+        """提交一个保存任务，覆盖同名的未保存任务
+
+        Args:
+            key: 名称
+            job: 无参数的保存函数，在后台线程中执行，不应再访问会被界面线程修改的对象
+        """
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('后台保存线程已关闭')
+            self.pending[key] = job
+            self.failed.pop(key, None)
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                key = next(iter(self.pending))
+                job = self.pending.pop(key)
+                self.running = key
+
+            try:
+                job()
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            else:
+                error = None
+
+            with self.condition:
+                self.running = None
+                if error is None:
+                    self.errors.pop(key, None)
+                else:
+                    self.errors[key] = error
+                    if key not in self.pending:
+                        self.failed[key] = job
+                self.condition.notify_all()
+
+    def status(self):
+        """返回 (等待保存的任务数, {名称: 错误信息})"""
+        with self.condition:
+            count = len(self.pending) + (self.running is not None)
+            return count, dict(self.errors)
+
+    def flush(self, timeout=None):
+        """重试失败的任务并等待全部保存完成
+
+        Returns:
+            {名称: 错误信息}，全部保存成功时为空字典
+        """
+        with self.condition:
+            for key, job in self.failed.items():
+                self.pending.setdefault(key, job)
+            self.failed.clear()
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: not self.pending and self.running is None, timeout)
+            return dict(self.errors)
+
+    def close(self, timeout=None):
+        """保存全部内容后结束后台线程，返回 flush() 的结果"""
+        errors = self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        return errors